@@ -1,10 +1,20 @@
 import os
-import folder_paths
-from .loader_node import DynamicTagLoaderJS
+import json
+import asyncio
+import functools
+from .loader_node import DynamicTagLoaderJS, SAMPLE_COUNT_MAX
 from .saver_node import DynamicTagSaver
 from .iterator_node import DynamicTagIterator
 from .image_info_node import ImageWorkflowExtractor
 from .wait_for_node import WaitForNode
+from .pack_node import DynamicTagPacker
+from .tag_library import TAG_LIBRARY
+from .lora_index import LORA_INDEX
+from .lora_cache import LORA_CACHE
+from .conditioning_cache import CONDITIONING_CACHE
+from .image_cache import IMAGE_CACHE
+from .tag_writer import TAG_WRITE_QUEUE
+from .profiler import PROFILE_STATS
 
 # ==============================================================================
 # 模組導入與環境檢查
@@ -30,45 +40,115 @@ if not os.path.exists(TAGS_DIR):
 # API 路由註冊 (Server-Side)
 # ==============================================================================
 if PromptServer:
+
+    # 回應大於此大小且用戶端支援時以 gzip 壓縮
+    GZIP_MIN_BYTES = 1024
+
+    async def _run_blocking(fn, *args):
+        """在執行緒池中執行檔案系統操作，避免阻塞 aiohttp 事件迴圈 (其他 HTTP / WebSocket 用戶端)"""
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args))
+
+    def _json_response(request, data, headers=None):
+        """JSON 回應：用戶端接受 gzip 時壓縮"""
+        response = web.json_response(data, headers=headers)
+        if len(response.body) >= GZIP_MIN_BYTES and "gzip" in request.headers.get("Accept-Encoding", ""):
+            response.enable_compression(web.ContentCoding.gzip)
+        return response
+
+    def _query_int(request, name, default):
+        value = int(request.query.get(name, default))
+        if value < 0:
+            raise ValueError(name)
+        return value
     
     @PromptServer.instance.routes.get("/custom_nodes/tags")
     async def get_tags_data(request):
         """
         API: 獲取 Tags 目錄結構
-        功能: 遞迴遍歷 tags 資料夾，回傳包含 .txt 檔案的目錄結構供前端選單使用。
+        功能: 由共用的標籤庫索引回傳包含 .txt 檔案的目錄結構供前端選單使用。
+              索引僅重新列舉 mtime 變動的目錄，並支援 ETag / If-None-Match (304)。
+        """
+        data, etag = await _run_blocking(TAG_LIBRARY.tree)
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return _json_response(request, data, headers={"ETag": etag})
+
+    @PromptServer.instance.routes.get("/custom_nodes/tags/folders")
+    async def get_tag_folders(request):
+        """
+        API: 獲取單一資料夾的子資料夾
+        功能: 前端選單逐層展開時呼叫 (?parent=相對路徑，預設為根目錄)，不走訪整個目錄樹。
+        """
+        data = await _run_blocking(TAG_LIBRARY.subfolders, request.query.get("parent", ""))
+        if data is None:
+            return web.json_response({"error": "folder not found"}, status=404)
+        return _json_response(request, data)
+
+    @PromptServer.instance.routes.get("/custom_nodes/tags/files")
+    async def get_tag_files(request):
+        """
+        API: 分頁獲取資料夾內的標籤檔案
+        功能: ?folder=相對路徑&offset=0&limit=500&prefix=檔名開頭，僅回傳該頁的檔名與總數。
         """
-        data = {}
-        if os.path.exists(TAGS_DIR):
-            # 使用 os.walk 進行遞迴遍歷，以支援多層級子資料夾
-            for root, dirs, files in os.walk(TAGS_DIR):
-                # 篩選出目標檔案類型 (.txt)
-                txt_files = sorted([f for f in files if f.endswith(".txt")])
-                
-                # 過濾空目錄：僅將包含有效 .txt 檔案的目錄加入索引
-                if txt_files:
-                    # 計算相對路徑 (例如: "Style/Anime")
-                    rel_path = os.path.relpath(root, TAGS_DIR)
-                    
-                    # 根目錄標識處理
-                    if rel_path == ".":
-                        rel_path = "Root"
-                    
-                    # 跨平台相容性處理：統一使用 POSIX 風格路徑分隔符 (/) 以確保前端顯示一致
-                    rel_path = rel_path.replace("\\", "/")
-                    
-                    # 建構回傳資料：加入 "ALL" 選項作為批次讀取標識
-                    data[rel_path] = ["ALL"] + txt_files
-                    
-        return web.json_response(data)
+        try:
+            offset = _query_int(request, "offset", 0)
+            limit = _query_int(request, "limit", 0)
+        except ValueError:
+            return web.json_response({"error": "invalid offset or limit"}, status=400)
+        data = await _run_blocking(TAG_LIBRARY.folder_files, request.query.get("folder", ""),
+                                   offset, limit, request.query.get("prefix", ""))
+        if data is None:
+            return web.json_response({"error": "folder not found"}, status=404)
+        return _json_response(request, data)
 
     @PromptServer.instance.routes.get("/custom_nodes/loras_list")
     async def get_loras_list(request):
         """
         API: 獲取系統 LoRA 列表
-        功能: 讀取 ComfyUI 系統路徑下的 LoRA 模型清單。
+        功能: 讀取 ComfyUI 系統路徑下的 LoRA 模型清單 (與 Loader 共用名稱解析索引)。
+        """
+        loras = await _run_blocking(LORA_INDEX.names)
+        return _json_response(request, loras)
+
+    @PromptServer.instance.routes.post("/custom_nodes/tagloader/preview")
+    async def post_tagloader_preview(request):
+        """
+        API: 組合預覽與成本估算
+        功能: 接收與 Loader 相同的 text_input / tag_settings，回傳組合總數 (由各群組大小計算，不展開組合)、
+              不同 LoRA 疊加數、預估 LoRA 讀取量，以及前 limit 個 (或指定 seed 隨機抽取的) 組合 Prompt。
+        """
+        try:
+            body = await request.json()
+            tag_settings = body.get("tag_settings", "{}")
+            if not isinstance(tag_settings, str):
+                tag_settings = json.dumps(tag_settings)
+            seed = body.get("seed")
+            args = (
+                str(body.get("text_input", "")), tag_settings,
+                int(body.get("limit", 10)), None if seed is None else int(seed),
+                str(body.get("selection", "All Combinations")), int(body.get("selection_seed", 0)),
+                # 與節點 Widget 相同的上限，避免單一請求要求過大的抽樣數
+                min(max(int(body.get("sample_count", 1)), 1), SAMPLE_COUNT_MAX),
+            )
+        except (ValueError, TypeError, AttributeError):
+            return web.json_response({"error": "invalid preview request"}, status=400)
+        data = await _run_blocking(DynamicTagLoaderJS().preview, *args)
+        return _json_response(request, data)
+
+    @PromptServer.instance.routes.get("/custom_nodes/tagloader/stats")
+    async def get_tagloader_stats(request):
+        """
+        API: 獲取效能統計
+        功能: 回傳各節點的分段計時累計資料 (耗時直方圖、次數、讀取量)、快取統計與背景寫入佇列深度。
         """
-        loras = folder_paths.get_filename_list("loras")
-        return web.json_response(loras)
+        data = PROFILE_STATS.snapshot()
+        data["caches"] = {
+            "lora_weights": LORA_CACHE.stats(),
+            "conditioning": CONDITIONING_CACHE.stats(),
+            "images": IMAGE_CACHE.stats(),
+        }
+        data["tag_writer"] = TAG_WRITE_QUEUE.stats()
+        return _json_response(request, data)
 
 # ==============================================================================
 # 節點映射與顯示名稱
@@ -79,6 +159,7 @@ NODE_CLASS_MAPPINGS = {
     "DynamicTagIterator": DynamicTagIterator,
     "WorkflowMetadataReader": ImageWorkflowExtractor,
     "WaitForNode": WaitForNode,
+    "DynamicTagPacker": DynamicTagPacker,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
@@ -87,6 +168,7 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "DynamicTagIterator": "🔄 Dynamic Tag Iterator",
     "WorkflowMetadataReader": "🔍 Workflow Metadata Reader",
     "WaitForNode": "⏳ Wait For",
+    "DynamicTagPacker": "📦 Dynamic Tag Packer",
 }
 
 WEB_DIRECTORY = "./web"
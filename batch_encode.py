@@ -0,0 +1,164 @@
+import torch
+import comfy.model_management
+
+try:
+    from comfy.sd1_clip import gen_empty_tokens
+except ImportError:
+    gen_empty_tokens = None
+
+
+def _batchable_encoder(clip):
+    """
+    檢查 CLIP 是否為可批次編碼的單一編碼器結構 (SD1ClipModel 類型)。
+    多編碼器 (SDXL / Flux 等)、需回傳 Attention Mask 或啟用 Hook 排程的 CLIP 一律回傳 None，
+    由呼叫端改走逐筆編碼路徑，以確保輸出與 encode_from_tokens 一致。
+    無法設定與 encode_from_tokens 相同的選項 (clip options / 執行裝置) 時同樣回傳 None。
+
+    Returns:
+        tuple: (token 鍵名, 內部編碼器) 或 None
+    """
+    if getattr(clip, "use_clip_schedule", False):
+        return None
+    stage_model = getattr(clip, "cond_stage_model", None)
+    clip_name = getattr(stage_model, "clip_name", None)
+    clip_attr = getattr(stage_model, "clip", None)
+    if not clip_name or not isinstance(clip_attr, str):
+        return None
+    encoder = getattr(stage_model, clip_attr, None)
+    if encoder is None or not hasattr(encoder, "encode") or not hasattr(encoder, "special_tokens"):
+        return None
+    if getattr(encoder, "return_attention_masks", False):
+        return None
+    if not hasattr(stage_model, "reset_clip_options") or not hasattr(stage_model, "set_clip_options"):
+        return None
+    # 支援 execution_device 的編碼器 (encode_from_tokens 會設定為 patcher.load_device) 需能取得相同的裝置
+    if hasattr(encoder, "execution_device") and _load_device(clip) is None:
+        return None
+    return clip_name, encoder
+
+
+def _load_device(clip):
+    return getattr(getattr(clip, "patcher", None), "load_device", None)
+
+
+def _empty_tokens(encoder, length):
+    if hasattr(encoder, "gen_empty_tokens"):
+        return encoder.gen_empty_tokens(encoder.special_tokens, length)
+    return gen_empty_tokens(encoder.special_tokens, length)
+
+
+def _encode_single(clip, tokens):
+    try:
+        cond, pooled = clip.encode_from_tokens(tokens, return_pooled=True)
+        return cond, pooled
+    except:
+        return None
+
+
+def _encode_sections(clip, clip_name, encoder, token_batch):
+    """
+    將多個 Prompt 的所有區段 (77 token chunk) 合併為單次前向傳播，再依原本的
+    ClipTokenWeightEncoder.encode_token_weights 規則 (權重插值、首段 pooled) 拆回各 Prompt。
+    """
+    to_encode = []
+    layout = []  # 每個 Prompt: (起始索引, 區段數, 權重列表, 是否含權重)
+    max_token_len = 0
+    any_weights = False
+    for tokens in token_batch:
+        sections = tokens[clip_name]
+        start = len(to_encode)
+        weights = []
+        has_weights = False
+        for section in sections:
+            ids = [t[0] for t in section]
+            section_weights = [t[1] for t in section]
+            max_token_len = max(max_token_len, len(ids))
+            has_weights = has_weights or any(w != 1.0 for w in section_weights)
+            to_encode.append(ids)
+            weights.append(section_weights)
+        any_weights = any_weights or has_weights
+        layout.append((start, len(sections), weights, has_weights))
+
+    if any_weights:
+        to_encode.append(_empty_tokens(encoder, max_token_len))
+
+    # 與 CLIP.encode_from_tokens 相同的選項：重置、layer_idx，以及載入模型後的執行裝置
+    stage_model = clip.cond_stage_model
+    stage_model.reset_clip_options()
+    if getattr(clip, "layer_idx", None) is not None:
+        stage_model.set_clip_options({"layer": clip.layer_idx})
+    clip.load_model()
+    if hasattr(encoder, "execution_device"):
+        stage_model.set_clip_options({"execution_device": _load_device(clip)})
+
+    o = encoder.encode(to_encode)
+    out, pooled = o[:2]
+    device = comfy.model_management.intermediate_device()
+    z_empty = out[-1] if any_weights else None
+
+    results = []
+    for start, count, weights, has_weights in layout:
+        outputs = []
+        for k in range(count):
+            z = out[start + k:start + k + 1]
+            if has_weights:
+                w = torch.tensor(weights[k], dtype=z.dtype, device=z.device)
+                mask = w != 1.0
+                if bool(mask.any()):
+                    z = z.clone()
+                    weighted = (z[0] - z_empty) * w.unsqueeze(-1) + z_empty
+                    z[0][mask] = weighted[mask]
+            outputs.append(z)
+        cond = torch.cat(outputs, dim=-2).to(device)
+        first_pooled = pooled[start:start + 1].to(device) if pooled is not None else None
+        results.append((cond, first_pooled))
+    return results
+
+
+def encode_prompts(clip, prompts, batch_size=8):
+    """
+    批次文本編碼：同一個 CLIP (相同 LoRA 疊加) 的多個 Prompt 以 batch_size 為單位合併編碼。
+
+    Args:
+        clip: CLIP 實例
+        prompts (list): Prompt 字串列表
+        batch_size (int): 單次前向傳播最多合併的 Prompt 數，<= 1 代表逐筆編碼
+    Returns:
+        list: 與 prompts 對齊的 (cond, pooled)，編碼失敗的項目為 None
+    """
+    try:
+        token_list = [clip.tokenize(p) for p in prompts]
+    except:
+        return [None] * len(prompts)
+
+    batch_info = _batchable_encoder(clip) if batch_size > 1 else None
+    if batch_info is None:
+        return [_encode_single(clip, tokens) for tokens in token_list]
+
+    clip_name, encoder = batch_info
+    results = [None] * len(prompts)
+
+    # 依區段長度分組 (Padding 後長度一致才可直接堆疊)，單一鍵值以外的 token 結構改走逐筆路徑
+    buckets = {}
+    for i, tokens in enumerate(token_list):
+        sections = tokens.get(clip_name) if isinstance(tokens, dict) else None
+        if not sections or len(tokens) != 1:
+            results[i] = _encode_single(clip, tokens)
+            continue
+        lengths = {len(section) for section in sections}
+        if len(lengths) != 1:
+            results[i] = _encode_single(clip, tokens)
+            continue
+        buckets.setdefault(lengths.pop(), []).append(i)
+
+    for indices in buckets.values():
+        for offset in range(0, len(indices), batch_size):
+            chunk = indices[offset:offset + batch_size]
+            try:
+                encoded = _encode_sections(clip, clip_name, encoder, [token_list[i] for i in chunk])
+            except Exception as e:
+                print(f"[DynamicTagLoader] Batch encode fallback: {e}")
+                encoded = [_encode_single(clip, token_list[i]) for i in chunk]
+            for i, item in zip(chunk, encoded):
+                results[i] = item
+    return results
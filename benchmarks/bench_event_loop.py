@@ -0,0 +1,88 @@
+"""
+基準測試：API 路由對 aiohttp 事件迴圈的阻塞時間 (直接在事件迴圈中列舉 vs. 執行緒池)
+
+事件迴圈中同時執行一個每 1ms 喚醒一次的計時協程，記錄其最大延遲 (即其他 HTTP / WebSocket 用戶端被卡住的時間)。
+每次請求前重設標籤庫索引 (冷啟動，需重新走訪整個目錄樹)。
+用法: python benchmarks/bench_event_loop.py [--folders 200] [--files 200] [--requests 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synth
+from comfy_stubs import FakeRequest, load_package, route_handler, use_tags_dir
+
+
+async def _ticker(stop, delays, interval=0.001):
+    """每 interval 秒喚醒一次，記錄實際延遲"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        delays.append(time.perf_counter() - start - interval)
+
+
+async def _measure(package, tags_dir, request_fn, requests):
+    """回傳 (每次請求耗時列表, 計時協程的最大延遲)"""
+    stop = asyncio.Event()
+    delays = []
+    ticker = asyncio.create_task(_ticker(stop, delays))
+    await asyncio.sleep(0.01)
+    times = []
+    for _ in range(requests):
+        use_tags_dir(package, tags_dir)
+        start = time.perf_counter()
+        await request_fn()
+        times.append(time.perf_counter() - start)
+        await asyncio.sleep(0.005)
+    stop.set()
+    await ticker
+    return times, max(delays) if delays else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--folders", type=int, default=200)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5)
+    args = parser.parse_args()
+
+    package = load_package()
+    tag_library = sys.modules[f"{package.__name__}.tag_library"]
+    try:
+        tree_handler = route_handler("GET", "/custom_nodes/tags")
+        folders_handler = route_handler("GET", "/custom_nodes/tags/folders")
+        files_handler = route_handler("GET", "/custom_nodes/tags/files")
+    except KeyError:
+        print("skipped (aiohttp not installed, routes not registered)")
+        return
+
+    async def legacy_tree():
+        # 舊版處理函數：直接在事件迴圈中走訪目錄樹
+        return tag_library.TAG_LIBRARY.tree()
+
+    gzip = {"Accept-Encoding": "gzip"}
+    cases = [
+        ("tree (inline)", legacy_tree),
+        ("tree (executor)", lambda: tree_handler(FakeRequest(headers=gzip))),
+        ("folders (lazy)", lambda: folders_handler(FakeRequest(query={"parent": ""}, headers=gzip))),
+        ("files page (lazy)", lambda: files_handler(
+            FakeRequest(query={"folder": "folder_000", "offset": "0", "limit": "500"}, headers=gzip))),
+    ]
+
+    with tempfile.TemporaryDirectory() as root:
+        synth.generate_tag_library(root, args.folders, args.files)
+        print(f"folders={args.folders} files={args.files} requests={args.requests}")
+        for name, request_fn in cases:
+            times, max_stall = asyncio.run(_measure(package, root, request_fn, args.requests))
+            print(f"  {name:<18}: {statistics.median(times) * 1000:8.2f} ms/request | "
+                  f"max event-loop stall {max_stall * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
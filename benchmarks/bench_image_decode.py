@@ -0,0 +1,91 @@
+"""
+基準測試：Extractor 圖片解碼 (舊版三段式轉換 vs. decode_image vs. 張量快取 vs. 縮圖解碼)
+
+每種模式在獨立子程序中執行，以 ru_maxrss 比較峰值 RSS。
+模擬以 seed 走訪同一資料夾：共 --calls 次呼叫，輪流讀取 --images 張圖片。
+用法: python benchmarks/bench_image_decode.py [--images 8] [--size 2048] [--calls 64] [--max-side 512]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+MODES = ["legacy", "decode", "cached", "preview"]
+
+
+def legacy_decode(path):
+    """舊版 extract_info 的轉換流程 (np.array -> astype -> / 255 -> from_numpy)"""
+    import numpy as np
+    import torch
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as img:
+        img = ImageOps.exif_transpose(img)
+        image_rgb = img.convert("RGB")
+        image_np = np.array(image_rgb).astype(np.float32) / 255.0
+        return torch.from_numpy(image_np)[None,]
+
+
+def run_child(mode, paths, calls, max_side):
+    from comfy_stubs import load_package
+
+    package = load_package()
+    image_cache = sys.modules[f"{package.__name__}.image_cache"]
+
+    if mode == "legacy":
+        fn = legacy_decode
+    elif mode == "decode":
+        fn = image_cache.decode_image
+    elif mode == "cached":
+        fn = image_cache.IMAGE_CACHE.load
+    else:
+        fn = lambda path: image_cache.IMAGE_CACHE.load(path, max_side)
+
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(paths[i % len(paths)])
+    elapsed = time.perf_counter() - start
+    # Linux 回傳 KB，macOS 回傳位元組
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    maxrss_mb = maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+    print(json.dumps({"mode": mode, "ms_per_call": elapsed / calls * 1000, "peak_rss_mb": maxrss_mb}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--calls", type=int, default=64)
+    parser.add_argument("--max-side", type=int, default=512)
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--paths", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.paths.split(os.pathsep), args.calls, args.max_side)
+        return
+
+    import synth
+
+    with tempfile.TemporaryDirectory() as root:
+        synth.generate_images(root, args.images, size=args.size)
+        paths = sorted(os.path.join(root, name) for name in os.listdir(root))
+        print(f"images={args.images} size={args.size} calls={args.calls} max_side={args.max_side}")
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, "--paths", os.pathsep.join(paths),
+                 "--calls", str(args.calls), "--max-side", str(args.max_side)],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+            result = json.loads(output)
+            print(f"  {mode:<8}: {result['ms_per_call']:8.2f} ms/call | peak RSS {result['peak_rss_mb']:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+基準測試：圖片 Metadata 讀取成本 (image_metadata.read_metadata vs. PIL img.info vs. 完整解碼)
+
+以不同解析度產生帶有 workflow 的 PNG，驗證區塊讀取的成本與解析度無關。
+用法: python benchmarks/bench_metadata.py [--sizes 512,2048,4096] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+import image_metadata
+from synth import make_workflow
+
+
+def write_png(path, size):
+    # 隨機雜訊使 IDAT 無法有效壓縮，檔案大小隨解析度成長
+    pixels = np.random.default_rng(size).integers(0, 256, (size, size, 3), dtype=np.uint8)
+    meta = PngInfo()
+    meta.add_text("prompt", json.dumps({"1": {"class_type": "KSampler"}}))
+    meta.add_text("workflow", json.dumps(make_workflow(size)))
+    Image.fromarray(pixels).save(path, pnginfo=meta, compress_level=1)
+
+
+def pil_info(path):
+    with Image.open(path) as img:
+        return img.info.get("workflow")
+
+
+def pil_decode(path):
+    with Image.open(path) as img:
+        workflow = img.info.get("workflow")
+        np.array(img.convert("RGB")).astype(np.float32) / 255.0
+    return workflow
+
+
+def timed(fn, path, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(path)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="512,2048,4096")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        print(f"{'size':>6} {'file MB':>8} {'chunks ms':>10} {'PIL info ms':>12} {'decode ms':>10}")
+        for size in (int(s) for s in args.sizes.split(",")):
+            path = os.path.join(root, f"image_{size}.png")
+            write_png(path, size)
+            assert image_metadata.read_metadata(path)["workflow"] == pil_info(path)
+            chunk_ms = timed(image_metadata.read_metadata, path, args.repeat)
+            info_ms = timed(pil_info, path, args.repeat)
+            decode_ms = timed(pil_decode, path, max(args.repeat // 10, 1))
+            file_mb = os.path.getsize(path) / (1024 * 1024)
+            print(f"{size:>6} {file_mb:>8.1f} {chunk_ms:>10.3f} {info_ms:>12.3f} {decode_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+基準測試：標籤 Prompt 解析器吞吐量 (tag_parser.parse_prompt vs. 舊版三段式 re 解析)
+
+用法: python benchmarks/bench_parser.py [--folders 20] [--files 1000] [--loras 3]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tag_parser
+from synth import generate_tag_library
+
+
+def legacy_parse(text):
+    """舊版 _parse_and_strip_lora (每次呼叫皆重新編譯/掃描三次)"""
+    if not text:
+        return "", []
+    lora_pattern = r"<lora:([^>:]+)(?::([0-9.]+))?>"
+    found_loras = []
+    for match in re.finditer(lora_pattern, text):
+        strength = float(match.group(2)) if match.group(2) else 1.0
+        found_loras.append((match.group(1), strength))
+    cleaned_text = re.sub(lora_pattern, "", text)
+    cleaned_text = re.sub(r'\n\s*\n', '\n', cleaned_text)
+    return cleaned_text.strip(), found_loras
+
+
+def load_texts(root):
+    texts = []
+    for dirpath, _, names in os.walk(root):
+        for name in sorted(names):
+            with open(os.path.join(dirpath, name), "r", encoding="utf-8") as fh:
+                texts.append(fh.read().strip())
+    return texts
+
+
+def run(label, fn, texts):
+    start = time.perf_counter()
+    for text in texts:
+        fn(text)
+    elapsed = time.perf_counter() - start
+    total_mb = sum(len(t) for t in texts) / (1024 * 1024)
+    print(f"  {label:<22}: {elapsed:.3f}s | {len(texts) / elapsed:,.0f} files/s | {total_mb / elapsed:.1f} MB/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--folders", type=int, default=20)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--loras", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        generate_tag_library(root, args.folders, args.files, args.loras, lora_pool=500)
+        texts = load_texts(root)
+
+    print(f"files={len(texts)} (folders={args.folders} x files={args.files}, <= {args.loras} loras/file)")
+    run("legacy re (3 passes)", legacy_parse, texts)
+    tag_parser._parse_cache.clear()
+    original_size = tag_parser.CACHE_SIZE
+    tag_parser.CACHE_SIZE = len(texts)
+    run("parse_prompt (cold)", tag_parser.parse_prompt, texts)
+    run("parse_prompt (cached)", tag_parser.parse_prompt, texts)
+    tag_parser.CACHE_SIZE = original_size
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+基準測試：ALL 讀取大量標籤檔案 (個別 .txt vs. 標籤包 .tagpack)
+
+每次讀取都建立新的 TagLibrary (模擬冷啟動，無記憶體快取)。
+用法: python benchmarks/bench_tag_pack.py [--files 20000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synth
+from comfy_stubs import load_package
+
+
+def cold_read(tag_library, parser, folder, repeat):
+    """回傳 (每次讀取的毫秒數, 讀取的檔案數)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        library = tag_library.TagLibrary(os.path.dirname(folder))
+        groups = library.read_folder(folder, parser)
+    return (time.perf_counter() - start) / repeat * 1000, len(groups)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    package = load_package()
+    tag_library = sys.modules[f"{package.__name__}.tag_library"]
+    tag_pack = sys.modules[f"{package.__name__}.tag_pack"]
+    parse_prompt = sys.modules[f"{package.__name__}.tag_parser"].parse_prompt
+
+    with tempfile.TemporaryDirectory() as root:
+        folder = os.path.join(root, synth.generate_tag_library(root, 1, args.files, loras=2)[0])
+        print(f"files={args.files} repeat={args.repeat}")
+
+        loose_ms, count = cold_read(tag_library, parse_prompt, folder, args.repeat)
+        print(f"  loose files: {loose_ms:9.2f} ms/read ({count} files)")
+
+        start = time.perf_counter()
+        tag_pack.build_pack(folder, parse_prompt)
+        print(f"  build pack : {(time.perf_counter() - start) * 1000:9.2f} ms "
+              f"({os.path.getsize(tag_pack.pack_path(folder))} bytes)")
+
+        pack_ms, count = cold_read(tag_library, parse_prompt, folder, args.repeat)
+        print(f"  tag pack   : {pack_ms:9.2f} ms/read ({count} files) | {loose_ms / pack_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+離線基準測試用的 ComfyUI 模組替身 (Stub)。
+
+在未啟動 ComfyUI 的環境下，以最小實作取代 folder_paths、comfy.sd、comfy.utils、
+comfy.model_management、comfy.sd1_clip 與 server (PromptServer)，並以套件形式載入本節點。
+提供確定性成本的 FakeCLIP、FakeModelPatcher 與 API 路由替身。
+"""
+import importlib.util
+import os
+import sys
+import time
+import types
+
+import torch
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "dynamic_tagloader"
+
+SECTION_LEN = 77
+EMBED_DIM = 768
+
+
+def gen_empty_tokens(special_tokens, length):
+    start = special_tokens.get("start")
+    end = special_tokens.get("end")
+    pad = special_tokens.get("pad")
+    output = []
+    if start is not None:
+        output.append(start)
+    if end is not None:
+        output.append(end)
+    output += [pad] * (length - len(output))
+    return output
+
+
+class FakeClipEncoder(torch.nn.Module):
+    """模擬 SDClipModel：encode() 接收批次 token id，回傳 (z, pooled)"""
+
+    def __init__(self, vocab_size=49408, dim=EMBED_DIM, layers=2, seed=0):
+        super().__init__()
+        generator = torch.Generator().manual_seed(seed)
+        self.special_tokens = {"start": 49406, "end": 49407, "pad": 49407}
+        # 與 SDClipModel 相同：由 clip options 設定執行裝置，None 時使用權重所在的裝置
+        self.execution_device = None
+        self.last_device = None
+        self.embedding = torch.nn.Embedding(vocab_size, dim)
+        self.layers = torch.nn.ModuleList(torch.nn.Linear(dim, dim) for _ in range(layers))
+        with torch.no_grad():
+            self.embedding.weight.copy_(torch.randn(vocab_size, dim, generator=generator) * 0.02)
+            for layer in self.layers:
+                layer.weight.copy_(torch.randn(dim, dim, generator=generator) * 0.02)
+                layer.bias.zero_()
+
+    @torch.no_grad()
+    def encode(self, tokens):
+        device = self.execution_device if self.execution_device is not None else self.embedding.weight.device
+        self.last_device = device
+        x = self.embedding(torch.tensor(tokens, dtype=torch.long, device=device))
+        for layer in self.layers:
+            x = torch.tanh(layer(x)) + x
+        return x, x[:, -1]
+
+
+class FakeStageModel:
+    """模擬 SD1ClipModel：以 clip_name / clip 屬性包裝單一編碼器"""
+
+    def __init__(self, encoder):
+        self.clip_name = "l"
+        self.clip = "clip_l"
+        self.clip_l = encoder
+        self.options = {}
+
+    def reset_clip_options(self):
+        self.options = {}
+        self.clip_l.execution_device = None
+
+    def set_clip_options(self, options):
+        self.options.update(options)
+        self.clip_l.execution_device = options.get("execution_device", self.clip_l.execution_device)
+
+    def encode_token_weights(self, token_weight_pairs):
+        encoder = self.clip_l
+        pairs = token_weight_pairs[self.clip_name]
+        to_encode = []
+        max_token_len = 0
+        has_weights = False
+        for x in pairs:
+            tokens = [a[0] for a in x]
+            max_token_len = max(len(tokens), max_token_len)
+            has_weights = has_weights or not all(a[1] == 1.0 for a in x)
+            to_encode.append(tokens)
+        sections = len(to_encode)
+        if has_weights or sections == 0:
+            to_encode.append(gen_empty_tokens(encoder.special_tokens, max_token_len))
+        out, pooled = encoder.encode(to_encode)
+        first_pooled = pooled[0:1]
+        output = []
+        for k in range(sections):
+            z = out[k:k + 1]
+            if has_weights:
+                z_empty = out[-1]
+                for i in range(len(z)):
+                    for j in range(len(z[i])):
+                        weight = pairs[k][j][1]
+                        if weight != 1.0:
+                            z[i][j] = (z[i][j] - z_empty[j]) * weight + z_empty[j]
+            output.append(z)
+        if not output:
+            return out[-1:], first_pooled
+        return torch.cat(output, dim=-2), first_pooled
+
+
+class FakeModelPatcher:
+    """模擬 comfy.model_patcher.ModelPatcher：clone() 僅複製 Patch 清單，權重共用"""
+
+    live_clones = 0
+
+    def __init__(self):
+        self.patches = ()
+        FakeModelPatcher.live_clones += 1
+
+    def clone(self):
+        n = FakeModelPatcher()
+        n.patches = self.patches
+        return n
+
+    def __del__(self):
+        FakeModelPatcher.live_clones -= 1
+
+
+class _Routes:
+    """模擬 aiohttp RouteTableDef：記錄已註冊的處理函數供基準測試直接呼叫"""
+
+    def __init__(self):
+        self.handlers = {}
+
+    def _register(self, method, path):
+        def decorator(fn):
+            self.handlers[(method, path)] = fn
+            return fn
+        return decorator
+
+    def get(self, path):
+        return self._register("GET", path)
+
+    def post(self, path):
+        return self._register("POST", path)
+
+
+class FakeRequest:
+    """最小化的 aiohttp Request 替身"""
+
+    def __init__(self, query=None, headers=None, body=None):
+        self.query = query or {}
+        self.headers = headers or {}
+        self._body = body
+
+    async def json(self):
+        return self._body
+
+
+class FakeCLIP:
+    """模擬 comfy.sd.CLIP：確定性的 tokenize 與 encode 成本"""
+
+    def __init__(self, encoder=None, load_overhead=0.001):
+        self.cond_stage_model = FakeStageModel(encoder or FakeClipEncoder())
+        self.layer_idx = None
+        self.patcher = types.SimpleNamespace(load_device=torch.device("cpu"))
+        self.load_overhead = load_overhead
+        self.patches = ()
+        self.tokenize_calls = 0
+        self.encode_calls = 0
+
+    def clone(self):
+        n = FakeCLIP.__new__(FakeCLIP)
+        n.__dict__.update(self.__dict__)
+        return n
+
+    def tokenize(self, text):
+        self.tokenize_calls += 1
+        special = self.cond_stage_model.clip_l.special_tokens
+        words = text.replace(",", " ").split()
+        ids = [sum(ord(c) for c in w) % 49000 for w in words]
+        sections = []
+        body = SECTION_LEN - 2
+        for start in range(0, max(len(ids), 1), body):
+            chunk = ids[start:start + body]
+            section = [(special["start"], 1.0)] + [(i, 1.0) for i in chunk] + [(special["end"], 1.0)]
+            section += [(special["pad"], 1.0)] * (SECTION_LEN - len(section))
+            sections.append(section)
+        return {"l": sections}
+
+    def load_model(self):
+        # 模擬 model_management.load_model_gpu 的固定開銷
+        time.sleep(self.load_overhead)
+
+    def encode_from_tokens(self, tokens, return_pooled=False):
+        self.encode_calls += 1
+        self.cond_stage_model.reset_clip_options()
+        if self.layer_idx is not None:
+            self.cond_stage_model.set_clip_options({"layer": self.layer_idx})
+        self.load_model()
+        self.cond_stage_model.set_clip_options({"execution_device": self.patcher.load_device})
+        cond, pooled = self.cond_stage_model.encode_token_weights(tokens)
+        if return_pooled:
+            return cond, pooled
+        return cond
+
+
+def install_stubs(loras_dir=None):
+    """註冊 Stub 模組至 sys.modules (重複呼叫時只更新 loras 路徑)"""
+    folder_paths = sys.modules.get("folder_paths")
+    if folder_paths is None or not getattr(folder_paths, "_is_stub", False):
+        folder_paths = types.ModuleType("folder_paths")
+        folder_paths._is_stub = True
+        folder_paths.folder_names = {"loras": []}
+
+        def get_folder_paths(name):
+            return list(folder_paths.folder_names.get(name, []))
+
+        def get_filename_list(name):
+            result = []
+            for base in folder_paths.folder_names.get(name, []):
+                for root, _, files in os.walk(base):
+                    for f in files:
+                        result.append(os.path.relpath(os.path.join(root, f), base).replace("\\", "/"))
+            return sorted(result)
+
+        def get_full_path(name, filename):
+            for base in folder_paths.folder_names.get(name, []):
+                path = os.path.join(base, filename)
+                if os.path.isfile(path):
+                    return path
+            return None
+
+        folder_paths.get_folder_paths = get_folder_paths
+        folder_paths.get_filename_list = get_filename_list
+        folder_paths.get_full_path = get_full_path
+        folder_paths.get_input_directory = lambda: os.path.join(REPO_DIR, "benchmarks", "_input")
+        folder_paths.get_output_directory = lambda: os.path.join(REPO_DIR, "benchmarks", "_output")
+        sys.modules["folder_paths"] = folder_paths
+
+        comfy = types.ModuleType("comfy")
+        comfy.__path__ = []
+        utils = types.ModuleType("comfy.utils")
+        sd = types.ModuleType("comfy.sd")
+        model_management = types.ModuleType("comfy.model_management")
+        sd1_clip = types.ModuleType("comfy.sd1_clip")
+
+        def load_torch_file(path, safe_load=False):
+            return torch.load(path, map_location="cpu", weights_only=True)
+
+        def load_lora_for_models(model, clip, lora, strength_model, strength_clip):
+            # 模擬 Patch 成本：走訪每個 LoRA 張量
+            for value in lora.values():
+                value.sum()
+            new_model = model.clone() if model is not None else None
+            new_clip = clip.clone() if clip is not None else None
+            key = (len(lora), strength_model, strength_clip)
+            if new_model is not None:
+                new_model.patches = new_model.patches + (key,)
+            if new_clip is not None:
+                new_clip.patches = new_clip.patches + (key,)
+            return new_model, new_clip
+
+        utils.load_torch_file = load_torch_file
+        sd.load_lora_for_models = load_lora_for_models
+        model_management.intermediate_device = lambda: torch.device("cpu")
+        sd1_clip.gen_empty_tokens = gen_empty_tokens
+        comfy.utils, comfy.sd = utils, sd
+        comfy.model_management, comfy.sd1_clip = model_management, sd1_clip
+        sys.modules.update({
+            "comfy": comfy,
+            "comfy.utils": utils,
+            "comfy.sd": sd,
+            "comfy.model_management": model_management,
+            "comfy.sd1_clip": sd1_clip,
+        })
+
+    if "server" not in sys.modules:
+        server = types.ModuleType("server")
+        server.PromptServer = type("PromptServer", (), {"instance": types.SimpleNamespace(routes=_Routes())})
+        sys.modules["server"] = server
+
+    if loras_dir is not None:
+        folder_paths.folder_names["loras"] = [loras_dir]
+    return folder_paths
+
+
+def route_handler(method, path):
+    """取得節點註冊的 API 處理函數 (需已安裝 aiohttp)"""
+    return sys.modules["server"].PromptServer.instance.routes.handlers[(method, path)]
+
+
+def use_tags_dir(package, tags_dir):
+    """將 Loader / Saver / 標籤庫索引的根目錄切換至指定的合成標籤庫"""
+    tags_dir = os.path.abspath(tags_dir)
+    for name in ("loader_node", "saver_node", "tag_library", "pack_node"):
+        module = sys.modules.get(f"{package.__name__}.{name}")
+        if module is not None and hasattr(module, "TAGS_DIR"):
+            module.TAGS_DIR = tags_dir
+    library = sys.modules[f"{package.__name__}.tag_library"].TAG_LIBRARY
+    library.__init__(tags_dir)
+
+
+def load_package():
+    """以套件形式載入節點 (支援模組內的相對匯入)"""
+    install_stubs()
+    if PACKAGE_NAME in sys.modules:
+        return sys.modules[PACKAGE_NAME]
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE_NAME, os.path.join(REPO_DIR, "__init__.py"), submodule_search_locations=[REPO_DIR]
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE_NAME] = package
+    spec.loader.exec_module(package)
+    return package
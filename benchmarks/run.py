@@ -0,0 +1,258 @@
+"""
+離線基準測試套件：以 Stub 取代 ComfyUI，量測各節點與 API 路由在不同規模下的耗時。
+
+情境 (Scenario)：
+  loader    DynamicTagLoaderJS.process  (群組數 / 每資料夾檔案數 / 每檔案 LoRA 數，冷啟動與暖快取)
+  iterator  DynamicTagIterator.process  (輸入列表長度 x 抽樣策略)
+  extractor ImageWorkflowExtractor.extract_info (圖片目錄大小)
+  saver     DynamicTagSaver.save_tag    (同名檔案重複存檔)
+  tags_api  /custom_nodes/tags 路由     (首次請求 / 304 重新驗證)
+
+用法:
+  python benchmarks/run.py [--scenarios loader,iterator] [--repeat 3] [--output results.json]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import torch
+import synth
+from comfy_stubs import FakeCLIP, FakeModelPatcher, FakeRequest, install_stubs, load_package, route_handler, use_tags_dir
+
+SCENARIOS = ["loader", "iterator", "extractor", "saver", "tags_api"]
+
+
+def measure(fn, repeat):
+    """執行 fn repeat 次，回傳各次耗時 (秒) 與最後一次的回傳值"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def summarize(times):
+    return {
+        "runs": len(times),
+        "min_ms": min(times) * 1000,
+        "median_ms": statistics.median(times) * 1000,
+        "max_ms": max(times) * 1000,
+    }
+
+
+def tag_settings_for(folders, file_name="ALL"):
+    return json.dumps({str(i): {"type": "file", "folder": name, "file": file_name} for i, name in enumerate(folders)})
+
+
+def reset_caches(package):
+    modules = sys.modules
+    modules[f"{package.__name__}.lora_cache"].LORA_CACHE.clear()
+    modules[f"{package.__name__}.conditioning_cache"].CONDITIONING_CACHE.clear()
+    tag_parser = modules[f"{package.__name__}.tag_parser"]
+    with tag_parser._cache_lock:
+        tag_parser._parse_cache.clear()
+    library = modules[f"{package.__name__}.tag_library"].TAG_LIBRARY
+    library.__init__(library.root)
+
+
+# -----------------------------------------------------------
+# 情境實作
+# -----------------------------------------------------------
+def bench_loader(package, workdir, args):
+    loader_module = sys.modules[f"{package.__name__}.loader_node"]
+    results = []
+    loras_dir = os.path.join(workdir, "loras")
+    synth.generate_loras(loras_dir, args.lora_pool)
+    install_stubs(loras_dir)
+
+    for groups in args.groups:
+        for files in args.files:
+            for loras in args.loras:
+                tags_dir = os.path.join(workdir, f"tags_g{groups}_f{files}_l{loras}")
+                folders = synth.generate_tag_library(tags_dir, groups, files, loras=loras, lora_pool=args.lora_pool)
+                use_tags_dir(package, tags_dir)
+                settings = tag_settings_for(folders)
+                node = loader_module.DynamicTagLoaderJS()
+                model, clip = FakeModelPatcher(), FakeCLIP(load_overhead=0)
+
+                def run():
+                    return node.process("masterpiece, <lora:lora_0:0.5>", settings, model=model, clip=clip,
+                                        selection=args.selection, selection_seed=0, sample_count=args.sample_count,
+                                        encode_batch_size=args.batch_size)
+
+                reset_caches(package)
+                cold_times, output = measure(run, 1)
+                warm_times, output = measure(run, args.repeat)
+                results.append({
+                    "groups": groups, "files_per_folder": files, "loras_per_file": loras,
+                    "selection": args.selection, "outputs": len(output["result"][3]),
+                    "total_combinations": output["ui"]["total_combinations"][0],
+                    "cold": summarize(cold_times), "warm": summarize(warm_times),
+                    "profile": output["ui"]["profile"][0],
+                })
+                print(f"  loader g={groups} f={files} l={loras}: cold {cold_times[0] * 1000:.1f}ms, "
+                      f"warm {statistics.median(warm_times) * 1000:.1f}ms")
+    return results
+
+
+def bench_iterator(package, workdir, args):
+    iterator_module = sys.modules[f"{package.__name__}.iterator_node"]
+    sampling = sys.modules[f"{package.__name__}.sampling"]
+    node = iterator_module.DynamicTagIterator()
+    results = []
+    for size in args.iterator_sizes:
+        items = list(range(size))
+        for strategy in sampling.SAMPLE_STRATEGIES:
+            def run():
+                return node.process(items, items, items, [str(i) for i in items], ["Batch (List)"],
+                                    [args.sample_limit], [0], [strategy])
+
+            times, output = measure(run, args.repeat)
+            results.append({"items": size, "strategy": strategy, "sample_limit": args.sample_limit,
+                            "outputs": len(output["result"][3]), **summarize(times)})
+            print(f"  iterator n={size} {strategy}: {statistics.median(times) * 1000:.2f}ms")
+    return results
+
+
+def bench_extractor(package, workdir, args):
+    extractor_module = sys.modules[f"{package.__name__}.image_info_node"]
+    node = extractor_module.ImageWorkflowExtractor()
+    results = []
+    for count in args.images:
+        image_dir = os.path.join(workdir, f"images_{count}")
+        synth.generate_images(image_dir, count, size=args.image_size)
+        for search_by, query in (("ID", "1,2,3"), ("Type", "CLIPTextEncode")):
+            times, _ = measure(lambda: node.extract_info(image_dir, search_by, query, 0), args.repeat)
+            results.append({"images": count, "search_by": search_by, **summarize(times)})
+            print(f"  extractor images={count} by {search_by}: {statistics.median(times) * 1000:.1f}ms")
+    return results
+
+
+def bench_saver(package, workdir, args):
+    saver_module = sys.modules[f"{package.__name__}.saver_node"]
+    tags_dir = os.path.join(workdir, "saver_tags")
+    use_tags_dir(package, tags_dir)
+    node = saver_module.DynamicTagSaver()
+    settings = json.dumps({"0": {"lora_name": "lora_0", "strength": 0.8}})
+    times = []
+    for i in range(args.saves):
+        start = time.perf_counter()
+        node.save_tag(f"prompt {i}, best quality", "bench", "same_name", settings)
+        times.append(time.perf_counter() - start)
+    # 前段與後段分開統計，觀察同名檔案增加時流水號探測的成本
+    half = max(len(times) // 2, 1)
+    result = {"saves": args.saves, "first_half": summarize(times[:half]), "second_half": summarize(times[half:] or times)}
+    print(f"  saver saves={args.saves}: first half {result['first_half']['median_ms']:.2f}ms, "
+          f"second half {result['second_half']['median_ms']:.2f}ms")
+    return [result]
+
+
+def bench_tags_api(package, workdir, args):
+    try:
+        handler = route_handler("GET", "/custom_nodes/tags")
+    except KeyError:
+        print("  tags_api: skipped (aiohttp not installed, routes not registered)")
+        return []
+    results = []
+    for folders in args.api_folders:
+        tags_dir = os.path.join(workdir, f"api_tags_{folders}")
+        synth.generate_tag_library(tags_dir, folders, args.api_files)
+        use_tags_dir(package, tags_dir)
+
+        def first():
+            return asyncio.run(handler(FakeRequest()))
+
+        cold_times, response = measure(first, 1)
+        etag = response.headers.get("ETag")
+        warm_times, _ = measure(first, args.repeat)
+        revalidate_times, response = measure(lambda: asyncio.run(handler(FakeRequest(headers={"If-None-Match": etag}))), args.repeat)
+        results.append({"folders": folders, "files_per_folder": args.api_files,
+                         "cold": summarize(cold_times), "warm": summarize(warm_times),
+                         "not_modified": summarize(revalidate_times), "not_modified_status": response.status})
+        print(f"  tags_api folders={folders}: cold {cold_times[0] * 1000:.1f}ms, "
+              f"warm {statistics.median(warm_times) * 1000:.2f}ms, 304 {statistics.median(revalidate_times) * 1000:.2f}ms")
+    return results
+
+
+BENCHES = {
+    "loader": bench_loader,
+    "iterator": bench_iterator,
+    "extractor": bench_extractor,
+    "saver": bench_saver,
+    "tags_api": bench_tags_api,
+}
+
+
+def int_list(text):
+    return [int(x) for x in text.split(",") if x]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None, help="將結果寫入 JSON 檔案")
+    parser.add_argument("--workdir", default=None, help="合成資料目錄 (預設使用暫存目錄並於結束時刪除)")
+    # loader
+    parser.add_argument("--groups", type=int_list, default=[1, 2, 3])
+    parser.add_argument("--files", type=int_list, default=[10, 50])
+    parser.add_argument("--loras", type=int_list, default=[0, 3])
+    parser.add_argument("--lora-pool", type=int, default=20)
+    parser.add_argument("--selection", default="Random Sample")
+    parser.add_argument("--sample-count", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=8)
+    # iterator
+    parser.add_argument("--iterator-sizes", type=int_list, default=[1000, 100000])
+    parser.add_argument("--sample-limit", type=int, default=16)
+    # extractor
+    parser.add_argument("--images", type=int_list, default=[10, 100])
+    parser.add_argument("--image-size", type=int, default=256)
+    # saver
+    parser.add_argument("--saves", type=int, default=200)
+    # tags_api
+    parser.add_argument("--api-folders", type=int_list, default=[10, 100])
+    parser.add_argument("--api-files", type=int, default=20)
+    args = parser.parse_args()
+
+    install_stubs()
+    package = load_package()
+    workdir = args.workdir or tempfile.mkdtemp(prefix="tagloader_bench_")
+    os.makedirs(workdir, exist_ok=True)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "torch": torch.__version__,
+        "args": vars(args),
+        "results": {},
+    }
+    try:
+        with torch.inference_mode():
+            for name in [s for s in args.scenarios.split(",") if s]:
+                print(f"[{name}]")
+                report["results"][name] = BENCHES[name](package, workdir, args)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+合成測試資料產生器：標籤庫、LoRA 檔案與含 Workflow Metadata 的 PNG 圖片。
+"""
+import json
+import os
+import random
+
+WORDS = [f"tag_{i}" for i in range(2000)]
+
+
+def generate_tag_library(root, folders, files, loras=0, lora_pool=50, seed=0):
+    """
+    產生標籤庫：root/folder_XXX/file_XXXXX.txt
+
+    Args:
+        folders (int): 資料夾數量
+        files (int): 每個資料夾的檔案數量
+        loras (int): 每個檔案最多引用的 LoRA 數量
+        lora_pool (int): LoRA 名稱池大小 (lora_0 ~ lora_{n-1})
+    Returns:
+        list: 產生的資料夾名稱
+    """
+    rng = random.Random(seed)
+    names = []
+    for d in range(folders):
+        name = f"folder_{d:03d}"
+        folder = os.path.join(root, name)
+        os.makedirs(folder, exist_ok=True)
+        for f in range(files):
+            lines = [", ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 80)))]
+            for _ in range(rng.randint(0, loras) if loras else 0):
+                lines.append(f"<lora:lora_{rng.randrange(lora_pool)}:{rng.uniform(-1, 1.5):.2f}>")
+            with open(os.path.join(folder, f"file_{f:05d}.txt"), "w", encoding="utf-8") as fh:
+                fh.write("\n\n".join(lines))
+        names.append(name)
+    return names
+
+
+def generate_loras(root, count, tensors=8, dim=64, seed=0):
+    """產生 count 個假的 LoRA 權重檔 (lora_X.safetensors，以 torch.save 儲存)"""
+    import torch
+
+    generator = torch.Generator().manual_seed(seed)
+    os.makedirs(root, exist_ok=True)
+    for i in range(count):
+        state_dict = {
+            f"layer_{t}.lora_up.weight": torch.randn(dim, 4, generator=generator)
+            for t in range(tensors)
+        }
+        torch.save(state_dict, os.path.join(root, f"lora_{i}.safetensors"))
+
+
+def make_workflow(seed, node_count=30):
+    rng = random.Random(seed)
+    nodes = []
+    for node_id in range(1, node_count + 1):
+        node_type = rng.choice(["CLIPTextEncode", "KSampler", "CheckpointLoaderSimple", "SaveImage", "ShowText"])
+        if node_type == "CLIPTextEncode":
+            values = [", ".join(rng.choice(WORDS) for _ in range(40))]
+        elif node_type == "KSampler":
+            values = [rng.randrange(1 << 32), "fixed", 20, 7.0, "euler", "normal", 1.0]
+        else:
+            values = [f"value_{rng.randrange(1000)}"]
+        nodes.append({"id": node_id, "type": node_type, "widgets_values": values})
+    return {"nodes": nodes, "links": [], "version": 0.4}
+
+
+def generate_images(root, count, size=512, seed=0):
+    """產生 count 張帶有 workflow / prompt 文字區塊的 PNG 圖片"""
+    from PIL import Image
+    from PIL.PngImagePlugin import PngInfo
+
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    for i in range(count):
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        image = Image.new("RGB", (size, size), color)
+        workflow = make_workflow(seed + i)
+        meta = PngInfo()
+        meta.add_text("prompt", json.dumps({str(n["id"]): {"class_type": n["type"]} for n in workflow["nodes"]}))
+        meta.add_text("workflow", json.dumps(workflow))
+        image.save(os.path.join(root, f"image_{i:06d}.png"), pnginfo=meta, compress_level=1)
@@ -0,0 +1,73 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+def budget_from_env(env_name, default_mb):
+    """由環境變數讀取快取容量 (單位 MB)，回傳位元組數"""
+    return int(os.environ.get(env_name, str(default_mb))) * 1024 * 1024
+
+
+class ByteBudgetCache:
+    """
+    依位元組預算執行 LRU 淘汰的快取基底 (LoRA 權重 / Conditioning / 圖片張量快取共用)。
+    1. 項目以 key -> (值, 位元組數) 保存，超出預算時由最久未使用的項目開始淘汰。
+    2. 單一項目超過總預算時不放入快取。
+    3. 提供 hit / miss / eviction 計數，供節點輸出統計資訊。
+    子類別負責鍵值的組成與值的建立，並在持有 self._lock 時呼叫 _lookup_locked / _insert_locked。
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._lock = threading.Lock()
+
+    def _lookup_locked(self, key):
+        """查詢並更新 LRU 順序與命中統計，未命中時回傳 None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def _insert_locked(self, key, value, nbytes):
+        """寫入項目 (已存在或超過總預算時略過)，並淘汰超出預算的項目"""
+        if nbytes > self.budget_bytes or key in self._entries:
+            return
+        self._entries[key] = (value, nbytes)
+        self.current_bytes += nbytes
+        while self._entries and self.current_bytes > self.budget_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted
+            self.evictions += 1
+
+    def _drop_locked(self, predicate):
+        """釋放鍵值符合條件的項目 (不可能再命中的舊版本，不計入淘汰次數)"""
+        for key in [k for k in self._entries if predicate(k)]:
+            _, nbytes = self._entries.pop(key)
+            self.current_bytes -= nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """回傳快取統計資訊 (可序列化為 JSON)"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
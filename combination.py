@@ -0,0 +1,167 @@
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+from .sampling import sample_indices, stratified_sample
+
+
+class CombinationSpace:
+    """
+    惰性 (Lazy) 組合空間：以混合進位制 (Mixed-Radix) 表示多個標籤群組的笛卡兒積。
+    1. 不展開 itertools.product，組合總數以各群組大小相乘計算。
+    2. 任意索引可在 O(群組數) 時間內解碼為對應組合。
+    3. 索引順序與 itertools.product(*groups) 完全一致 (最後一個群組變化最快)。
+    """
+
+    def __init__(self, groups):
+        """
+        Args:
+            groups (list): 各群組的候選項目列表 [[item, ...], ...]
+        """
+        self.groups = [list(g) for g in groups]
+        self.radices = [len(g) for g in self.groups]
+        total = 1
+        for radix in self.radices:
+            total *= radix
+        self.total = total
+
+    def __len__(self):
+        # len() 受限於 sys.maxsize，極大空間請直接使用 .total
+        return self.total
+
+    def decode(self, index):
+        """
+        將組合索引解碼為各群組的選取位置。
+
+        Args:
+            index (int): 0 <= index < total
+        Returns:
+            list: 各群組的選取位置 [digit, ...]
+        """
+        if index < 0 or index >= self.total:
+            raise IndexError(f"Combination index {index} out of range (total {self.total})")
+        digits = [0] * len(self.radices)
+        for pos in range(len(self.radices) - 1, -1, -1):
+            index, digits[pos] = divmod(index, self.radices[pos])
+        return digits
+
+    def encode(self, digits):
+        """decode 的反函數：由各群組的選取位置計算組合索引"""
+        index = 0
+        for digit, radix in zip(digits, self.radices):
+            index = index * radix + digit
+        return index
+
+    def __getitem__(self, index):
+        return tuple(group[d] for group, d in zip(self.groups, self.decode(index)))
+
+    def __iter__(self):
+        for index in range(self.total):
+            yield self[index]
+
+    def select(self, mode, seed=0, count=1):
+        """
+        依選取模式回傳需要實體化的組合索引。
+
+        Args:
+            mode (str): "All Combinations" / "Single Index" / "Random Sample" / "Stratified Sample"
+            seed (int): Single Index 模式為索引 (取模)，抽樣模式為隨機種子
+            count (int): 抽樣模式的抽樣數量
+        Returns:
+            list or range: 組合索引序列
+        """
+        if self.total == 0:
+            return []
+        if mode == "Single Index":
+            return [seed % self.total]
+        if mode == "Random Sample":
+            # Floyd 抽樣：僅記錄已抽中的索引，時間與記憶體皆為 O(k)
+            return sample_indices(self.total, max(count, 1), seed, "Floyd")
+        if mode == "Stratified Sample":
+            # 分層抽樣：每個群組中的每個檔案至少出現一次
+            return stratified_sample(self, max(count, 1), seed)
+        return range(self.total)
+
+
+class PrunedSpace(CombinationSpace):
+    """
+    受規則限制的組合空間：只包含符合規則的組合，索引順序與 CombinationSpace 中符合規則的組合順序一致。
+    1. 依群組順序逐層選取，部分組合違反規則時整個子空間 (之後群組的所有組合) 直接剪枝，不逐一展開。
+    2. 以 (群組位置, 規則狀態) 記憶各子空間的有效組合數，相同狀態的前綴共用同一份計數；
+       同一群組中等價的項目 (rules.classes) 只檢查一次。
+    3. 解碼時逐層以累計數量二分搜尋，時間為 O(群組數 × log 群組大小)。
+    """
+
+    def __init__(self, groups, rules):
+        """
+        Args:
+            groups (list): 各群組的候選項目列表 [[item, ...], ...]
+            rules: 規則檢查器，提供 start()、advance(state, depth, digit) (違反規則時回傳 None)
+                   與 classes (各群組每個項目的等價類別，類別相同的項目 advance 結果相同)
+        """
+        super().__init__(groups)
+        self.rules = rules
+        self.unpruned_total = self.total
+        # 各群組的等價類別編號 (每個項目) 與各類別的代表項目
+        self._class_ids = []
+        self._class_reps = []
+        for depth in range(len(self.radices)):
+            ids = {}
+            reps = {}
+            for digit, item_class in enumerate(rules.classes[depth]):
+                reps.setdefault(ids.setdefault(item_class, len(ids)), digit)
+            self._class_ids.append([ids[item_class] for item_class in rules.classes[depth]])
+            self._class_reps.append(list(reps.values()))
+        # (群組位置, 狀態) -> (有效組合數, 可選位置, 下一層狀態, 累計組合數)
+        self._nodes = {}
+        self._start = rules.start()
+        self.total = self._node(0, self._start)[0] if self._start is not None else 0
+
+    def _node(self, depth, state):
+        if depth == len(self.radices):
+            return (1, None, None, None)
+        key = (depth, state)
+        node = self._nodes.get(key)
+        if node is not None:
+            return node
+        # 每個等價類別只檢查代表項目一次，再展開為各項目的累計數量
+        outcomes = []
+        for digit in self._class_reps[depth]:
+            next_state = self.rules.advance(state, depth, digit)
+            outcomes.append((next_state, self._node(depth + 1, next_state)[0] if next_state is not None else 0))
+        class_ids = self._class_ids[depth]
+        digits = [digit for digit, class_id in enumerate(class_ids) if outcomes[class_id][1]]
+        states = [outcomes[class_ids[digit]][0] for digit in digits]
+        cumulative = list(accumulate(outcomes[class_ids[digit]][1] for digit in digits))
+        node = (cumulative[-1] if cumulative else 0, digits, states, cumulative)
+        self._nodes[key] = node
+        return node
+
+    def decode(self, index):
+        if index < 0 or index >= self.total:
+            raise IndexError(f"Combination index {index} out of range (total {self.total})")
+        digits = []
+        state = self._start
+        for depth in range(len(self.radices)):
+            _, node_digits, states, cumulative = self._node(depth, state)
+            pos = bisect_right(cumulative, index)
+            if pos:
+                index -= cumulative[pos - 1]
+            digits.append(node_digits[pos])
+            state = states[pos]
+        return digits
+
+    def encode(self, digits):
+        """decode 的反函數；組合違反規則時回傳 None"""
+        if self._start is None:
+            return None
+        index = 0
+        state = self._start
+        for depth, digit in enumerate(digits):
+            _, node_digits, states, cumulative = self._node(depth, state)
+            pos = bisect_left(node_digits, digit)
+            if pos == len(node_digits) or node_digits[pos] != digit:
+                return None
+            if pos:
+                index += cumulative[pos - 1]
+            state = states[pos]
+        return index
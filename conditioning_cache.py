@@ -0,0 +1,66 @@
+import weakref
+
+from .byte_cache import ByteBudgetCache, budget_from_env
+
+# -----------------------------------------------------------
+# 快取容量配置 (可透過環境變數調整，單位 MB)
+# -----------------------------------------------------------
+DEFAULT_BUDGET_BYTES = budget_from_env("DYNAMIC_TAGLOADER_COND_CACHE_MB", 512)
+
+
+def _tensor_nbytes(tensor):
+    try:
+        return tensor.numel() * tensor.element_size()
+    except AttributeError:
+        return 0
+
+
+class ConditioningCache(ByteBudgetCache):
+    """
+    文本編碼 (Conditioning) 記憶體快取。
+    鍵值：(基礎 CLIP 識別碼, 有序 LoRA 疊加 (檔案識別與強度), Prompt 文本)
+    1. 相同 CLIP + LoRA 疊加 + Prompt 的組合直接重用已編碼的張量。
+    2. 依張量總位元組數執行 LRU 淘汰 (ByteBudgetCache)。
+    3. 基礎 CLIP 被回收時，自動清除其所屬的快取項目，避免 id() 重複使用造成誤命中。
+    """
+
+    def __init__(self, budget_bytes):
+        super().__init__(budget_bytes)
+        self._tracked_clips = {}  # id(clip) -> weakref.finalize
+
+    def clip_identity(self, clip):
+        """
+        取得基礎 CLIP 的穩定識別碼：以 id() 為主，並註冊回收通知。
+        無法建立弱參照的物件回傳 None (代表不使用快取)。
+        """
+        clip_id = id(clip)
+        with self._lock:
+            if clip_id in self._tracked_clips:
+                return clip_id
+        try:
+            finalizer = weakref.finalize(clip, self._forget_clip, clip_id)
+        except TypeError:
+            return None
+        finalizer.atexit = False
+        with self._lock:
+            self._tracked_clips[clip_id] = finalizer
+        return clip_id
+
+    def _forget_clip(self, clip_id):
+        with self._lock:
+            self._tracked_clips.pop(clip_id, None)
+            self._drop_locked(lambda k: k[0] == clip_id)
+
+    def get(self, key):
+        """查詢快取，回傳 (cond, pooled)，未命中時回傳 None"""
+        with self._lock:
+            return self._lookup_locked(key)
+
+    def put(self, key, cond, pooled):
+        nbytes = _tensor_nbytes(cond) + _tensor_nbytes(pooled)
+        with self._lock:
+            self._insert_locked(key, (cond, pooled), nbytes)
+
+
+# 全域共享實例：跨 process() 呼叫與所有 Loader 節點實例共用
+CONDITIONING_CACHE = ConditioningCache(DEFAULT_BUDGET_BYTES)
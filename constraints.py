@@ -0,0 +1,214 @@
+# -----------------------------------------------------------
+# 組合規則 (Constraint Rules)
+# tag_settings 中的設定格式：
+#   群組: {"type": "file", "folder": "outfits", "file": "ALL",
+#          "rules": {"swimsuit.txt": {"exclude": ["backgrounds/snow.txt"], "require": ["backgrounds/beach.txt"]},
+#                    "*": {...}}}
+#     - 鍵為該群組的檔名 ("*" 代表該群組的任何項目)，引用其他群組的檔案以 "資料夾/檔名" 表示。
+#     - exclude: 選到此項目時，不可同時選到列出的任一檔案。
+#     - require: 選到此項目時，必須同時選到列出的其中一個檔案 (列出的檔案都不在任何群組中時忽略此規則)。
+#   全域: "limits": {"max_loras": 3, "max_lora_weight": 2.0}
+#     - LoRA 疊加 (含全域輸入的 LoRA) 的數量上限與模型權重絕對值總和上限，0 = 不限制。
+# -----------------------------------------------------------
+LIMITS_KEY = "limits"
+ANY_FILE = "*"
+
+
+def file_label(folder_name, file_name):
+    """群組項目的識別名稱 ("資料夾/檔名")，規則中的引用以相同格式比對"""
+    return normalize_ref(f"{folder_name}/{file_name}")
+
+
+def normalize_ref(ref):
+    return str(ref).strip().replace("\\", "/").strip("/")
+
+
+def _ref_list(value):
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, (list, tuple)):
+        return []
+    return [normalize_ref(ref) for ref in value if str(ref).strip()]
+
+
+def item_rules(rules_spec, file_name):
+    """
+    取得群組中某個項目適用的規則 (該檔名的規則 + "*" 規則)。
+
+    Args:
+        rules_spec (dict): 群組設定中的 "rules"
+        file_name (str): 項目的檔名 (純文本群組為 None，僅適用 "*" 規則)
+    Returns:
+        tuple: (排除的檔案列表, 需求規則列表 [[檔案, ...], ...])
+    """
+    excludes = []
+    requires = []
+    if not isinstance(rules_spec, dict):
+        return excludes, requires
+    for key in (file_name, ANY_FILE):
+        rule = rules_spec.get(key) if key is not None else None
+        if not isinstance(rule, dict):
+            continue
+        excludes.extend(_ref_list(rule.get("exclude", [])))
+        required = _ref_list(rule.get("require", []))
+        if required:
+            requires.append(required)
+    return excludes, requires
+
+
+def parse_limits(settings):
+    """由 tag_settings 讀取 LoRA 疊加上限，回傳 (數量上限, 權重總和上限)，0 = 不限制"""
+    limits = settings.get(LIMITS_KEY)
+    if not isinstance(limits, dict):
+        return 0, 0.0
+    try:
+        max_loras = max(int(limits.get("max_loras", 0) or 0), 0)
+        max_weight = max(float(limits.get("max_lora_weight", 0) or 0), 0.0)
+    except (TypeError, ValueError):
+        return 0, 0.0
+    return max_loras, max_weight
+
+
+class ComboRules:
+    """
+    組合規則的逐群組檢查器 (供 PrunedSpace 使用)：依群組順序選取項目，部分組合違反規則時立即剪枝。
+    狀態只保留之後的群組仍會用到的資訊，使不同前綴可共用相同的後綴計數：
+        (禁止的檔案, 已選且之後仍被引用的檔案, 尚未滿足的需求, LoRA 數量, LoRA 權重總和)
+    LoRA 數量 / 權重在之後的群組全部取最大值也不會超過上限時記為 None (之後不再檢查)。
+    """
+
+    def __init__(self, labels, rules, loras, base_loras, max_loras=0, max_lora_weight=0.0):
+        """
+        Args:
+            labels (list): 各群組每個項目的識別名稱 [[label or None, ...], ...]
+            rules (list): 各群組每個項目的規則 [[(排除列表, 需求規則列表), ...], ...]
+            loras (list): 各群組每個項目的 LoRA 列表 [[[(name, strength_model, strength_clip), ...], ...], ...]
+            base_loras (list): 全域輸入的 LoRA 列表
+            max_loras (int): LoRA 疊加數量上限 (0 = 不限制)
+            max_lora_weight (float): LoRA 模型權重絕對值總和上限 (0 = 不限制)
+        """
+        present = {label for group in labels for label in group if label is not None}
+        self.labels = labels
+        self.max_loras = max_loras
+        self.max_weight = max_lora_weight
+
+        # 規則只保留實際存在於群組中的檔案；需求的檔案都不存在時忽略該規則
+        self.excludes = []
+        self.requires = []
+        for group_labels, group_rules in zip(labels, rules):
+            group_excludes = []
+            group_requires = []
+            for label, (excludes, requires) in zip(group_labels, group_rules):
+                group_excludes.append(frozenset(ref for ref in excludes if ref in present and ref != label))
+                group_requires.append(tuple(r for r in (frozenset(ref for ref in req if ref in present) for req in requires) if r))
+            self.excludes.append(group_excludes)
+            self.requires.append(group_requires)
+
+        # avail_after[d]: 第 d 個群組之後仍可能選到的檔案；keep_after[d]: 第 d 個群組之後的規則會引用的檔案
+        count = len(labels)
+        self.avail_after = [frozenset()] * count
+        self.keep_after = [frozenset()] * count
+        avail = set()
+        keep = set()
+        for depth in range(count - 1, -1, -1):
+            self.avail_after[depth] = frozenset(avail)
+            self.keep_after[depth] = frozenset(keep)
+            avail.update(label for label in labels[depth] if label is not None)
+            for excludes in self.excludes[depth]:
+                keep.update(excludes)
+            for requires in self.requires[depth]:
+                for required in requires:
+                    keep.update(required)
+
+        # 各群組項目的 LoRA 數量 / 權重，以及之後的群組最多還會增加多少
+        self.lora_counts = [[len(item) for item in group] for group in loras]
+        self.lora_weights = [[sum(abs(entry[1]) for entry in item) for item in group] for group in loras]
+        self.base_count = len(base_loras)
+        self.base_weight = sum(abs(entry[1]) for entry in base_loras)
+        self.count_after = [0] * count
+        self.weight_after = [0.0] * count
+        for depth in range(count - 2, -1, -1):
+            self.count_after[depth] = self.count_after[depth + 1] + max(self.lora_counts[depth + 1], default=0)
+            self.weight_after[depth] = self.weight_after[depth + 1] + max(self.lora_weights[depth + 1], default=0.0)
+
+        # 等價類別：未被任何規則引用、自身沒有規則且 LoRA 數量 / 權重相同的項目，對任何狀態的結果都相同
+        referenced = set()
+        for depth in range(count):
+            referenced.update(*self.excludes[depth])
+            for requires in self.requires[depth]:
+                referenced.update(*requires)
+        self.referenced = frozenset(referenced)
+        self.classes = []
+        for depth in range(count):
+            self.classes.append([
+                (label if label in referenced else None, self.excludes[depth][digit], self.requires[depth][digit],
+                 self.lora_counts[depth][digit] if max_loras else 0, self.lora_weights[depth][digit] if max_lora_weight else 0.0)
+                for digit, label in enumerate(labels[depth])
+            ])
+
+    @property
+    def active(self):
+        """是否有任何規則或上限 (沒有時應直接使用 CombinationSpace)"""
+        return bool(self.max_loras or self.max_weight or any(any(g) for g in self.excludes) or any(any(g) for g in self.requires))
+
+    def start(self):
+        """初始狀態 (全域輸入的 LoRA 已超過上限時回傳 None，組合空間為空)"""
+        count = self.base_count if self.max_loras else None
+        weight = self.base_weight if self.max_weight else None
+        if count is not None and count > self.max_loras:
+            return None
+        if weight is not None and weight > self.max_weight + 1e-9:
+            return None
+        return (frozenset(), frozenset(), frozenset(), count, weight)
+
+    def advance(self, state, depth, digit):
+        """
+        在第 depth 個群組選取第 digit 個項目。
+
+        Returns:
+            tuple or None: 新狀態；違反規則 (或之後必定違反) 時回傳 None
+        """
+        forbidden, chosen, pending, count, weight = state
+        label = self.labels[depth][digit]
+        if label not in self.referenced:
+            # 未被任何規則引用的檔案不影響排除 / 需求的判斷
+            label = None
+        excludes = self.excludes[depth][digit]
+        if label is not None and label in forbidden:
+            return None
+        if excludes and not excludes.isdisjoint(chosen):
+            return None
+
+        # LoRA 上限：之後的群組全部取最大值仍不超過上限時不再追蹤
+        if count is not None:
+            count += self.lora_counts[depth][digit]
+            if count > self.max_loras:
+                return None
+            if count + self.count_after[depth] <= self.max_loras:
+                count = None
+        if weight is not None:
+            weight += self.lora_weights[depth][digit]
+            if weight > self.max_weight + 1e-9:
+                return None
+            if weight + self.weight_after[depth] <= self.max_weight + 1e-9:
+                weight = None
+            else:
+                weight = round(weight, 9)
+
+        avail = self.avail_after[depth]
+        if label is not None:
+            chosen = chosen | {label}
+            if pending:
+                pending = frozenset(required for required in pending if label not in required)
+        new_requires = [required for required in self.requires[depth][digit] if chosen.isdisjoint(required)]
+        if new_requires:
+            pending = pending | frozenset(new_requires)
+        # 尚未滿足的需求在之後的群組已不可能選到時剪枝
+        for required in pending:
+            if avail.isdisjoint(required):
+                return None
+        if forbidden or excludes:
+            forbidden = (forbidden | excludes) & avail
+        if chosen:
+            chosen = chosen & self.keep_after[depth]
+        return (forbidden, chosen, pending, count, weight)
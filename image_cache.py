@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+import torch
+from PIL import Image
+
+from .byte_cache import ByteBudgetCache, budget_from_env
+from .profiler import phase, add_bytes, add_count
+
+# -----------------------------------------------------------
+# 快取容量配置 (可透過環境變數調整，單位 MB)
+# -----------------------------------------------------------
+DEFAULT_BUDGET_BYTES = budget_from_env("DYNAMIC_TAGLOADER_IMAGE_CACHE_MB", 512)
+
+# EXIF Orientation -> 對應的轉置操作 (與 ImageOps.exif_transpose 相同)
+_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# reduce() 可直接處理的模式；調色盤 (P)、16 位元 (I;16)、1 位元等模式需先轉換
+_REDUCE_MODES = ("RGB", "RGBA", "L", "LA")
+
+
+def decode_image(path, max_side=0):
+    """
+    將圖片解碼為 ComfyUI IMAGE 張量 [1, H, W, 3] (float32, 0.0 ~ 1.0)。
+    1. max_side > 0 時在解碼階段縮小：JPEG 以 draft() 直接解碼較小尺寸，其他格式以 reduce() 整數倍縮小。
+    2. 先縮小再依 EXIF 轉向，避免轉置完整解析度的圖片；reduce() 不支援的模式先轉為 RGB (與不縮小時的結果相同)。
+    3. uint8 -> float32 只做一次轉換，寫入預先配置的緩衝區後原地正規化。
+
+    Args:
+        path (str): 圖片路徑
+        max_side (int): 最長邊上限 (0 = 原始解析度)
+    Returns:
+        torch.Tensor: [1, H, W, 3]
+    """
+    with Image.open(path) as img:
+        orientation = img.getexif().get(0x0112)
+        if max_side > 0 and max(img.size) > max_side:
+            scale = max_side / max(img.size)
+            img.draft("RGB", (max(1, int(img.width * scale)), max(1, int(img.height * scale))))
+            if img.mode not in _REDUCE_MODES:
+                img = img.convert("RGB")
+            factor = max(img.size) // max_side
+            if factor >= 2:
+                img = img.reduce(factor)
+            if max(img.size) > max_side:
+                scale = max_side / max(img.size)
+                img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.Resampling.BILINEAR)
+        if orientation in _ORIENTATION_TRANSPOSE:
+            img = img.transpose(_ORIENTATION_TRANSPOSE[orientation])
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        pixels = np.asarray(img)
+
+    # 預先配置 float32 緩衝區：copyto 一次完成型別轉換，再原地正規化，from_numpy 不複製資料
+    output = np.empty(pixels.shape, dtype=np.float32)
+    np.copyto(output, pixels)
+    output *= 1.0 / 255.0
+    return torch.from_numpy(output)[None,]
+
+
+class ImageTensorCache(ByteBudgetCache):
+    """
+    已解碼圖片張量的快取。
+    1. 以「實際路徑 + mtime + 檔案大小 + 最長邊上限」作為鍵值，檔案被修改後自動重新解碼。
+    2. 依張量總位元組數執行 LRU 淘汰 (ByteBudgetCache)。
+    3. 回傳的張量為共用物件，與 ComfyUI 慣例相同，下游節點不應原地修改 IMAGE。
+    """
+
+    @staticmethod
+    def _make_key(path, max_side):
+        real_path = os.path.realpath(path)
+        st = os.stat(real_path)
+        return (real_path, st.st_mtime_ns, st.st_size, max_side)
+
+    def load(self, path, max_side=0):
+        """
+        取得圖片張量：命中快取時直接回傳，否則解碼並寫入快取。
+
+        Args:
+            path (str): 圖片路徑
+            max_side (int): 最長邊上限 (0 = 原始解析度)
+        Returns:
+            torch.Tensor: [1, H, W, 3]
+        """
+        key = self._make_key(path, max_side)
+        with self._lock:
+            tensor = self._lookup_locked(key)
+        if tensor is not None:
+            add_count("image_cache_hit")
+            return tensor
+
+        with phase("image_decode"):
+            tensor = decode_image(path, max_side)
+        add_bytes("image_decode", key[2])
+        nbytes = tensor.numel() * tensor.element_size()
+
+        with self._lock:
+            # 同一路徑與尺寸的舊版本 (mtime/size 已變動) 不可能再命中，直接釋放；單張圖片超過總預算時僅回傳本次使用
+            self._drop_locked(lambda k: k[0] == key[0] and k[3] == max_side)
+            self._insert_locked(key, tensor, nbytes)
+        return tensor
+
+
+# 全域共享實例：跨 extract_info() 呼叫共用
+IMAGE_CACHE = ImageTensorCache(DEFAULT_BUDGET_BYTES)
@@ -1,10 +1,21 @@
 import os
 import json
+from collections import OrderedDict
 import torch
-import numpy as np
-from PIL import Image, ImageOps
+import torch.nn.functional as F
+from concurrent.futures import ThreadPoolExecutor
 import folder_paths  # 新增：用於獲取 ComfyUI 的標準路徑
 
+from .profiler import PhaseProfiler, phase, add_count
+from .image_cache import IMAGE_CACHE
+from .image_metadata import read_metadata
+from .workflow_index import WORKFLOW_INDEX, IMAGE_EXTENSIONS, flatten_widget_values
+
+# 批次模式的解碼執行緒數上限 (可透過環境變數調整)
+DECODE_WORKERS = int(os.environ.get("DYNAMIC_TAGLOADER_DECODE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 目錄列表快取的目錄數上限 (LRU，可透過環境變數調整)
+LISTING_CACHE_SIZE = int(os.environ.get("DYNAMIC_TAGLOADER_LISTING_CACHE_DIRS", "64"))
+
 class ImageWorkflowExtractor:
     @classmethod
     def INPUT_TYPES(s):
@@ -15,14 +26,61 @@ class ImageWorkflowExtractor:
                 "search_query": ("STRING", {"default": "00"}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}),
             },
+            "optional": {
+                "index_mode": (["Off", "Matching Paths", "Matching Text"], {"default": "Off", "tooltip": "Directory only: query the SQLite metadata index (refreshed incrementally) across every image instead of opening one image."}),
+                "value_filter": ("STRING", {"default": "", "multiline": False, "tooltip": "Index modes: only keep nodes whose widget values contain this text."}),
+                "load_image": ("BOOLEAN", {"default": True, "tooltip": "Disable when only workflow_json / clean_text are used: the metadata is read without decoding any pixels and the image output is a 64x64 placeholder."}),
+                "max_side": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 8, "tooltip": "Downscale while decoding so the longest side is at most this many pixels (preview use). 0 = full resolution."}),
+                "batch_count": ("INT", {"default": 1, "min": 1, "max": 4096, "step": 1, "tooltip": "Directory only: read this many consecutive images starting at seed (decoded in parallel) and output them as one IMAGE batch; the *_list outputs carry every image's values."}),
+                "size_policy": (["Resize to First", "Pad to Largest"], {"default": "Resize to First", "tooltip": "Batch mode: how images of different sizes are combined into one batch."}),
+            },
         }
 
-    RETURN_TYPES = ("JSON", "STRING", "STRING", "IMAGE")
-    RETURN_NAMES = ("workflow_json", "clean_text", "selected_path", "image")
+    RETURN_TYPES = ("JSON", "STRING", "STRING", "IMAGE", "JSON", "STRING", "STRING")
+    RETURN_NAMES = ("workflow_json", "clean_text", "selected_path", "image",
+                    "workflow_json_list", "clean_text_list", "selected_path_list")
+    # 原有輸出維持單一值 (批次模式為第一張圖片)，IMAGE 為批次張量；批次的全部結果由 *_list 列表輸出
+    OUTPUT_IS_LIST = (False, False, False, False, True, True, True)
     FUNCTION = "extract_info"
     CATEGORY = "DynamicTags"
 
-    def extract_info(self, image_or_dir, search_by, search_query, seed):
+    # 目錄路徑 -> (目錄 mtime, 排序後的圖片列表)，最多保留 LISTING_CACHE_SIZE 個目錄
+    _listing_cache = OrderedDict()
+
+    def extract_info(self, image_or_dir, search_by, search_query, seed, index_mode="Off", value_filter="", load_image=True, max_side=0,
+                     batch_count=1, size_policy="Resize to First"):
+        # 分段計時：結果附加至 ui 輸出
+        with PhaseProfiler("WorkflowMetadataReader") as profile:
+            result = self._extract_info(image_or_dir, search_by, search_query, seed, index_mode, value_filter, load_image, max_side,
+                                        batch_count, size_policy)
+        return {"ui": {"profile": [profile.format_summary()]}, "result": result}
+
+    @staticmethod
+    def _query_index(dir_path, search_by, search_query, index_mode, value_filter):
+        """
+        索引查詢模式：增量更新目錄索引後，直接由 SQLite 取得符合條件的節點，不開啟任何圖片。
+
+        Returns:
+            tuple: (查詢結果 JSON, 路徑或文字列表, 目錄路徑, 空白圖片)
+        """
+        summary = WORKFLOW_INDEX.refresh(dir_path)
+        rows = WORKFLOW_INDEX.query(dir_path, search_by, search_query, value_filter)
+        matches = [{"path": path, "id": node_id, "type": node_type, "text": text} for path, node_id, node_type, text in rows]
+
+        if index_mode == "Matching Paths":
+            # 同一張圖片可能有多個符合的節點，路徑僅輸出一次
+            lines = list(dict.fromkeys(m["path"] for m in matches))
+        else:
+            lines = [m["text"] for m in matches if m["text"]]
+        print(f"[DynamicTagLoader] Workflow Index: {summary['images']} images ({summary['updated']} updated, "
+              f"{summary['removed']} removed) | {len(matches)} matching nodes")
+
+        final_text = "\n".join(lines) if lines else f"No nodes match {search_query}"
+        result_json = {"index": summary, "count": len(matches), "matches": matches}
+        return (result_json, final_text, dir_path, torch.zeros((1, 64, 64, 3)))
+
+    def _extract_info(self, image_or_dir, search_by, search_query, seed, index_mode="Off", value_filter="", load_image=True, max_side=0,
+                     batch_count=1, size_policy="Resize to First"):
         target_path = image_or_dir.strip()
         
         # ==========================================
@@ -51,76 +109,154 @@ class ImageWorkflowExtractor:
                 # 如果都找不到，保持原樣，讓後面的邏輯去報錯
                 final_path = os.path.abspath(target_path)
 
-        selected_file = ""
-
         # ==========================================
         # 1. 檔案選取邏輯 (單檔或資料夾隨機)
         # ==========================================
         if os.path.isfile(final_path):
-            selected_file = final_path
+            selected_files = [final_path]
         elif os.path.isdir(final_path):
-            valid_extensions = ('.png', '.webp', '.jpg', '.jpeg')
-            files = sorted([
-                os.path.join(final_path, f) 
-                for f in os.listdir(final_path) 
-                if f.lower().endswith(valid_extensions)
-            ])
+            if index_mode != "Off":
+                return self._as_lists(self._query_index(final_path, search_by, search_query, index_mode, value_filter))
+
+            with phase("list_dir"):
+                files = self._list_images(final_path)
 
             if not files:
                 # 若無檔案，回傳一個空的黑色張量避免系統崩潰
-                return ({}, "No images found", final_path, torch.zeros((1, 64, 64, 3)))
+                return self._as_lists(({}, "No images found", final_path, torch.zeros((1, 64, 64, 3))))
 
-            index = seed % len(files)
-            selected_file = files[index]
+            # 批次模式：由 seed 開始連續取 batch_count 張 (與單張模式的 seed % 檔案數一致)
+            count = min(max(batch_count, 1), len(files))
+            selected_files = [files[(seed + i) % len(files)] for i in range(count)]
         else:
-            return ({}, "Invalid path or file not found", final_path, torch.zeros((1, 64, 64, 3)))
+            return self._as_lists(({}, "Invalid path or file not found", final_path, torch.zeros((1, 64, 64, 3))))
 
         # ==========================================
         # 2. 資訊提取與圖像轉換輸出
         # ==========================================
+        if len(selected_files) == 1:
+            wf_data, final_text, image_tensor = self._read_file(selected_files[0], search_by, search_query, load_image, max_side)
+            if image_tensor is None:
+                image_tensor = torch.zeros((1, 64, 64, 3))
+            return self._as_lists((wf_data, final_text, selected_files[0], image_tensor))
+
+        # 多張圖片：在有限大小的執行緒池中並行讀取 Metadata 與解碼 (PIL 解碼時會釋放 GIL)
+        workers = min(DECODE_WORKERS, len(selected_files))
+        with phase("batch_read"), ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(
+                lambda path: self._read_file(path, search_by, search_query, load_image, max_side), selected_files))
+        add_count("batch_read", len(selected_files))
+
+        workflows = [r[0] for r in results]
+        texts = [r[1] for r in results]
+        if load_image:
+            with phase("batch_stack"):
+                image_batch = self._stack_images([r[2] for r in results], size_policy)
+        else:
+            image_batch = torch.zeros((1, 64, 64, 3))
+        print(f"[DynamicTagLoader] Workflow Reader: batch of {len(selected_files)} images "
+              f"(seed {seed}, {workers} workers, {size_policy})")
+        return (workflows[0], texts[0], selected_files[0], image_batch, workflows, texts, selected_files)
+
+    @staticmethod
+    def _as_lists(result):
+        """單筆結果附加列表輸出 (*_list 為長度 1 的列表)"""
+        wf_data, final_text, selected_path, image_tensor = result
+        return (wf_data, final_text, selected_path, image_tensor, [wf_data], [final_text], [selected_path])
+
+    @classmethod
+    def _list_images(cls, dir_path):
+        """列出目錄下的圖片 (排序後)，目錄 mtime 未變動時沿用上次的 scandir 結果"""
+        mtime_ns = os.stat(dir_path).st_mtime_ns
+        cached = cls._listing_cache.get(dir_path)
+        if cached is not None and cached[0] == mtime_ns:
+            cls._listing_cache.move_to_end(dir_path)
+            return cached[1]
+        with os.scandir(dir_path) as it:
+            files = sorted(entry.path for entry in it if entry.name.lower().endswith(IMAGE_EXTENSIONS))
+        cls._listing_cache[dir_path] = (mtime_ns, files)
+        cls._listing_cache.move_to_end(dir_path)
+        while len(cls._listing_cache) > LISTING_CACHE_SIZE:
+            cls._listing_cache.popitem(last=False)
+        return files
+
+    @staticmethod
+    def _read_file(selected_file, search_by, search_query, load_image, max_side):
+        """
+        讀取單張圖片的 Workflow 與符合條件的節點文字，必要時解碼圖片。
+
+        Returns:
+            tuple: (workflow JSON, 文字, IMAGE 張量或 None)
+        """
         try:
-            with Image.open(selected_file) as img:
-                # --- A. 提取 Workflow Metadata ---
-                info = img.info
-                workflow = info.get("workflow", "{}")
+            # --- A. 提取 Workflow Metadata (僅讀取文字區塊，不解碼像素) ---
+            with phase("metadata"):
+                workflow = read_metadata(selected_file).get("workflow", "{}")
                 wf_data = json.loads(workflow) if isinstance(workflow, str) else workflow
-                nodes = wf_data.get("nodes", [])
-
-                clean_results = []
-                for node in nodes:
-                    match = False
-                    if search_by == "ID":
-                        # ID 轉字串比對
-                        if str(node.get("id")) == search_query.strip():
-                            match = True
-                    else:
-                        # Type 轉字串比對
-                        if node.get("type") == search_query.strip():
-                            match = True
-
-                    if match:
-                        values = node.get("widgets_values", [])
-                        for val in values:
-                            if isinstance(val, list):
-                                for sub_val in val:
-                                    clean_results.append(str(sub_val))
-                            else:
-                                clean_results.append(str(val))
-
-                final_text = "\n".join(clean_results) if clean_results else f"No nodes match {search_query}"
-                
-                # --- B. 將圖片轉為 ComfyUI 格式 (IMAGE Tensor) ---
-                # 修正圖片轉向 (Exif 資訊)
-                img = ImageOps.exif_transpose(img)
-                # 統一轉為 RGB
-                image_rgb = img.convert("RGB")
-                # 轉為 numpy 陣列並正規化至 0.0 ~ 1.0
-                image_np = np.array(image_rgb).astype(np.float32) / 255.0
-                # 轉為 PyTorch Tensor 並調整維度為 [Batch, Height, Width, Channel]
-                image_tensor = torch.from_numpy(image_np)[None,]
-
-                return (wf_data, final_text, selected_file, image_tensor)
-        
+            nodes = wf_data.get("nodes", [])
+
+            clean_results = []
+            for node in nodes:
+                match = False
+                if search_by == "ID":
+                    # ID 轉字串比對
+                    if str(node.get("id")) == search_query.strip():
+                        match = True
+                else:
+                    # Type 轉字串比對
+                    if node.get("type") == search_query.strip():
+                        match = True
+
+                if match:
+                    clean_results.extend(flatten_widget_values(node.get("widgets_values", [])))
+
+            final_text = "\n".join(clean_results) if clean_results else f"No nodes match {search_query}"
+
+            # 僅需 Metadata 時略過圖片解碼
+            if not load_image:
+                return (wf_data, final_text, None)
+
+            # --- B. 將圖片轉為 ComfyUI 格式 (IMAGE Tensor) ---
+            # 經由張量快取：同一張圖片 (路徑 + mtime + 尺寸上限) 只解碼一次
+            image_tensor = IMAGE_CACHE.load(selected_file, max_side)
+
+            return (wf_data, final_text, image_tensor)
+
         except Exception as e:
             # 發生錯誤時回傳錯誤訊息與空圖片
-            return ({}, f"Error: {str(e)}", selected_file, torch.zeros((1, 64, 64, 3)))
\ No newline at end of file
+            return ({}, f"Error: {str(e)}", None)
+
+    @staticmethod
+    def _stack_images(images, size_policy):
+        """
+        將不同尺寸的圖片合併為單一 IMAGE 批次。
+
+        Args:
+            images (list): [1, H, W, 3] 張量 (讀取失敗為 None，輸出黑色圖片)
+            size_policy (str): "Resize to First" 縮放至第一張的尺寸 / "Pad to Largest" 以黑邊置中補齊至最大尺寸
+        Returns:
+            torch.Tensor: [N, H, W, 3]
+        """
+        valid = [img for img in images if img is not None]
+        if not valid:
+            return torch.zeros((1, 64, 64, 3))
+        if size_policy == "Pad to Largest":
+            height = max(img.shape[1] for img in valid)
+            width = max(img.shape[2] for img in valid)
+        else:
+            height, width = valid[0].shape[1], valid[0].shape[2]
+
+        batch = torch.zeros((len(images), height, width, 3), dtype=valid[0].dtype)
+        for i, img in enumerate(images):
+            if img is None:
+                continue
+            h, w = img.shape[1], img.shape[2]
+            if (h, w) == (height, width):
+                batch[i] = img[0]
+            elif size_policy == "Pad to Largest":
+                top, left = (height - h) // 2, (width - w) // 2
+                batch[i, top:top + h, left:left + w] = img[0]
+            else:
+                resized = F.interpolate(img.movedim(-1, 1), size=(height, width), mode="bilinear", align_corners=False)
+                batch[i] = resized.movedim(1, -1)[0]
+        return batch
@@ -0,0 +1,142 @@
+import struct
+import zlib
+
+from PIL import Image
+
+# -----------------------------------------------------------
+# 圖片 Metadata 區塊讀取 (不解碼像素)
+# PNG：直接走訪 tEXt / iTXt / zTXt 區塊；WebP：解析 EXIF 區塊中 ComfyUI 寫入的 "key:value" 字串。
+# 其他格式退回 PIL 的 Image.open().info (同樣只讀取檔頭)。
+# -----------------------------------------------------------
+METADATA_KEYS = ("workflow", "prompt")
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_TEXT_CHUNKS = (b"tEXt", b"zTXt", b"iTXt")
+
+# TIFF 欄位型別 -> 單一數值的位元組數
+_TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+
+
+def _decode_png_text(chunk_type, data):
+    """解析單一 PNG 文字區塊，回傳 (key, text)"""
+    key, _, rest = data.partition(b"\0")
+    key = key.decode("latin-1")
+    if chunk_type == b"tEXt":
+        return key, rest.decode("latin-1")
+    if chunk_type == b"zTXt":
+        # rest[0] 為壓縮方式 (僅定義 0 = zlib)
+        return key, zlib.decompress(rest[1:]).decode("latin-1")
+    # iTXt: 壓縮旗標、壓縮方式、語言標籤\0、翻譯關鍵字\0、UTF-8 文字
+    compressed = rest[0:1] == b"\1"
+    _, _, rest = rest[2:].partition(b"\0")
+    _, _, text = rest.partition(b"\0")
+    if compressed:
+        text = zlib.decompress(text)
+    return key, text.decode("utf-8")
+
+
+def _read_png(f, keys):
+    result = {}
+    f.seek(len(_PNG_SIGNATURE))
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack(">I4s", header)
+        if chunk_type == b"IEND":
+            break
+        if chunk_type in _PNG_TEXT_CHUNKS:
+            data = f.read(length)
+            f.seek(4, 1)  # CRC
+            try:
+                key, text = _decode_png_text(chunk_type, data)
+            except (zlib.error, UnicodeDecodeError, IndexError):
+                continue
+            if key in keys:
+                result[key] = text
+                if len(result) == len(keys):
+                    break
+        else:
+            # 像素資料 (IDAT) 與其他區塊直接跳過，不讀取內容
+            f.seek(length + 4, 1)
+    return result
+
+
+def _parse_exif_strings(data):
+    """解析 TIFF 格式 EXIF 中 IFD0 的 ASCII 欄位，回傳字串列表"""
+    if data.startswith(b"Exif\0\0"):
+        data = data[6:]
+    if data[:2] == b"II":
+        endian = "<"
+    elif data[:2] == b"MM":
+        endian = ">"
+    else:
+        return []
+    offset = struct.unpack(endian + "I", data[4:8])[0]
+    count = struct.unpack(endian + "H", data[offset:offset + 2])[0]
+    strings = []
+    for i in range(count):
+        entry = data[offset + 2 + i * 12: offset + 14 + i * 12]
+        if len(entry) < 12:
+            break
+        _, field_type, n, value = struct.unpack(endian + "HHI4s", entry)
+        # ComfyUI 以 ASCII (2) 或 UNDEFINED (7) 型別寫入 "workflow:{...}"
+        if field_type not in (2, 7):
+            continue
+        size = n * _TIFF_TYPE_SIZES[field_type]
+        if size <= 4:
+            raw = value[:size]
+        else:
+            start = struct.unpack(endian + "I", value)[0]
+            raw = data[start:start + size]
+        strings.append(raw.rstrip(b"\0").decode("utf-8", errors="replace"))
+    return strings
+
+
+def _read_webp(f, keys):
+    result = {}
+    header = f.read(12)
+    if len(header) < 12 or header[8:12] != b"WEBP":
+        return result
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            break
+        chunk_type, length = struct.unpack("<4sI", chunk)
+        padded = length + (length & 1)
+        if chunk_type != b"EXIF":
+            f.seek(padded, 1)
+            continue
+        try:
+            strings = _parse_exif_strings(f.read(padded)[:length])
+        except (struct.error, KeyError):
+            break
+        for text in strings:
+            key, sep, value = text.partition(":")
+            if sep and key.lower() in keys:
+                result[key.lower()] = value
+        break
+    return result
+
+
+def read_metadata(path, keys=METADATA_KEYS):
+    """
+    讀取圖片中的文字 Metadata，找到所有指定的鍵值後立即停止，不解碼像素。
+
+    Args:
+        path (str): 圖片路徑
+        keys (tuple): 需要的鍵值 (預設 workflow / prompt)
+    Returns:
+        dict: {鍵值: 文字內容} (僅包含找到的鍵值)
+    """
+    with open(path, "rb") as f:
+        magic = f.read(12)
+        f.seek(0)
+        if magic.startswith(_PNG_SIGNATURE):
+            return _read_png(f, keys)
+        if magic[:4] == b"RIFF" and magic[8:12] == b"WEBP":
+            return _read_webp(f, keys)
+
+    # JPEG 等其他格式：PIL 開啟時只解析檔頭，不解碼像素
+    with Image.open(path) as img:
+        return {k: v for k, v in img.info.items() if k in keys and isinstance(v, str)}
@@ -1,4 +1,5 @@
-import random
+from .profiler import PhaseProfiler, phase
+from .sampling import SAMPLE_STRATEGIES, sample_indices
 
 class DynamicTagIterator:
     @classmethod
@@ -15,6 +16,7 @@ class DynamicTagIterator:
                 
                 # Seed 控制
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}),
+                "sample_strategy": (SAMPLE_STRATEGIES, {"default": "Shuffle (Legacy)", "tooltip": "Shuffle (Legacy) shuffles every index (O(n)). Floyd / Permutation draw only the sampled indices (O(k))."}),
             }
         }
 
@@ -27,10 +29,18 @@ class DynamicTagIterator:
     FUNCTION = "process"
     CATEGORY = "Custom/TagLoader"
 
-    def process(self, model, clip, conditioning, prompt, output_mode, sample_limit, seed):
+    def process(self, model, clip, conditioning, prompt, output_mode, sample_limit, seed, sample_strategy=None):
+        # 分段計時：結果附加至 ui 輸出
+        with PhaseProfiler("DynamicTagIterator") as profile:
+            output = self._process(model, clip, conditioning, prompt, output_mode, sample_limit, seed, sample_strategy)
+        output["ui"]["profile"] = [profile.format_summary()]
+        return output
+
+    def _process(self, model, clip, conditioning, prompt, output_mode, sample_limit, seed, sample_strategy):
         mode = output_mode[0]
         limit = sample_limit[0]
         current_seed = seed[0]
+        strategy = sample_strategy[0] if sample_strategy else "Shuffle (Legacy)"
 
         total_items = len(prompt)
         
@@ -41,14 +51,12 @@ class DynamicTagIterator:
         final_prompts = []
 
         if total_items > 0:
-            indices = list(range(total_items))
-
-            if limit > 0 and limit < total_items:
-                rng = random.Random(current_seed)
-                rng.shuffle(indices)
-                selected_indices = indices[:limit]
-            else:
-                selected_indices = indices
+            with phase("select"):
+                if limit > 0 and limit < total_items:
+                    # 抽樣策略：Floyd / Permutation 僅產生被抽中的索引，不建立完整索引列表
+                    selected_indices = sample_indices(total_items, limit, current_seed, strategy)
+                else:
+                    selected_indices = range(total_items)
 
             if mode == "Batch (List)":
                 for idx in selected_indices:
@@ -1,16 +1,36 @@
 import os
-import itertools
-import re
 import json
-import folder_paths
+import hashlib
 import comfy.sd
-import comfy.utils
+from .lora_cache import LORA_CACHE
+from .lora_index import LORA_INDEX
+from .lora_stack import LoraStackTrie
+from .conditioning_cache import CONDITIONING_CACHE
+from .batch_encode import encode_prompts
+from .combination import CombinationSpace, PrunedSpace
+from .constraints import ComboRules, file_label, item_rules, parse_limits
+from .sampling import sample_indices
+from .tag_library import TAGS_DIR, TAG_LIBRARY
+from .tag_parser import parse_prompt
+from .profiler import PhaseProfiler, phase, add_count
+from .prefetch import LoraPrefetcher, PREFETCH_DEPTH
+
+
+# 組合預覽：最多回傳的 Prompt 數量，以及精確計算不同 LoRA 疊加數量的上限
+PREVIEW_MAX_PROMPTS = 100
+PREVIEW_STACK_LIMIT = 100000
+# sample_count 上限 (節點 Widget 與預覽 API 共用)
+SAMPLE_COUNT_MAX = 99999
+
+
+def _stat_token(path):
+    """回傳檔案或目錄的 stat 指紋 (mtime_ns / size / inode)，不存在時回傳固定標記"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return b"missing"
+    return f"{st.st_mtime_ns}:{st.st_size}:{st.st_ino}".encode("ascii")
 
-# -----------------------------------------------------------
-# 基礎路徑配置
-# -----------------------------------------------------------
-NODE_FILE_PATH = os.path.dirname(os.path.abspath(__file__))
-TAGS_DIR = os.path.join(NODE_FILE_PATH, "tags")
 
 class DynamicTagLoaderJS:
     """
@@ -31,6 +51,13 @@ class DynamicTagLoaderJS:
             "optional": {
                 "model": ("MODEL",),
                 "clip": ("CLIP",),
+                "selection": (["All Combinations", "Single Index", "Random Sample", "Stratified Sample"], {"default": "All Combinations", "tooltip": "Single Index / Random Sample only build the requested combinations instead of the whole grid. Stratified Sample makes every file of every group appear at least once."}),
+                "selection_seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "control_after_generate": True, "tooltip": "Single Index: combination index (wraps around). Random Sample: random seed."}),
+                "sample_count": ("INT", {"default": 1, "min": 1, "max": SAMPLE_COUNT_MAX, "step": 1, "tooltip": "Number of combinations drawn in Random / Stratified Sample mode."}),
+                "deduplicate": (["Off", "Collapse", "Shared References"], {"default": "Off", "tooltip": "Merge combinations with the same prompt (ignoring extra whitespace) and LoRA stack before patching/encoding. Collapse drops duplicates; Shared References keeps the list length and reuses the first result."}),
+                "encode_batch_size": ("INT", {"default": 8, "min": 1, "max": 256, "step": 1, "tooltip": "Prompts sharing the same LoRA stack are encoded together in batches of this size. 1 = encode one by one."}),
+                "chunk_size": ("INT", {"default": 0, "min": 0, "max": 99999, "step": 1, "tooltip": "Only output this many combinations per run (one chunk of the selection) so memory depends on the chunk size instead of the grid size. 0 = output everything at once."}),
+                "chunk_index": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "control_after_generate": True, "tooltip": "Chunk to output (wraps around). Use increment to step through every chunk; the chunks concatenated equal the full output."}),
             }
         }
 
@@ -44,37 +71,144 @@ class DynamicTagLoaderJS:
     CATEGORY = "Custom/TagLoader"
 
     @classmethod
-    def IS_CHANGED(s, **kwargs):
-        """強迫 ComfyUI 忽略快取機制，確保每次執行皆重新解析檔案內容"""
-        return float("nan")
+    def IS_CHANGED(s, text_input="", tag_settings="{}", **kwargs):
+        """
+        內容指紋 (Fingerprint)：輸入與相關檔案皆未變動時回傳相同值，讓 ComfyUI 直接使用快取結果；
+        任一標籤檔案、ALL 目錄內容或引用的 LoRA 檔案被修改時，指紋隨之改變並觸發重新執行。
+        """
+        return s._fingerprint(text_input, tag_settings)
 
-    def _parse_and_strip_lora(self, text):
+    @classmethod
+    def _fingerprint(s, text_input, tag_settings):
+        """
+        以 stat (mtime / size / inode) 計算指紋，不讀取檔案內容。
+        LoRA 引用僅在標籤檔案 stat 改變時才重新解析 (_LORA_REF_CACHE)。
         """
-        Regex 解析器：提取文本中的 <lora:name:weight> 標籤。
+        # 每次排入佇列都會先計算指紋：標籤包在此重新逐檔驗證，之後的 process() 沿用同一次的驗證結果
+        TAG_LIBRARY.begin_run()
+        digest = hashlib.sha1()
+        digest.update(text_input.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(tag_settings.encode("utf-8"))
+
+        lora_names = [entry[0] for entry in s._parse_and_strip_lora(text_input)[1]]
+        try:
+            settings = json.loads(tag_settings)
+        except Exception:
+            settings = {}
+
+        for key in s._group_keys(settings):
+            item = settings[key]
+            if item.get("type", "file") == "text":
+                lora_names.extend(entry[0] for entry in s._parse_and_strip_lora(item.get("text", ""))[1])
+                continue
+            folder_name = item.get("folder")
+            file_name = item.get("file")
+            if not folder_name or not file_name:
+                continue
+            folder_path = s._resolve_folder(folder_name)
+            if file_name == "ALL":
+                digest.update(_stat_token(folder_path))
+                pack = TAG_LIBRARY.pack_for(folder_path)
+                if pack is not None:
+                    # 有效的標籤包：以標籤包 stat 取代逐檔 stat，LoRA 引用直接取自預先解析的結果
+                    digest.update(_stat_token(pack.path))
+                    for _, loras in pack.parsed_all():
+                        lora_names.extend(entry[0] for entry in loras)
+                    continue
+                files_to_read = s._list_tag_files(folder_path)
+            else:
+                files_to_read = [file_name]
+            for f_name in files_to_read:
+                path = os.path.join(folder_path, f_name)
+                token = _stat_token(path)
+                digest.update(path.encode("utf-8"))
+                digest.update(token)
+                lora_names.extend(s._cached_lora_refs(path, token))
+
+        # 引用的 LoRA 檔案：記錄解析後的實際路徑與 stat
+        LORA_INDEX.refresh()
+        for lora_name in dict.fromkeys(lora_names):
+            lora_path = s._resolve_lora_path(lora_name)
+            digest.update(lora_name.encode("utf-8"))
+            if lora_path is not None:
+                digest.update(lora_path.encode("utf-8"))
+                digest.update(_stat_token(lora_path))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _group_keys(settings):
+        """依前端索引順序排列的群組鍵 (略過 "limits" 等非群組設定)"""
+        return sorted((key for key in settings if str(key).isdigit()), key=int)
+
+    @classmethod
+    def _cached_lora_refs(s, path, token):
+        """取得標籤檔案中的 LoRA 名稱 (經由標籤庫索引，檔案未變動時不重新讀取)"""
+        parsed = TAG_LIBRARY.read_parsed(path, s._parse_and_strip_lora)
+        return [entry[0] for entry in parsed[1]] if parsed else []
+
+    @staticmethod
+    def _resolve_folder(folder_name):
+        """路徑安全化處理：將前端資料夾名稱轉換為實際路徑"""
+        if folder_name == "Root":
+            return TAGS_DIR
+        return os.path.join(TAGS_DIR, os.path.normpath(folder_name))
+
+    @staticmethod
+    def _list_tag_files(folder_path):
+        """列出目錄下所有 .txt 檔案 (排序後)，經由標籤庫索引僅在目錄變動時重新列舉"""
+        return TAG_LIBRARY.list_files(folder_path)
+
+    @staticmethod
+    def _parse_and_strip_lora(text):
+        """
+        LoRA 語法解析器：提取文本中的 <lora:name>、<lora:name:weight> 與 <lora:name:model_w:clip_w> 標籤。
+        實作於 tag_parser.parse_prompt (預先編譯的單次掃描，並依內容快取結果)。
         
         Args:
             text (str): 原始 Prompt 文本
         Returns:
-            tuple: (清理後的文本, LoRA 配置列表 [(name, weight), ...])
-        """
-        if not text:
-            return "", []
-        lora_pattern = r"<lora:([^>:]+)(?::([0-9.]+))?>"
-        found_loras = []
-        for match in re.finditer(lora_pattern, text):
-            lora_name = match.group(1)
-            strength = float(match.group(2)) if match.group(2) else 1.0
-            found_loras.append((lora_name, strength))
-        
-        # 移除 LoRA 語法並規範化空白與換行符號
-        cleaned_text = re.sub(lora_pattern, "", text)
-        cleaned_text = re.sub(r'\n\s*\n', '\n', cleaned_text)
-        cleaned_text = cleaned_text.strip()
-        return cleaned_text, found_loras
+            tuple: (清理後的文本, LoRA 配置列表 [(name, strength_model, strength_clip), ...])
+        """
+        return parse_prompt(text)
+
+    @staticmethod
+    def _resolve_lora_path(lora_name):
+        """
+        LoRA 路徑檢索：經由預先建立的名稱索引，依序比對完整名稱、補上副檔名與不區分大小寫的檔名。
+
+        Returns:
+            str: LoRA 完整路徑，找不到時回傳 None
+        """
+        return LORA_INDEX.resolve(lora_name)
 
-    def _load_lora(self, model, clip, lora_name, strength_model, strength_clip):
+    def _stack_key(self, all_loras, file_keys):
         """
-        動態 LoRA 加載邏輯：包含檔案路徑檢索與模糊匹配。
+        Conditioning 快取使用的 LoRA 疊加鍵值：以解析後的檔案識別 (實際路徑, mtime_ns, 檔案大小) 取代名稱，
+        LoRA 檔案被修改、替換或後來才新增時不會命中以舊 CLIP Patch 編碼的結果。
+
+        Args:
+            all_loras (list): [(name, strength_model, strength_clip), ...]
+            file_keys (dict): 本次執行的 名稱 -> 檔案識別 快取 (每個名稱只 stat 一次)
+        Returns:
+            tuple: ((檔案識別, strength_model, strength_clip), ...)；找不到的 LoRA 以 ("missing", 名稱) 標記
+        """
+        stack_key = []
+        for lora_name, strength_model, strength_clip in all_loras:
+            file_key = file_keys.get(lora_name)
+            if file_key is None:
+                lora_path = self._resolve_lora_path(lora_name)
+                try:
+                    file_key = LORA_CACHE.file_key(lora_path) if lora_path is not None else ("missing", lora_name)
+                except OSError:
+                    file_key = ("missing", lora_name)
+                file_keys[lora_name] = file_key
+            stack_key.append((file_key, strength_model, strength_clip))
+        return tuple(stack_key)
+
+    def _load_lora(self, model, clip, lora_name, strength_model, strength_clip, prefetcher=None):
+        """
+        動態 LoRA 加載邏輯：檢索檔案路徑後套用至模型與 CLIP。
         
         Args:
             model: 模型實例
@@ -82,57 +216,102 @@ class DynamicTagLoaderJS:
             lora_name: LoRA 檔案名稱
             strength_model: 模型強度
             strength_clip: CLIP 強度
+            prefetcher: (可選) LoraPrefetcher，已預先載入的檔案直接取用
         """
         if model is None or clip is None:
             return model, clip
             
-        # 優先執行完整路徑匹配
-        lora_path = folder_paths.get_full_path("loras", lora_name)
-        if lora_path is None:
-            lora_path = folder_paths.get_full_path("loras", f"{lora_name}.safetensors")
-            
-        # 備選方案：執行不區分大小寫的模糊搜索 (忽略副檔名)
-        if lora_path is None:
-            available_loras = folder_paths.get_filename_list("loras")
-            target_name = lora_name.lower()
-            if target_name.endswith(".safetensors"):
-                target_name = target_name[:-12]
-            for candidate in available_loras:
-                candidate_name = os.path.splitext(os.path.basename(candidate))[0].lower()
-                if candidate_name == target_name:
-                    lora_path = folder_paths.get_full_path("loras", candidate)
-                    break
-                    
+        lora_path = self._resolve_lora_path(lora_name)
         if lora_path is None:
-            print(f"[DynamicTagLoader] Warning: Lora not found: {lora_name}")
+            LORA_INDEX.warn_missing(lora_name)
             return model, clip
             
         try:
-            # 調用 ComfyUI 核心函數加載 LoRA 權重並應用至 Patch 隊列
-            lora_model = comfy.utils.load_torch_file(lora_path, safe_load=True)
-            model_lora, clip_lora = comfy.sd.load_lora_for_models(model, clip, lora_model, strength_model, strength_clip)
+            # 優先取用預先載入的權重，否則透過全域快取取得 (同一檔案僅從磁碟讀取一次)，再應用至 Patch 隊列
+            lora_model = None
+            if prefetcher is not None:
+                with phase("prefetch_wait"):
+                    lora_model = prefetcher.take(lora_path)
+            if lora_model is None:
+                lora_model = LORA_CACHE.load(lora_path)
+            with phase("load_lora_for_models"):
+                model_lora, clip_lora = comfy.sd.load_lora_for_models(model, clip, lora_model, strength_model, strength_clip)
             return model_lora, clip_lora
         except Exception as e:
             print(f"[DynamicTagLoader] Error loading lora {lora_name}: {e}")
             return model, clip
 
-    def _read_file(self, path):
-        """IO 輔助函數：執行安全讀取並過濾結尾空白"""
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return f.read().strip()
-        except:
-            return None
+    def _encode_all(self, entries, clip_identity, batch_size):
+        """
+        批次文本編碼階段：
+        1. 以 (CLIP 物件, Prompt) 去除重複，並優先查詢 Conditioning 快取。
+        2. 未命中的 Prompt 依 CLIP 物件分組，交由 encode_prompts 批次編碼。
+        3. 結果依每個項目的 (基礎 CLIP, LoRA 疊加) 寫入快取 (不同疊加可能共用同一個 CLIP 物件)。
 
-    def process(self, text_input, tag_settings, model=None, clip=None, **kwargs):
+        Args:
+            entries (list): [(prompt, clip, stack_key), ...]
+            clip_identity: 基礎 CLIP 識別碼，為 None 時不使用快取
+            batch_size (int): 批次大小
+        Returns:
+            list: 與 entries 對齊的 CONDITIONING (失敗為 None)
         """
-        主要處理工作流：
+        encoded = {}      # (id(clip), prompt) -> (cond, pooled)
+        stack_keys = {}   # (id(clip), prompt) -> {stack_key, ...}
+        pending = {}      # id(clip) -> (clip, [prompt, ...])
+        writes = []       # 需寫入快取的 ((id(clip), prompt), stack_key)
+        for prompt, current_clip, stack_key in entries:
+            if current_clip is None:
+                continue
+            slot = (id(current_clip), prompt)
+            # 不同疊加可能共用同一個 CLIP (例如僅影響模型的 LoRA)，每個疊加各自寫入快取
+            keys = stack_keys.setdefault(slot, set())
+            if stack_key in keys:
+                continue
+            keys.add(stack_key)
+            if slot in encoded:
+                writes.append((slot, stack_key))
+                continue
+            cached = None
+            if clip_identity is not None:
+                cached = CONDITIONING_CACHE.get((clip_identity, stack_key, prompt))
+            encoded[slot] = cached
+            if cached is None:
+                pending.setdefault(id(current_clip), (current_clip, []))[1].append(prompt)
+                writes.append((slot, stack_key))
+
+        for clip_id, (current_clip, prompts) in pending.items():
+            with phase("clip_encode"):
+                results = encode_prompts(current_clip, prompts, batch_size)
+            add_count("clip_encode", len(prompts))
+            for prompt, result in zip(prompts, results):
+                encoded[(clip_id, prompt)] = result
+
+        if clip_identity is not None:
+            for slot, stack_key in writes:
+                result = encoded.get(slot)
+                if result is not None:
+                    CONDITIONING_CACHE.put((clip_identity, stack_key, slot[1]), result[0], result[1])
+
+        conditionings = []
+        for prompt, current_clip, _ in entries:
+            result = encoded.get((id(current_clip), prompt)) if current_clip is not None else None
+            if result is None:
+                conditionings.append(None)
+            else:
+                cond, pooled = result
+                conditionings.append([[cond, {"pooled_output": pooled}]])
+        return conditionings
+
+    def _build_groups(self, text_input, tag_settings):
+        """
+        解析設定並讀取標籤檔案：
         1. 解析 tag_settings JSON 設定，按索引排序。
-        2. 遍歷檔案系統獲取 Prompt 片段，並分離文本與 LoRA 設定。
-        3. 利用 itertools.product 計算所有可能的 Prompt 組合 (笛卡兒積)。
-        4. 為每組組合進行模型加權 (LoRA) 與文本編碼 (Conditioning)。
+        2. 先規劃所有群組需要的檔案，再一次並行讀取 (I/O 執行緒池)，並分離文本與 LoRA 設定。
+        3. 保留各項目的檔案識別名稱，建立組合規則 (群組的 exclude / require 規則與全域 LoRA 上限)。
+
+        Returns:
+            tuple: (全域文本, 全域 LoRA 列表, 各群組的 [(文本, LoRA 列表), ...], 組合規則 ComboRules 或 None)
         """
-        delimiter = "\n" 
         try:
             settings = json.loads(tag_settings)
         except Exception as e:
@@ -140,21 +319,24 @@ class DynamicTagLoaderJS:
 
         # 預處理全域輸入 (Global Prompt)
         base_text_cleaned, base_loras = self._parse_and_strip_lora(text_input)
-        prompts_groups = []
+        # 依序記錄各群組：已取得的解析結果 (純文本 / 標籤包)，或待讀取的檔案路徑，以及群組規則設定
+        group_plans = []
+        pending_paths = []
         
         # 根據前端 UI 設定的索引順序進行數據構造
-        sorted_keys = sorted(settings.keys(), key=lambda x: int(x))
+        sorted_keys = self._group_keys(settings)
         
         for key in sorted_keys:
             item = settings[key]
             item_type = item.get("type", "file")
+            rules_spec = item.get("rules")
 
             if item_type == "text":
                 # 處理純文本組件
                 raw_text = item.get("text", "")
                 if raw_text:
                     cleaned_text, loras = self._parse_and_strip_lora(raw_text)
-                    prompts_groups.append([(cleaned_text, loras)])
+                    group_plans.append(("parsed", [(None, (cleaned_text, loras))], rules_spec))
             else:
                 # 處理標籤檔案組件
                 folder_name = item.get("folder")
@@ -163,84 +345,380 @@ class DynamicTagLoaderJS:
                     continue
                 
                 # 路徑安全化處理
-                if folder_name == "Root":
-                    folder_path = TAGS_DIR
-                else:
-                    folder_path = os.path.join(TAGS_DIR, os.path.normpath(folder_name))
-                
-                current_group_data = [] 
-                files_to_read = []
+                folder_path = self._resolve_folder(folder_name)
                 
-                # 檔案檢索策略：若選擇 "ALL" 則枚舉目錄下所有 .txt 檔案
+                # 檔案檢索策略：若選擇 "ALL" 則讀取目錄下所有 .txt 檔案 (有效的標籤包優先)
                 if file_name == "ALL":
-                    if os.path.exists(folder_path):
-                        files_to_read = sorted([f for f in os.listdir(folder_path) if f.endswith(".txt")])
+                    pack = TAG_LIBRARY.pack_for(folder_path)
+                    if pack is not None:
+                        named = TAG_LIBRARY.read_folder_items(folder_path, self._parse_and_strip_lora, pack=pack)
+                        group_plans.append(("parsed", [(file_label(folder_name, f_name), parsed) for f_name, parsed in named], rules_spec))
+                        continue
+                    file_names = self._list_tag_files(folder_path)
                 else:
-                    files_to_read = [file_name]
+                    file_names = [file_name]
+                paths = [(file_label(folder_name, f_name), os.path.join(folder_path, f_name)) for f_name in file_names]
+                group_plans.append(("paths", paths, rules_spec))
+                pending_paths.extend(path for _, path in paths)
 
-                for f_name in files_to_read:
-                    raw_content = self._read_file(os.path.join(folder_path, f_name))
-                    if raw_content is not None:
-                        cleaned_text, loras = self._parse_and_strip_lora(raw_content)
-                        current_group_data.append((cleaned_text, loras))
-                
-                if current_group_data:
-                    prompts_groups.append(current_group_data)
+        # 所有群組用到的檔案一次交由標籤庫並行讀取 (檔案未變動時直接使用快取的解析結果)
+        parsed_files = TAG_LIBRARY.read_many(pending_paths, self._parse_and_strip_lora)
+
+        prompts_groups = []
+        labels = []
+        rules = []
+        for kind, data, rules_spec in group_plans:
+            if kind == "paths":
+                data = [(label, parsed_files[os.path.abspath(path)]) for label, path in data if os.path.abspath(path) in parsed_files]
+            if data:
+                prompts_groups.append([parsed for _, parsed in data])
+                labels.append([label for label, _ in data])
+                rules.append([item_rules(rules_spec, label.rsplit("/", 1)[-1] if label else None) for label, _ in data])
 
-        # 核心運算：計算所有標籤組件的笛卡兒積組合
-        if not prompts_groups:
-            combinations = [([],)] if base_text_cleaned or base_loras else []
+        combo_rules = None
+        if prompts_groups:
+            max_loras, max_lora_weight = parse_limits(settings)
+            combo_rules = ComboRules(labels, rules, [[item[1] for item in group] for group in prompts_groups], base_loras,
+                                     max_loras, max_lora_weight)
+            if not combo_rules.active:
+                combo_rules = None
+
+        return base_text_cleaned, base_loras, prompts_groups, combo_rules
+
+    def process(self, text_input, tag_settings, model=None, clip=None, encode_batch_size=8,
+                selection="All Combinations", selection_seed=0, sample_count=1, deduplicate="Off",
+                chunk_size=0, chunk_index=0, **kwargs):
+        """節點入口：執行 _process 並附加分段計時 (各階段耗時 / 次數 / 讀取量) 至 ui 輸出"""
+        with PhaseProfiler("DynamicTagLoaderJS") as profile:
+            output = self._process(text_input, tag_settings, model, clip, encode_batch_size,
+                                   selection, selection_seed, sample_count, deduplicate, chunk_size, chunk_index)
+        profile_info = profile.format_summary()
+        print(f"[DynamicTagLoader] Profile: {profile_info}")
+        output["ui"]["profile"] = [profile_info]
+        return output
+
+    @staticmethod
+    def _assemble_combo(combo, base_text_cleaned, base_loras, delimiter):
+        """
+        組合單一組合的 Prompt 與 LoRA 疊加。
+
+        Returns:
+            tuple: (組合後的 Prompt, LoRA 配置列表 [(名稱, 模型強度, CLIP 強度), ...])
+        """
+        current_texts = []
+        if base_text_cleaned:
+            current_texts.append(base_text_cleaned)
+        current_texts.extend([item[0] for item in combo if item and item[0]])
+        combined_prompt = delimiter.join(current_texts)
+        
+        # 整合全域與局部 (檔案內) 的 LoRA 配置
+        all_loras = []
+        if base_loras:
+            all_loras.extend(base_loras)
+        for item in combo:
+            if item:
+                all_loras.extend(item[1])
+        return combined_prompt, all_loras
+
+    @staticmethod
+    def _canonical_key(prompt, loras, delimiter):
+        """
+        去重複用的正規化鍵值：
+        Prompt 逐行壓縮空白並移除空行；LoRA 疊加排序後比較 (Patch 為加總運算，與套用順序無關)。
+        """
+        lines = (" ".join(line.split()) for line in prompt.split(delimiter))
+        canonical_prompt = delimiter.join(line for line in lines if line)
+        return canonical_prompt, tuple(sorted(loras))
+
+    def _start_prefetch(self, plans):
+        """
+        依組合計畫建立 LoRA 預先載入：按 LoRA 首次出現的順序排列，略過找不到或已在快取中的檔案。
+
+        Returns:
+            LoraPrefetcher: 無需預先載入時回傳 None
+        """
+        if PREFETCH_DEPTH <= 0:
+            return None
+        paths = []
+        for _, all_loras in plans:
+            for lora_name, _, _ in all_loras:
+                lora_path = self._resolve_lora_path(lora_name)
+                if lora_path is not None:
+                    paths.append(lora_path)
+        paths = [path for path in dict.fromkeys(paths) if not LORA_CACHE.contains(path)]
+        if not paths:
+            return None
+        add_count("lora_prefetch", len(paths))
+        return LoraPrefetcher(paths, LORA_CACHE.load)
+
+    @staticmethod
+    def _build_space(base_text_cleaned, base_loras, prompts_groups, combo_rules=None):
+        """建立組合空間 (無任何群組與全域輸入時為空空間；有組合規則時只包含符合規則的組合)"""
+        if not prompts_groups and not (base_text_cleaned or base_loras):
+            return CombinationSpace([[]])
+        if combo_rules is not None:
+            return PrunedSpace(prompts_groups, combo_rules)
+        return CombinationSpace(prompts_groups)
+
+    @staticmethod
+    def _count_lora_stacks(space, base_loras):
+        """
+        計算不同 LoRA 疊加的數量與前綴樹需要的 Patch 數，不展開組合：
+        逐群組將「目前已知的疊加」與「該群組不同的 LoRA 列表」串接並去除重複。
+
+        Returns:
+            tuple: (不同疊加數, Patch 數, 是否為精確值)；超過 PREVIEW_STACK_LIMIT 時回傳上限估計與 None
+        """
+        if space.total == 0:
+            return 0, 0, True
+        if isinstance(space, PrunedSpace) and space.total <= PREVIEW_STACK_LIMIT:
+            # 受規則限制的空間：逐群組串接會計入被排除的組合，改為逐一列舉符合規則的組合
+            stacks = {tuple(base_loras) + tuple(entry for item in combo if item for entry in item[1]) for combo in space}
+            prefixes = {stack[:i] for stack in stacks for i in range(1, len(stack) + 1)}
+            return len(stacks), len(prefixes), True
+        stacks = {tuple(base_loras)}
+        upper_bound = 1
+        for group in space.groups:
+            group_stacks = list(dict.fromkeys(tuple(item[1]) if item else () for item in group))
+            upper_bound *= len(group_stacks)
+            if stacks is None:
+                continue
+            if len(stacks) * len(group_stacks) > PREVIEW_STACK_LIMIT:
+                # 串接前先以乘積判斷，避免建立超過上限的集合；之後的群組只累計上限估計
+                stacks = None
+                continue
+            stacks = {prefix + stack for prefix in stacks for stack in group_stacks}
+        if stacks is None:
+            return upper_bound, None, False
+        prefixes = {stack[:i] for stack in stacks for i in range(1, len(stack) + 1)}
+        return len(stacks), len(prefixes), True
+
+    @staticmethod
+    def _selected_count(space, selection, sample_count):
+        """由選取模式直接計算輸出的組合數 (與 space.select 的結果數量相同)，不建立抽樣結果"""
+        if space.total == 0:
+            return 0
+        if selection == "Single Index":
+            return 1
+        if selection == "Random Sample":
+            return min(max(sample_count, 1), space.total)
+        if selection == "Stratified Sample":
+            # 分層抽樣至少涵蓋最大群組的每個項目
+            return min(max(sample_count, max(space.radices, default=1)), space.total)
+        return space.total
+
+    def preview(self, text_input, tag_settings, limit=10, seed=None,
+                selection="All Combinations", selection_seed=0, sample_count=1):
+        """
+        組合預覽與成本估算 (供 /custom_nodes/tagloader/preview 使用)：
+        與 process() 使用相同的解析與組合邏輯，但不套用 LoRA、不進行文本編碼。
+
+        Args:
+            limit (int): 回傳的 Prompt 數量 (上限 PREVIEW_MAX_PROMPTS)
+            seed (int): 指定時隨機抽取 Prompt，否則回傳前 limit 個組合
+            selection / selection_seed / sample_count: 與節點相同的選取設定，用於計算實際輸出數量
+        Returns:
+            dict: 組合數、各群組大小、LoRA 疊加數、預估 LoRA 讀取量與 Prompt 範例 (可序列化為 JSON)
+        """
+        delimiter = "\n"
+        TAG_LIBRARY.begin_run()
+        base_text_cleaned, base_loras, prompts_groups, combo_rules = self._build_groups(text_input, tag_settings)
+        space = self._build_space(base_text_cleaned, base_loras, prompts_groups, combo_rules)
+        selected = self._selected_count(space, selection, sample_count)
+        stack_count, patch_count, exact = self._count_lora_stacks(space, base_loras)
+
+        # 組合空間中會用到的 LoRA 檔案：依檔案大小估算讀取量，已在快取中的檔案不需讀取
+        lora_names = [entry[0] for entry in base_loras]
+        if space.total:
+            lora_names.extend(entry[0] for group in space.groups for item in group if item for entry in item[1])
+        LORA_INDEX.refresh()
+        lora_files = []
+        missing = []
+        for lora_name in dict.fromkeys(lora_names):
+            lora_path = self._resolve_lora_path(lora_name)
+            if lora_path is None:
+                missing.append(lora_name)
+                continue
+            try:
+                size = os.path.getsize(lora_path)
+            except OSError:
+                missing.append(lora_name)
+                continue
+            lora_files.append({"name": lora_name, "bytes": size, "cached": LORA_CACHE.contains(lora_path)})
+
+        count = min(max(limit, 0), PREVIEW_MAX_PROMPTS, space.total)
+        if seed is None or count == 0:
+            indices = range(count)
         else:
-            combinations = list(itertools.product(*prompts_groups))
+            indices = sample_indices(space.total, count, seed, "Floyd")
+        prompts = []
+        for combo_index in indices:
+            combined_prompt, all_loras = self._assemble_combo(space[combo_index], base_text_cleaned, base_loras, delimiter)
+            prompts.append({"index": combo_index, "prompt": combined_prompt, "loras": [list(entry) for entry in all_loras]})
+
+        return {
+            "total": space.total,
+            "unpruned_total": getattr(space, "unpruned_total", space.total),
+            "selected": selected,
+            "group_sizes": space.radices if prompts_groups else [],
+            "lora_stacks": stack_count,
+            "lora_patches": patch_count,
+            "lora_stacks_exact": exact,
+            "lora_files": lora_files,
+            "lora_bytes": sum(f["bytes"] for f in lora_files if not f["cached"]),
+            "lora_bytes_total": sum(f["bytes"] for f in lora_files),
+            "missing_loras": missing,
+            "prompts": prompts,
+        }
+
+    @staticmethod
+    def _chunk(sequence, chunk_size, chunk_index):
+        """
+        分段輸出：取出第 chunk_index 段 (取模循環)。
+
+        Returns:
+            tuple: (該段的序列, (段索引, 總段數, 起始位置, 結束位置, 總數))
+        """
+        total = len(sequence)
+        total_chunks = (total + chunk_size - 1) // chunk_size
+        if total_chunks == 0:
+            return sequence, (0, 0, 0, 0, 0)
+        chunk = chunk_index % total_chunks
+        start = chunk * chunk_size
+        end = min(start + chunk_size, total)
+        return sequence[start:end], (chunk, total_chunks, start, end, total)
+
+    def _process(self, text_input, tag_settings, model, clip, encode_batch_size,
+                 selection, selection_seed, sample_count, deduplicate, chunk_size=0, chunk_index=0):
+        """
+        主要處理工作流：
+        1. 讀取標籤群組 (_build_groups)。
+        2. 建立惰性組合空間 (笛卡兒積，有組合規則時剪除違反規則的子空間)，依選取模式僅實體化需要的組合索引。
+        3. (可選) 合併輸出相同的組合。
+        4. (可選) 分段輸出：僅保留第 chunk_index 段，只為該段建立模型 / CLIP / Conditioning。
+        5. 為每組組合進行模型加權 (LoRA) 與文本編碼 (Conditioning)。
+        """
+        delimiter = "\n" 
+        LORA_INDEX.begin_run()
+        with phase("build_groups"):
+            base_text_cleaned, base_loras, prompts_groups, combo_rules = self._build_groups(text_input, tag_settings)
+
+        # 核心運算：以混合進位制組合空間取代 list(itertools.product(...))；有組合規則時先剪枝再選取
+        with phase("build_space"):
+            space = self._build_space(base_text_cleaned, base_loras, prompts_groups, combo_rules)
+        if combo_rules is not None:
+            print(f"[DynamicTagLoader] Combination Rules: {space.total} of {space.unpruned_total} combinations allowed")
+        selected_indices = space.select(selection, selection_seed, sample_count)
+
+        # 分段輸出 (未去重複)：輸出位置即選取索引，直接切出該段，不組合其他段的 Prompt
+        chunk_info = None
+        if chunk_size > 0 and deduplicate == "Off":
+            selected_indices, chunk_info = self._chunk(selected_indices, chunk_size, chunk_index)
         
-        final_models = []
-        final_clips = []
-        final_prompts = []
-        final_conditionings = []
-
-        # 遍歷組合，構建最終輸出列表
-        for combo in combinations:
-            current_texts = []
-            if base_text_cleaned:
-                current_texts.append(base_text_cleaned)
-            current_texts.extend([item[0] for item in combo if item and item[0]])
-            combined_prompt = delimiter.join(current_texts)
-            
-            # 整合全域與局部 (檔案內) 的 LoRA 配置
-            all_loras = []
-            if base_loras:
-                all_loras.extend(base_loras)
-            for item in combo:
-                if item:
-                    all_loras.extend(item[1]) 
-            
-            # 執行 LoRA 疊加應用
-            current_model = model
-            current_clip = clip
-            if current_model is not None and current_clip is not None and all_loras:
-                for lora_name, strength in all_loras:
-                    current_model, current_clip = self._load_lora(current_model, current_clip, lora_name, strength, strength)
-            
-            # 文本編碼處理：將組合成的 Prompt 轉換為 Conditioning 向量
-            current_conditioning = None
-            if current_clip is not None:
-                try:
-                    tokens = current_clip.tokenize(combined_prompt)
-                    cond, pooled = current_clip.encode_from_tokens(tokens, return_pooled=True)
-                    current_conditioning = [[cond, {"pooled_output": pooled}]]
-                except:
-                    pass
+        # 去重複 (Canonicalization)：在任何 LoRA Patch 與文本編碼之前合併輸出相同的組合
+        plans = []          # 唯一組合: (Prompt, LoRA 疊加)
+        output_slots = []   # 每個輸出位置對應的唯一組合索引
+        seen = {}
+        dropped = 0
+        for combo_index in selected_indices:
+            combined_prompt, all_loras = self._assemble_combo(space[combo_index], base_text_cleaned, base_loras, delimiter)
+            if deduplicate != "Off":
+                key = self._canonical_key(combined_prompt, all_loras, delimiter)
+                slot = seen.get(key)
+                if slot is not None:
+                    dropped += 1
+                    if deduplicate == "Shared References":
+                        output_slots.append(slot)
+                    continue
+                seen[key] = len(plans)
+            output_slots.append(len(plans))
+            plans.append((combined_prompt, all_loras))
+
+        # 分段輸出 (去重複)：去重複需比較全部組合的文本 (不建立任何模型或 Conditioning)，再依輸出位置切段，
+        # 僅保留該段引用的唯一組合，串接各段的輸出即與完整輸出相同
+        if chunk_size > 0 and deduplicate != "Off":
+            output_slots, chunk_info = self._chunk(output_slots, chunk_size, chunk_index)
+            remap = {}
+            for slot in output_slots:
+                remap.setdefault(slot, len(remap))
+            plans = [plans[slot] for slot in remap]
+            output_slots = [remap[slot] for slot in output_slots]
+
+        unique_models = []
+        unique_clips = []
+        encode_entries = []
 
-            final_models.append(current_model)
-            final_clips.append(current_clip)
-            final_prompts.append(combined_prompt)
-            final_conditionings.append(current_conditioning)
+        # 以前綴樹共享 LoRA Patch：相同前綴只套用一次，相同疊加直接共用 model / clip
+        lora_trie = None
+        prefetcher = None
+        if model is not None and clip is not None:
+            prefetcher = self._start_prefetch(plans)
+            lora_trie = LoraStackTrie(
+                model, clip,
+                lambda m, c, name, sm, sc: self._load_lora(m, c, name, sm, sc, prefetcher=prefetcher))
+
+        # Conditioning 快取：以基礎 CLIP 識別碼區分不同的 CLIP 來源
+        clip_identity = CONDITIONING_CACHE.clip_identity(clip) if clip is not None else None
+        cond_hits_before = CONDITIONING_CACHE.hits
+        cond_misses_before = CONDITIONING_CACHE.misses
+        lora_file_keys = {}
+
+        # 遍歷唯一組合，執行 LoRA 疊加應用 (由前綴樹分支至最長共享前綴)；後續組合的 LoRA 檔案同時在背景預先載入
+        try:
+            for combined_prompt, all_loras in plans:
+                current_model = model
+                current_clip = clip
+                if lora_trie is not None and all_loras:
+                    current_model, current_clip = lora_trie.resolve(all_loras)
+                
+                # 未套用 LoRA 至 CLIP 時 (僅提供 clip)，疊加視為空
+                stack_key = self._stack_key(all_loras, lora_file_keys) if lora_trie is not None else ()
+                encode_entries.append((combined_prompt, current_clip, stack_key))
+                unique_models.append(current_model)
+                unique_clips.append(current_clip)
+        finally:
+            if prefetcher is not None:
+                prefetcher.close()
+                print(f"[DynamicTagLoader] LoRA Prefetch: {prefetcher.used}/{prefetcher.submitted} prefetched files used.")
+
+        # 文本編碼處理：將組合成的 Prompt 依 CLIP 分組批次轉換為 Conditioning 向量
+        unique_conditionings = self._encode_all(encode_entries, clip_identity, encode_batch_size)
+
+        # 依輸出位置展開 (Shared References 模式下重複項目共用同一組物件)
+        final_models = [unique_models[slot] for slot in output_slots]
+        final_clips = [unique_clips[slot] for slot in output_slots]
+        final_conditionings = [unique_conditionings[slot] for slot in output_slots]
+        final_prompts = [plans[slot][0] for slot in output_slots]
 
         count = len(final_prompts)
-        print(f"[DynamicTagLoader] Logic: Generated {count} batch combinations.")
+        print(f"[DynamicTagLoader] Logic: Generated {count} batch combinations (of {space.total} total, mode: {selection}).")
+        if lora_trie is not None:
+            print(f"[DynamicTagLoader] LoRA Trie: {lora_trie.patch_count} patches for {lora_trie.node_count - 1} distinct prefixes.")
+        cache_stats = LORA_CACHE.stats()
+        print(f"[DynamicTagLoader] LoRA Cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses / "
+              f"{cache_stats['evictions']} evictions | {cache_stats['bytes'] / (1024 * 1024):.1f} MB cached")
+
+        # 本次執行的 Conditioning 快取命中率
+        cond_hits = CONDITIONING_CACHE.hits - cond_hits_before
+        cond_lookups = cond_hits + CONDITIONING_CACHE.misses - cond_misses_before
+        cond_rate = (cond_hits / cond_lookups * 100) if cond_lookups else 0.0
+        cond_info = f"Conditioning Cache: {cond_hits}/{cond_lookups} hits ({cond_rate:.1f}%)"
+        print(f"[DynamicTagLoader] {cond_info}")
+        ui_info = {"cache_info": [cond_info], "total_combinations": [space.total]}
+        if deduplicate != "Off":
+            dedup_info = f"Deduplicate: {dropped} duplicate combinations {'shared' if deduplicate == 'Shared References' else 'dropped'}"
+            print(f"[DynamicTagLoader] {dedup_info}")
+            ui_info["dedup_info"] = [dedup_info]
+        if chunk_info is not None:
+            chunk, total_chunks, start, end, total = chunk_info
+            chunk_text = (f"Chunk {chunk + 1}/{total_chunks} | combinations {start + 1}-{end} of {total}"
+                          if total_chunks else "Chunk 0/0 | no combinations")
+            print(f"[DynamicTagLoader] {chunk_text}")
+            ui_info["chunk_info"] = [chunk_text]
+            ui_info["chunk_progress"] = [chunk + 1 if total_chunks else 0, total_chunks]
         
         if not final_prompts:
-            return ([], [], [], [], 0)
+            return {"ui": ui_info, "result": ([], [], [], [], 0)}
         
         # 回傳封裝後的組合列表
-        return (final_models, final_clips, final_conditionings, final_prompts, count)
\ No newline at end of file
+        return {"ui": ui_info, "result": (final_models, final_clips, final_conditionings, final_prompts, count)}
\ No newline at end of file
@@ -0,0 +1,78 @@
+import os
+
+import comfy.utils
+
+from .byte_cache import ByteBudgetCache, budget_from_env
+from .profiler import phase, add_bytes, add_count
+
+# -----------------------------------------------------------
+# 快取容量配置 (可透過環境變數調整，單位 MB)
+# -----------------------------------------------------------
+DEFAULT_BUDGET_BYTES = budget_from_env("DYNAMIC_TAGLOADER_LORA_CACHE_MB", 2048)
+
+
+def _state_dict_nbytes(state_dict):
+    """估算 LoRA state dict 佔用的記憶體大小 (僅計算 Tensor)"""
+    total = 0
+    for value in state_dict.values():
+        try:
+            total += value.numel() * value.element_size()
+        except AttributeError:
+            continue
+    return total
+
+
+class LoraWeightCache(ByteBudgetCache):
+    """
+    程序層級 (Process-wide) 的 LoRA 權重快取。
+    核心功能：
+    1. 以「實際路徑 + mtime + 檔案大小」作為鍵值，檔案被修改後會自動重新讀取。
+    2. 依記憶體預算執行 LRU 淘汰 (ByteBudgetCache)，避免無限制佔用 RAM。
+    """
+
+    @staticmethod
+    def file_key(lora_path):
+        """檔案識別鍵 (實際路徑, mtime_ns, 檔案大小)：快取鍵值，也供 Conditioning 快取區分 LoRA 檔案版本"""
+        real_path = os.path.realpath(lora_path)
+        st = os.stat(real_path)
+        return (real_path, st.st_mtime_ns, st.st_size)
+
+    def contains(self, lora_path):
+        """檢查檔案 (目前版本) 是否已在快取中，不影響 LRU 順序與命中統計"""
+        try:
+            key = self.file_key(lora_path)
+        except OSError:
+            return False
+        with self._lock:
+            return key in self._entries
+
+    def load(self, lora_path):
+        """
+        讀取 LoRA 權重：命中快取時直接回傳，否則從磁碟載入並寫入快取。
+
+        Args:
+            lora_path (str): LoRA 檔案完整路徑
+        Returns:
+            dict: LoRA state dict
+        """
+        key = self.file_key(lora_path)
+        with self._lock:
+            state_dict = self._lookup_locked(key)
+        if state_dict is not None:
+            add_count("lora_cache_hit")
+            return state_dict
+
+        with phase("load_torch_file"):
+            state_dict = comfy.utils.load_torch_file(lora_path, safe_load=True)
+        add_bytes("load_torch_file", key[2])
+        nbytes = _state_dict_nbytes(state_dict)
+
+        with self._lock:
+            # 同一路徑的舊版本 (mtime/size 已變動) 不可能再命中，直接釋放；單一檔案超過總預算時僅回傳本次使用
+            self._drop_locked(lambda k: k[0] == key[0])
+            self._insert_locked(key, state_dict, nbytes)
+        return state_dict
+
+
+# 全域共享實例：跨 process() 呼叫與所有 Loader 節點實例共用
+LORA_CACHE = LoraWeightCache(DEFAULT_BUDGET_BYTES)
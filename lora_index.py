@@ -0,0 +1,96 @@
+import os
+import threading
+
+import folder_paths
+
+from .profiler import phase
+
+
+class LoraResolver:
+    """
+    LoRA 名稱解析索引：取代每次解析都線性掃描 loras 清單的模糊比對。
+    1. 由 folder_paths.get_filename_list("loras") 建立一次索引，清單變動時自動重建。
+    2. 依原本的解析順序查詢：完整名稱 -> 補上 .safetensors -> 不區分大小寫的檔名 (忽略副檔名)。
+    3. 解析結果 (含找不到的名稱) 皆會快取；找不到的 LoRA 每次執行只警告一次。
+    """
+
+    def __init__(self):
+        self._names = []
+        self._names_key = None
+        self._exact = {}      # 完整相對路徑 (分隔符號統一為 /) -> 相對路徑
+        self._stems = {}      # 去除 .safetensors 的相對路徑 (分隔符號統一為 /) -> 相對路徑
+        self._casefold = {}   # 小寫檔名 (無副檔名) -> 相對路徑
+        self._resolved = {}   # 查詢名稱 -> 完整路徑或 None
+        self._warned = set()
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """比對系統 LoRA 清單，有變動時重建索引 (ComfyUI 本身會依資料夾 mtime 快取清單)"""
+        names = folder_paths.get_filename_list("loras")
+        with self._lock:
+            if names is self._names or tuple(names) == self._names_key:
+                return False
+            self._names = names
+            self._names_key = tuple(names)
+            self._exact = {}
+            self._stems = {}
+            self._casefold = {}
+            self._resolved = {}
+            for candidate in names:
+                # Windows 的清單以 \ 分隔子資料夾，索引鍵與查詢名稱統一使用 /
+                key = candidate.replace("\\", "/")
+                self._exact.setdefault(key, candidate)
+                if key.endswith(".safetensors"):
+                    self._stems.setdefault(key[:-12], candidate)
+                candidate_name = os.path.splitext(key.rsplit("/", 1)[-1])[0].lower()
+                self._casefold.setdefault(candidate_name, candidate)
+            return True
+
+    def begin_run(self):
+        """每次 Loader 執行開始時呼叫：同步索引並重置「只警告一次」的紀錄"""
+        self.refresh()
+        with self._lock:
+            self._warned.clear()
+
+    def resolve(self, lora_name):
+        """
+        解析 LoRA 名稱為完整路徑。
+
+        Returns:
+            str: 完整路徑，找不到時回傳 None
+        """
+        with self._lock:
+            if lora_name in self._resolved:
+                return self._resolved[lora_name]
+
+            normalized = lora_name.replace("\\", "/")
+            candidate = self._exact.get(normalized) or self._stems.get(normalized)
+            if candidate is None:
+                target_name = lora_name.lower()
+                if target_name.endswith(".safetensors"):
+                    target_name = target_name[:-12]
+                candidate = self._casefold.get(target_name)
+
+        with phase("lora_resolve"):
+            lora_path = folder_paths.get_full_path("loras", candidate) if candidate is not None else None
+        with self._lock:
+            self._resolved[lora_name] = lora_path
+        return lora_path
+
+    def warn_missing(self, lora_name):
+        """找不到 LoRA 時輸出警告 (同一次執行中每個名稱只輸出一次)"""
+        with self._lock:
+            if lora_name in self._warned:
+                return
+            self._warned.add(lora_name)
+        print(f"[DynamicTagLoader] Warning: Lora not found: {lora_name}")
+
+    def names(self):
+        """回傳目前索引中的 LoRA 清單 (供 API 使用)"""
+        self.refresh()
+        with self._lock:
+            return list(self._names)
+
+
+# 全域共享實例：Loader 與 /custom_nodes/loras_list 路由共用
+LORA_INDEX = LoraResolver()
@@ -0,0 +1,50 @@
+class _TrieNode:
+    __slots__ = ("children", "model", "clip")
+
+    def __init__(self, model, clip):
+        self.children = {}
+        self.model = model
+        self.clip = clip
+
+
+class LoraStackTrie:
+    """
+    LoRA 疊加前綴樹 (Prefix Trie)：
+    1. 每個節點代表一段 LoRA 疊加前綴，並保存套用該前綴後的 model / clip。
+    2. 新組合從「最長已存在前綴」分支，只需補上剩餘的 LoRA。
+    3. 完全相同的 LoRA 疊加會回傳同一組 model / clip 物件，不再重複 Clone。
+    """
+
+    def __init__(self, model, clip, apply_fn):
+        """
+        Args:
+            model: 基礎模型實例
+            clip: 基礎 CLIP 實例
+            apply_fn: 套用單一 LoRA 的函數 (model, clip, name, strength_model, strength_clip) -> (model, clip)
+        """
+        self._root = _TrieNode(model, clip)
+        self._apply_fn = apply_fn
+        self.patch_count = 0
+        self.node_count = 1
+
+    def resolve(self, stack):
+        """
+        取得套用指定 LoRA 疊加後的 model / clip。
+
+        Args:
+            stack (iterable): [(lora_name, strength_model, strength_clip), ...]，順序即套用順序
+        Returns:
+            tuple: (model, clip)
+        """
+        node = self._root
+        for entry in stack:
+            child = node.children.get(entry)
+            if child is None:
+                lora_name, strength_model, strength_clip = entry
+                model, clip = self._apply_fn(node.model, node.clip, lora_name, strength_model, strength_clip)
+                child = _TrieNode(model, clip)
+                node.children[entry] = child
+                self.patch_count += 1
+                self.node_count += 1
+            node = child
+        return node.model, node.clip
@@ -0,0 +1,72 @@
+import os
+
+from .tag_library import TAGS_DIR, TAG_LIBRARY
+from .tag_pack import build_pack, unpack, pack_path
+from .tag_parser import parse_prompt
+from .tag_writer import atomic_write
+
+
+class DynamicTagPacker:
+    """
+    標籤包管理節點：將資料夾內的 .txt 標籤檔案編譯為標籤包 (.tagpack)，或還原為個別檔案。
+    Loader 在資料夾內的檔案與打包時相同時自動使用，之後新增/刪除/修改檔案會使標籤包失效並回到讀取個別檔案。
+    """
+
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                # 標籤資料夾 (相對於 tags 目錄，"Root" 代表 tags 目錄本身)
+                "folder_name": ("STRING", {"default": "Root", "multiline": False}),
+                "action": (["Pack", "Unpack", "Status"], {"default": "Pack", "tooltip": "Pack compiles every .txt file of the folder into one mmap-read .tagpack. Unpack restores missing .txt files (files edited after packing are kept) and removes the pack."}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("pack_info",)
+    FUNCTION = "run"
+    CATEGORY = "Custom/TagLoader"
+    OUTPUT_NODE = True
+
+    @staticmethod
+    def _resolve_folder(folder_name):
+        """將資料夾名稱轉換為實際路徑，拒絕 tags 目錄以外的路徑"""
+        folder_name = folder_name.strip()
+        if folder_name in ("", "Root"):
+            return TAGS_DIR
+        dir_path = os.path.abspath(os.path.join(TAGS_DIR, os.path.normpath(folder_name)))
+        if os.path.commonpath([dir_path, os.path.abspath(TAGS_DIR)]) != os.path.abspath(TAGS_DIR):
+            return None
+        return dir_path
+
+    def run(self, folder_name, action="Pack"):
+        dir_path = self._resolve_folder(folder_name)
+        if dir_path is None or not os.path.isdir(dir_path):
+            return (f"Error: folder not found: {folder_name}",)
+
+        # 重新打包或刪除前先釋放 mmap (Windows 上開啟中的檔案無法被取代)
+        TAG_LIBRARY.drop_pack(dir_path)
+        try:
+            if action == "Pack":
+                count = build_pack(dir_path, parse_prompt)
+                size = os.path.getsize(pack_path(dir_path))
+                info = f"Packed: {count} files ({size} bytes)"
+            elif action == "Unpack":
+                if not os.path.exists(pack_path(dir_path)):
+                    return (f"No tag pack in: {folder_name}",)
+                written = unpack(dir_path, atomic_write)
+                info = f"Unpacked: {written} files written"
+            else:
+                pack = TAG_LIBRARY.pack_for(dir_path)
+                if pack is not None:
+                    info = f"Tag pack active: {len(pack.names)} files"
+                elif os.path.exists(pack_path(dir_path)):
+                    info = "Tag pack is stale (files added, removed or edited after packing), loose files are used"
+                else:
+                    info = "No tag pack, loose files are used"
+        except Exception as e:
+            print(f"[DynamicTagLoader] Tag Pack Error: {e}")
+            return (f"Error: {e}",)
+
+        print(f"[DynamicTagLoader] {info} | {dir_path}")
+        return (f"{info}\nLocation: {folder_name}",)
@@ -0,0 +1,112 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .profiler import PhaseCapture
+
+# -----------------------------------------------------------
+# 預先讀取配置 (可透過環境變數調整)
+# -----------------------------------------------------------
+# I/O 執行緒池大小 (標籤檔案並行讀取與 LoRA 預先載入共用)
+IO_WORKERS = int(os.environ.get("DYNAMIC_TAGLOADER_IO_WORKERS", "4"))
+# 同時預先載入的 LoRA 檔案數上限 (0 = 停用預先載入)
+PREFETCH_DEPTH = int(os.environ.get("DYNAMIC_TAGLOADER_PREFETCH_DEPTH", "4"))
+# 已預先載入但尚未使用的 LoRA 檔案總大小上限 (MB)
+PREFETCH_MB = int(os.environ.get("DYNAMIC_TAGLOADER_PREFETCH_MB", "1024"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def io_pool():
+    """取得共用的 I/O 執行緒池 (首次使用時建立)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, IO_WORKERS), thread_name_prefix="DynamicTagIO")
+        return _pool
+
+
+class LoraPrefetcher:
+    """
+    LoRA 權重預先載入：依組合計畫中 LoRA 首次出現的順序，在 I/O 執行緒池中提前讀取接下來會用到的檔案，
+    主執行緒套用目前組合的 Patch 時，後續檔案的磁碟 / 網路讀取同時進行。
+    1. 同時進行中的預先載入不超過 depth 個，已載入未使用的檔案總大小不超過 max_bytes (依檔案大小估算)。
+    2. 主執行緒以 take() 取得結果：已在預先載入中的檔案直接等待其完成，不會重複讀取。
+    3. 工作執行緒中的分段計時 (例如 load_torch_file 的耗時與讀取量) 於 take() 時併入主執行緒的計時器。
+    """
+
+    def __init__(self, paths, load_fn, depth=PREFETCH_DEPTH, max_bytes=PREFETCH_MB * 1024 * 1024):
+        """
+        Args:
+            paths (iterable): 依使用順序排列的 LoRA 檔案路徑 (已去除快取中已有的檔案)
+            load_fn: 讀取函數 path -> state dict (例如 LORA_CACHE.load)
+            depth (int): 同時預先載入的檔案數上限
+            max_bytes (int): 已預先載入但尚未使用的檔案總大小上限
+        """
+        self.depth = max(0, depth)
+        self.max_bytes = max_bytes
+        self.submitted = 0
+        self.used = 0
+        self._load_fn = load_fn
+        self._queue = deque(dict.fromkeys(paths))
+        self._futures = {}   # path -> (future, 檔案大小)
+        self._inflight_bytes = 0
+        self._fill()
+
+    def _fill(self):
+        while self._queue and len(self._futures) < self.depth:
+            path = self._queue[0]
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                self._queue.popleft()
+                continue
+            # 第一個檔案不受大小上限限制，避免單一大檔案永遠無法預先載入
+            if self._futures and self._inflight_bytes + size > self.max_bytes:
+                break
+            self._queue.popleft()
+            self._futures[path] = (io_pool().submit(self._load_captured, path), size)
+            self._inflight_bytes += size
+            self.submitted += 1
+
+    def _load_captured(self, path):
+        """於工作執行緒中執行讀取函數，並暫存期間的分段計時"""
+        with PhaseCapture() as capture:
+            result = self._load_fn(path)
+        return result, capture
+
+    def take(self, path):
+        """
+        取得預先載入的結果 (必要時等待完成)，並補上下一批預先載入。
+
+        Returns:
+            dict: state dict；未預先載入此檔案時回傳 None (由呼叫端自行同步讀取)
+        """
+        entry = self._futures.pop(path, None)
+        if entry is None:
+            # 計畫外或尚未排入的檔案：由呼叫端同步讀取，不再重複預先載入
+            try:
+                self._queue.remove(path)
+            except ValueError:
+                pass
+            self._fill()
+            return None
+        future, size = entry
+        try:
+            result, capture = future.result()
+            capture.merge()
+            return result
+        finally:
+            self._inflight_bytes -= size
+            self.used += 1
+            self._fill()
+
+    def close(self):
+        """取消尚未開始的預先載入 (已開始的仍會完成並寫入快取)"""
+        self._queue.clear()
+        for future, _ in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        self._inflight_bytes = 0
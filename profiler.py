@@ -0,0 +1,223 @@
+import os
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+# 設定 DYNAMIC_TAGLOADER_TRACEMALLOC=1 以記錄每次執行的峰值記憶體 (會降低執行速度)
+TRACE_MEMORY = os.environ.get("DYNAMIC_TAGLOADER_TRACEMALLOC", "0") == "1"
+
+# 直方圖區間上限 (毫秒)，最後一格為 "+inf"
+HISTOGRAM_BOUNDS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 60000)
+
+_local = threading.local()
+
+
+class _Phase:
+    __slots__ = ("seconds", "calls", "count", "bytes")
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self.count = 0
+        self.bytes = 0
+
+
+class PhaseProfiler:
+    """
+    單次節點執行的分段計時器：記錄各階段的耗時、呼叫次數、項目數與讀取位元組數。
+    透過 with 語法啟用後，其他模組可用 profiler.phase() / add_bytes() 回報至目前作用中的計時器。
+    """
+
+    def __init__(self, node_name):
+        self.node_name = node_name
+        self.phases = {}
+        self.peak_memory = None
+        self._start = None
+        self._previous = None
+        self._started_tracing = False
+        self.summary = None
+
+    def __enter__(self):
+        self._previous = getattr(_local, "active", None)
+        _local.active = self
+        if TRACE_MEMORY:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            tracemalloc.reset_peak()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        total = time.perf_counter() - self._start
+        if TRACE_MEMORY and tracemalloc.is_tracing():
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            if self._started_tracing:
+                tracemalloc.stop()
+        _local.active = self._previous
+        self.summary = self._build_summary(total)
+        PROFILE_STATS.record(self.node_name, self.summary)
+        return False
+
+    def _get(self, name):
+        entry = self.phases.get(name)
+        if entry is None:
+            entry = self.phases[name] = _Phase()
+        return entry
+
+    def _build_summary(self, total):
+        return {
+            "total_seconds": total,
+            "peak_memory": self.peak_memory,
+            "phases": {
+                name: {"seconds": p.seconds, "calls": p.calls, "count": p.count, "bytes": p.bytes}
+                for name, p in self.phases.items()
+            },
+        }
+
+    def format_summary(self):
+        """輸出單行摘要文字 (供 Log 與節點 ui 顯示)"""
+        if self.summary is None:
+            return ""
+        parts = [f"total {self.summary['total_seconds'] * 1000:.1f}ms"]
+        for name, p in self.summary["phases"].items():
+            if p["calls"]:
+                text = f"{name} {p['seconds'] * 1000:.1f}ms x{p['calls']}"
+                if p["count"] and p["count"] != p["calls"]:
+                    text += f" [{p['count']} items]"
+            else:
+                text = f"{name} x{p['count']}"
+            if p["bytes"]:
+                text += f" ({p['bytes'] / (1024 * 1024):.2f} MB)"
+            parts.append(text)
+        if self.summary["peak_memory"] is not None:
+            parts.append(f"peak {self.summary['peak_memory'] / (1024 * 1024):.1f} MB")
+        return " | ".join(parts)
+
+
+class PhaseCapture:
+    """
+    在工作執行緒中暫存 phase / add_count / add_bytes 的紀錄 (計時器為執行緒區域變數，工作執行緒中原本不會記錄)，
+    再由呼叫端執行緒以 merge() 併入當時作用中的計時器。
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self._previous = None
+
+    def _get(self, name):
+        entry = self.phases.get(name)
+        if entry is None:
+            entry = self.phases[name] = _Phase()
+        return entry
+
+    def __enter__(self):
+        self._previous = getattr(_local, "active", None)
+        _local.active = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.active = self._previous
+        return False
+
+    def merge(self):
+        """將暫存的紀錄併入目前執行緒作用中的計時器 (未啟用時不做任何事)"""
+        profiler = getattr(_local, "active", None)
+        if profiler is None:
+            return
+        for name, captured in self.phases.items():
+            entry = profiler._get(name)
+            entry.seconds += captured.seconds
+            entry.calls += captured.calls
+            entry.count += captured.count
+            entry.bytes += captured.bytes
+
+
+@contextmanager
+def phase(name):
+    """記錄一段程式的耗時至目前作用中的計時器 (未啟用時不做任何事)"""
+    profiler = getattr(_local, "active", None)
+    if profiler is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry = profiler._get(name)
+        entry.seconds += time.perf_counter() - start
+        entry.calls += 1
+
+
+def add_count(name, count=1):
+    profiler = getattr(_local, "active", None)
+    if profiler is not None:
+        profiler._get(name).count += count
+
+
+def add_bytes(name, nbytes):
+    profiler = getattr(_local, "active", None)
+    if profiler is not None:
+        profiler._get(name).bytes += nbytes
+
+
+class ProfileStats:
+    """跨執行累計的統計資料：各節點 / 各階段的總耗時、次數、位元組數與耗時直方圖"""
+
+    def __init__(self):
+        self._nodes = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bucket(seconds):
+        ms = seconds * 1000
+        for i, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if ms <= bound:
+                return i
+        return len(HISTOGRAM_BOUNDS_MS)
+
+    def _new_entry(self):
+        return {"runs": 0, "seconds": 0.0, "calls": 0, "count": 0, "bytes": 0,
+                "histogram": [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)}
+
+    def record(self, node_name, summary):
+        with self._lock:
+            node = self._nodes.setdefault(node_name, {"total": self._new_entry(), "phases": {}, "peak_memory": None, "last": None})
+            total = node["total"]
+            total["runs"] += 1
+            total["seconds"] += summary["total_seconds"]
+            total["histogram"][self._bucket(summary["total_seconds"])] += 1
+            for name, p in summary["phases"].items():
+                entry = node["phases"].setdefault(name, self._new_entry())
+                entry["runs"] += 1
+                entry["seconds"] += p["seconds"]
+                entry["calls"] += p["calls"]
+                entry["count"] += p["count"]
+                entry["bytes"] += p["bytes"]
+                entry["histogram"][self._bucket(p["seconds"])] += 1
+            if summary["peak_memory"] is not None:
+                node["peak_memory"] = max(node["peak_memory"] or 0, summary["peak_memory"])
+            node["last"] = summary
+
+    def snapshot(self):
+        """回傳可序列化為 JSON 的統計資料複本"""
+        with self._lock:
+            labels = [f"<={b}ms" for b in HISTOGRAM_BOUNDS_MS] + ["+inf"]
+            result = {"histogram_buckets": labels, "nodes": {}}
+            for node_name, node in self._nodes.items():
+                result["nodes"][node_name] = {
+                    "total": dict(node["total"], histogram=list(node["total"]["histogram"])),
+                    "phases": {k: dict(v, histogram=list(v["histogram"])) for k, v in node["phases"].items()},
+                    "peak_memory": node["peak_memory"],
+                    "last": node["last"],
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._nodes.clear()
+
+
+# 全域共享實例：供 /custom_nodes/tagloader/stats 路由讀取
+PROFILE_STATS = ProfileStats()
@@ -0,0 +1,146 @@
+import hashlib
+import random
+
+# -----------------------------------------------------------
+# 次線性 (Sub-linear) 抽樣策略
+# 皆只依賴索引空間大小 n，時間與記憶體為 O(k)，可直接套用於惰性組合空間。
+# -----------------------------------------------------------
+SAMPLE_STRATEGIES = ["Shuffle (Legacy)", "Floyd", "Permutation"]
+
+
+def floyd_sample(n, k, seed):
+    """
+    Floyd 抽樣演算法：從 [0, n) 中不重複抽取 k 個索引，僅需 O(k) 時間與記憶體。
+
+    Returns:
+        list: k 個不重複索引 (順序由 seed 決定)
+    """
+    k = min(k, n)
+    rng = random.Random(seed)
+    chosen = set()
+    result = []
+    for j in range(n - k, n):
+        t = rng.randrange(j + 1)
+        if t in chosen:
+            t = j
+        chosen.add(t)
+        result.append(t)
+    # Floyd 的插入順序偏向較大的索引，最後以 O(k) 洗牌打散輸出順序
+    rng.shuffle(result)
+    return result
+
+
+class SeededPermutation:
+    """
+    以 Feistel 網路建立 [0, n) 上的偽隨機雙射 (Bijection)：
+    permute(i) 可在 O(1) 期望時間內取得第 i 個位置，無需建立長度為 n 的索引列表。
+    超出 n 的值以循環行走 (Cycle Walking) 處理，期望迭代次數小於 4。
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, n, seed):
+        self.n = n
+        bits = max(2, (max(n - 1, 1)).bit_length())
+        if bits % 2:
+            bits += 1
+        self._half = bits // 2
+        self._mask = (1 << self._half) - 1
+        self._nbytes = max(8, (self._half + 7) // 8)
+        self._keys = [
+            int.from_bytes(hashlib.blake2b(f"{seed}:{r}".encode("ascii"), digest_size=8).digest(), "little")
+            for r in range(self.ROUNDS)
+        ]
+
+    def _round(self, value, key):
+        digest = hashlib.blake2b(value.to_bytes(self._nbytes, "little"), digest_size=min(64, self._nbytes),
+                                 key=key.to_bytes(8, "little")).digest()
+        return int.from_bytes(digest, "little") & self._mask
+
+    def _encrypt(self, x):
+        left, right = x >> self._half, x & self._mask
+        for key in self._keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << self._half) | right
+
+    def permute(self, index):
+        if index < 0 or index >= self.n:
+            raise IndexError(f"Permutation index {index} out of range (n {self.n})")
+        value = self._encrypt(index)
+        while value >= self.n:
+            value = self._encrypt(value)
+        return value
+
+    def take(self, k):
+        return [self.permute(i) for i in range(min(k, self.n))]
+
+
+def sample_indices(n, k, seed, strategy="Floyd"):
+    """
+    依策略從 [0, n) 中抽取 k 個不重複索引 (皆可由 seed 重現)。
+
+    Args:
+        n (int): 索引空間大小
+        k (int): 抽樣數量
+        seed (int): 隨機種子
+        strategy (str): "Shuffle (Legacy)" / "Floyd" / "Permutation"
+    Returns:
+        list: 抽樣結果
+    """
+    if n <= 0 or k <= 0:
+        return []
+    if strategy == "Permutation":
+        return SeededPermutation(n, seed).take(k)
+    if strategy == "Shuffle (Legacy)":
+        # 與舊版行為一致：完整洗牌後取前 k 個 (O(n))
+        indices = list(range(n))
+        random.Random(seed).shuffle(indices)
+        return indices[:k]
+    return floyd_sample(n, k, seed)
+
+
+def stratified_sample(space, k, seed):
+    """
+    分層抽樣：保證每個群組中的每個檔案至少出現一次。
+    實際抽樣數為 max(k, 最大群組大小)，重複的組合以種子排列 (SeededPermutation) 補齊。
+
+    Args:
+        space: CombinationSpace 或 PrunedSpace (僅使用 radices / encode / total；違反規則的組合 encode 回傳 None)
+        k (int): 期望抽樣數量
+        seed (int): 隨機種子
+    Returns:
+        list: 組合索引
+    """
+    if space.total == 0:
+        return []
+    rng = random.Random(seed)
+    radices = space.radices
+    target = min(max(k, max(radices, default=1)), space.total)
+
+    # 各群組獨立洗牌，第 j 個樣本取各群組洗牌後的第 (j mod 群組大小) 個項目
+    orders = []
+    for radix in radices:
+        order = list(range(radix))
+        rng.shuffle(order)
+        orders.append(order)
+
+    chosen = set()
+    result = []
+    for j in range(target):
+        index = space.encode([order[j % len(order)] for order in orders])
+        if index is not None and index not in chosen:
+            chosen.add(index)
+            result.append(index)
+
+    # 不同 j 可能解碼為相同組合 (群組大小的最小公倍數較小時) 或被規則排除，以隨機抽樣補足
+    fill_seed = rng.randrange(1 << 62)
+    if len(result) < target:
+        permutation = SeededPermutation(space.total, fill_seed)
+        for i in range(space.total):
+            index = permutation.permute(i)
+            if index not in chosen:
+                chosen.add(index)
+                result.append(index)
+                if len(result) >= target:
+                    break
+    return result
@@ -2,6 +2,8 @@ import os
 import json
 import folder_paths
 
+from .tag_writer import TAG_WRITE_QUEUE, write_new
+
 # 初始化基礎路徑：設定存檔根目錄為當前節點目錄下的 "tags"
 NODE_FILE_PATH = os.path.dirname(os.path.abspath(__file__))
 TAGS_DIR = os.path.join(NODE_FILE_PATH, "tags")
@@ -20,6 +22,10 @@ class DynamicTagSaver:
                 # 隱藏輸入：接收前端傳來的 LoRA JSON 設定字串
                 "lora_settings": ("STRING", {"default": "{}", "multiline": False, "hidden": True}),
             },
+            "optional": {
+                # 寫入模式：Sync 在執行期間完成原子寫入；Write-Behind 排入背景佇列後立即返回
+                "write_mode": (["Sync", "Write-Behind"], {"default": "Sync", "tooltip": "Write-Behind queues the files on a background thread (fsyncs are batched) so large bulk saves do not stall the graph. Pending files are flushed on shutdown."}),
+            },
         }
 
     # 節點屬性定義
@@ -29,13 +35,19 @@ class DynamicTagSaver:
     CATEGORY = "Custom/TagLoader"
     OUTPUT_NODE = True 
 
-    def save_tag(self, text, folder_name, filename, lora_settings="{}"):
-        # 去除頭尾空白
-        content_to_save = text.strip()
-        
-        # ---------------------------
-        # 1. 處理 LoRA 設定 (解析 JSON 並附加至文本)
-        # ---------------------------
+    # 列表輸入：可直接連接 Loader 的 prompt 列表輸出，一次寫入多個檔案
+    INPUT_IS_LIST = True
+
+    @staticmethod
+    def _first(value, default):
+        """INPUT_IS_LIST 模式下，設定類輸入取第一個值"""
+        if isinstance(value, list):
+            return value[0] if value else default
+        return value
+
+    @staticmethod
+    def _format_loras(lora_settings):
+        """解析 LoRA 設定 JSON，回傳需附加至文本的 LoRA 語法行"""
         try:
             settings = json.loads(lora_settings)
         except Exception as e:
@@ -56,57 +68,151 @@ class DynamicTagSaver:
             if lora_name and lora_name != "None":
                 # 格式化為標準 Prompt 語法: <lora:Filename:1.0>
                 loras_to_add.append(f"<lora:{lora_name}:{strength}>")
+        return loras_to_add
+
+    @staticmethod
+    def _scan_suffixes(target_dir, name, ext):
+        """
+        一次掃描目錄，回傳 (基本檔名是否已被使用, 現有最大流水號)。
+        之後的檔名由最大流水號 + 1 開始分配 (如: file_1.txt, file_2.txt)，不需逐一探測。
+        """
+        prefix = f"{name}_"
+        base_taken = False
+        highest = 0
+        with os.scandir(target_dir) as it:
+            for entry in it:
+                entry_name, entry_ext = os.path.splitext(entry.name)
+                if entry_ext != ext:
+                    continue
+                if entry_name == name:
+                    base_taken = True
+                elif entry_name.startswith(prefix) and entry_name[len(prefix):].isdigit():
+                    highest = max(highest, int(entry_name[len(prefix):]))
+        return base_taken, highest
+
+    @staticmethod
+    def _pair(value, count, default):
+        """
+        將設定類的列表輸入與文本逐一配對：單一值套用至全部文本，長度與文本數相同時一對一配對。
 
-        # 若有 LoRA，則換行並附加到主要文本後方
-        if loras_to_add:
-            content_to_save += "\n" + "\n".join(loras_to_add)
+        Returns:
+            list: 長度為 count 的值列表，長度不符時回傳 None
+        """
+        values = value if isinstance(value, list) else [value]
+        if not values:
+            values = [default]
+        if len(values) == 1:
+            return values * count
+        if len(values) == count:
+            return values
+        return None
+
+    @staticmethod
+    def _safe_folder(folder_name):
+        """過濾資料夾名稱中的非法字元"""
+        safe_folder = "".join(c for c in folder_name if c.isalnum() or c in (' ', '_', '-')).strip()
+        return safe_folder or "default_folder"
+
+    @staticmethod
+    def _safe_filename(filename):
+        """確保有 .txt 副檔名並過濾非法字元"""
+        base_name = filename if filename.endswith(".txt") else f"{filename}.txt"
+        return "".join(c for c in base_name if c.isalnum() or c in (' ', '_', '-', '.'))
+
+    def save_tag(self, text, folder_name, filename, lora_settings="{}", write_mode="Sync"):
+        texts = text if isinstance(text, list) else [text]
+        lora_settings = self._first(lora_settings, "{}")
+        write_mode = self._first(write_mode, "Sync")
+
+        # 列表輸入逐一配對 (與 ComfyUI 逐項執行節點時相同)：文本 / 資料夾 / 檔名各自為單一值或相同長度的列表
+        count = max(len(texts), len(folder_name) if isinstance(folder_name, list) else 1,
+                    len(filename) if isinstance(filename, list) else 1)
+        texts = self._pair(texts, count, "")
+        folder_names = self._pair(folder_name, count, "new_folder")
+        filenames = self._pair(filename, count, "my_prompt")
+        if texts is None or folder_names is None or filenames is None:
+            lengths = [len(v) if isinstance(v, list) else 1 for v in (text, folder_name, filename)]
+            return (f"Error: text / folder_name / filename list lengths do not match ({lengths[0]} / {lengths[1]} / {lengths[2]}); "
+                    f"connect a single value or one value per text.",)
 
         # ---------------------------
-        # 2. 處理資料夾路徑與安全性
+        # 1. 處理 LoRA 設定 (解析 JSON 並附加至文本)
         # ---------------------------
-        # 過濾資料夾名稱中的非法字元
-        safe_folder = "".join(c for c in folder_name if c.isalnum() or c in (' ', '_', '-')).strip()
-        if not safe_folder: 
-            safe_folder = "default_folder"
-            
-        target_dir = os.path.join(TAGS_DIR, safe_folder)
-        
-        # 建立目錄 (若不存在)
-        if not os.path.exists(target_dir):
-            try:
-                os.makedirs(target_dir)
-            except Exception as e:
-                return (f"Error creating directory: {e}",)
+        loras_to_add = self._format_loras(lora_settings)
+
+        contents = []
+        for item in texts:
+            # 去除頭尾空白
+            content_to_save = item.strip()
+            # 若有 LoRA，則換行並附加到主要文本後方
+            if loras_to_add:
+                content_to_save += "\n" + "\n".join(loras_to_add)
+            contents.append(content_to_save)
 
         # ---------------------------
-        # 3. 處理檔名與重複檢查
+        # 2. 處理資料夾路徑與安全性
         # ---------------------------
-        # 確保有 .txt 副檔名並過濾非法字元
-        base_name = filename if filename.endswith(".txt") else f"{filename}.txt"
-        base_name = "".join(c for c in base_name if c.isalnum() or c in (' ', '_', '-', '.'))
-        
-        file_path = os.path.join(target_dir, base_name)
-        
-        # 若檔案已存在，自動添加流水號 (如: file_1.txt, file_2.txt)
-        if os.path.exists(file_path):
-            name, ext = os.path.splitext(base_name)
-            counter = 1
-            while os.path.exists(file_path):
-                file_path = os.path.join(target_dir, f"{name}_{counter}{ext}")
-                counter += 1
-        
+        safe_folders = [self._safe_folder(name) for name in folder_names]
+        for safe_folder in dict.fromkeys(safe_folders):
+            target_dir = os.path.join(TAGS_DIR, safe_folder)
+            # 建立目錄 (若不存在)
+            if not os.path.exists(target_dir):
+                try:
+                    os.makedirs(target_dir)
+                except Exception as e:
+                    return (f"Error creating directory: {e}",)
+
         # ---------------------------
-        # 4. 寫入檔案
+        # 3. 寫入檔案 (暫存檔 + hard link 發布；Write-Behind 模式交由背景執行緒寫入，檔名於寫入時取得)
         # ---------------------------
-        try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(content_to_save)
-            
-            print(f"[DynamicTagSaver] Saved to: {file_path}")
+        # 每個 (資料夾, 檔名) 僅掃描目錄一次，依現有最大流水號分配檔名；實際檔名在內容寫入後以 hard link 獨佔取得，
+        # 避免多個存檔節點互相覆蓋
+        write_behind = write_mode == "Write-Behind"
+        counters = {}  # (目錄, 檔名, 副檔名) -> [下一個流水號, 現有最大流水號]
+        saved = []
+        errors = []
+        queue_depth = 0
+        for content_to_save, safe_folder, filename in zip(contents, safe_folders, filenames):
+            base_name = self._safe_filename(filename)
+            target_dir = os.path.join(TAGS_DIR, safe_folder)
+            name, ext = os.path.splitext(base_name)
+            try:
+                state = counters.get((target_dir, name, ext))
+                if state is None:
+                    base_taken, highest = self._scan_suffixes(target_dir, name, ext)
+                    state = counters[(target_dir, name, ext)] = [highest + 1 if base_taken else 0, highest]
+                counter, highest = state
+                if write_behind:
+                    queue_depth = TAG_WRITE_QUEUE.submit(target_dir, name, ext, counter, content_to_save)
+                    # 預計的檔名 (被其他存檔搶先使用時，實際寫入會改用下一個流水號)
+                    file_path = os.path.join(target_dir, f"{name}{ext}" if counter == 0 else f"{name}_{counter}{ext}")
+                    counter += 1
+                else:
+                    file_path, counter = write_new(target_dir, name, ext, counter, content_to_save)
+                state[0] = max(counter, highest + 1)
+                saved.append(file_path)
+            except Exception as e:
+                print(f"[DynamicTagSaver] Write Error: {e}")
+                errors.append(f"{safe_folder}/{base_name}: {e}")
+
+        queue_info = ""
+        if write_behind:
+            print(f"[DynamicTagSaver] Write-Behind: queued {len(saved)} files (queue depth {queue_depth})")
+            queue_info = f"\nWrite-Behind Queue Depth: {queue_depth} (file names are final once written)"
+
+        location = ", ".join(dict.fromkeys(safe_folders))
+        if len(contents) == 1:
+            if errors:
+                return (f"Error saving file: {errors[0].split(': ', 1)[1]}",)
+            print(f"[DynamicTagSaver] Saved to: {saved[0]}")
             # 回傳成功訊息與內容預覽
-            result_text = f"Saved: {os.path.basename(file_path)}\nLocation: {safe_folder}\n\nContent Preview:\n{content_to_save}"
-        except Exception as e:
-            print(f"[DynamicTagSaver] Write Error: {e}")
-            result_text = f"Error saving file: {e}"
+            return (f"Saved: {os.path.basename(saved[0])}\nLocation: {location}{queue_info}\n\nContent Preview:\n{contents[0]}",)
 
-        return (result_text,)
\ No newline at end of file
+        # 批次模式：回傳摘要
+        print(f"[DynamicTagSaver] Saved {len(saved)}/{len(contents)} files to: {', '.join(os.path.join(TAGS_DIR, f) for f in dict.fromkeys(safe_folders))}")
+        result_text = f"Saved: {len(saved)} files\nLocation: {location}{queue_info}"
+        if saved:
+            result_text += f"\nFiles: {os.path.basename(saved[0])} ... {os.path.basename(saved[-1])}"
+        if errors:
+            result_text += f"\n\nErrors ({len(errors)}):\n" + "\n".join(errors)
+        return (result_text,)
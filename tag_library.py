@@ -0,0 +1,449 @@
+import os
+import hashlib
+import threading
+
+from .profiler import phase, add_bytes, add_count
+from .tag_pack import TagPack, pack_path
+from .prefetch import io_pool
+
+# -----------------------------------------------------------
+# 基礎路徑配置
+# -----------------------------------------------------------
+NODE_FILE_PATH = os.path.dirname(os.path.abspath(__file__))
+TAGS_DIR = os.path.join(NODE_FILE_PATH, "tags")
+
+
+class _DirEntry:
+    __slots__ = ("mtime_ns", "subdirs", "txt_files")
+
+    def __init__(self, mtime_ns, subdirs, txt_files):
+        self.mtime_ns = mtime_ns
+        self.subdirs = subdirs
+        self.txt_files = txt_files
+
+
+class _FileEntry:
+    __slots__ = ("token", "content", "parsed")
+
+    def __init__(self, token, content):
+        self.token = token
+        self.content = content
+        self.parsed = None
+
+
+class TagLibrary:
+    """
+    標籤庫記憶體索引 (資料夾 -> 檔案 -> 解析內容)，由 API 路由與 Loader 共用。
+    1. 目錄以 mtime 驗證：僅在目錄 mtime 改變時才重新列舉 (新增/刪除/更名皆會改變目錄 mtime)。
+    2. 檔案內容以 (mtime, size) 驗證：未變動時直接回傳快取內容，不重新開檔。
+    3. 目錄結構每次變動都會遞增版本號，供 API 產生 ETag。
+    4. 資料夾內有有效的標籤包 (.tagpack，打包後未新增/刪除/修改任何檔案) 時，改由標籤包讀取，否則使用個別 .txt 檔案。
+       逐檔驗證的結果以 (資料夾, 標籤包) 的 (mtime_ns, size) 與執行序號快取，同一次執行中每個資料夾只驗證一次。
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.version = 0
+        self._dirs = {}    # 絕對路徑 -> _DirEntry
+        self._files = {}   # 絕對路徑 -> _FileEntry
+        self._packs = {}   # 資料夾絕對路徑 -> ((mtime_ns, size), TagPack)
+        self._validated = {}  # 資料夾絕對路徑 -> (驗證鍵值, 是否有效)
+        self._run = 0
+        self._tree = None
+        self._tree_version = -1
+        self._lock = threading.RLock()
+
+    # -------------------------------------------------------
+    # 目錄索引
+    # -------------------------------------------------------
+    def _scan_dir(self, dir_path):
+        subdirs = []
+        txt_files = []
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        subdirs.append(entry.name)
+                    elif entry.name.endswith(".txt"):
+                        txt_files.append(entry.name)
+                except OSError:
+                    continue
+        return sorted(subdirs), sorted(txt_files)
+
+    def _revalidate_dir(self, dir_path):
+        """驗證單一目錄：mtime 未變動時沿用索引，否則重新列舉。回傳 _DirEntry 或 None"""
+        try:
+            mtime_ns = os.stat(dir_path).st_mtime_ns
+        except OSError:
+            if self._dirs.pop(dir_path, None) is not None:
+                self.version += 1
+            return None
+        entry = self._dirs.get(dir_path)
+        if entry is not None and entry.mtime_ns == mtime_ns:
+            return entry
+        try:
+            subdirs, txt_files = self._scan_dir(dir_path)
+        except OSError:
+            return None
+        self._dirs[dir_path] = _DirEntry(mtime_ns, subdirs, txt_files)
+        self.version += 1
+        return self._dirs[dir_path]
+
+    def refresh(self):
+        """由根目錄逐層驗證整個標籤庫 (每個目錄僅一次 stat，變動的目錄才重新列舉)"""
+        with self._lock:
+            seen = set()
+            stack = [self.root]
+            while stack:
+                dir_path = stack.pop()
+                entry = self._revalidate_dir(dir_path)
+                if entry is None:
+                    continue
+                seen.add(dir_path)
+                stack.extend(os.path.join(dir_path, name) for name in entry.subdirs)
+
+            # 移除已不存在 (或已不在樹中) 的目錄索引
+            stale = [p for p in self._dirs if p not in seen and self._is_under_root(p)]
+            for dir_path in stale:
+                del self._dirs[dir_path]
+            if stale:
+                self.version += 1
+            return self.version
+
+    def _is_under_root(self, path):
+        return path == self.root or path.startswith(self.root + os.sep)
+
+    def tree(self):
+        """
+        取得前端選單用的目錄結構與 ETag。
+
+        Returns:
+            tuple: ({"相對路徑": ["ALL", "a.txt", ...], ...}, etag)
+        """
+        with self._lock:
+            self.refresh()
+            if self._tree_version != self.version:
+                data = {}
+                for dir_path in sorted(p for p in self._dirs if self._is_under_root(p)):
+                    txt_files = self._dirs[dir_path].txt_files
+                    # 過濾空目錄：僅將包含有效 .txt 檔案的目錄加入索引
+                    if not txt_files:
+                        continue
+                    # 跨平台相容性處理：統一使用 POSIX 風格路徑分隔符 (/)
+                    data[self._rel_path(dir_path)] = ["ALL"] + txt_files
+                digest = hashlib.sha1(repr(sorted(data.items())).encode("utf-8")).hexdigest()
+                self._tree = (data, f'"{digest}"')
+                self._tree_version = self.version
+            return self._tree
+
+    def _rel_path(self, dir_path):
+        """絕對路徑 -> 前端使用的相對路徑 (POSIX 分隔符，根目錄為 "Root")"""
+        rel_path = os.path.relpath(dir_path, self.root)
+        return "Root" if rel_path == "." else rel_path.replace("\\", "/")
+
+    def resolve_folder(self, rel_path):
+        """
+        前端相對路徑 -> 絕對路徑 ("Root" 或空字串代表根目錄)。
+
+        Returns:
+            str: 絕對路徑，位於標籤庫以外 (如 "../") 時回傳 None
+        """
+        if not rel_path or rel_path == "Root":
+            return self.root
+        dir_path = os.path.abspath(os.path.join(self.root, os.path.normpath(rel_path)))
+        return dir_path if self._is_under_root(dir_path) else None
+
+    def subfolders(self, rel_path):
+        """
+        列出單一資料夾的子資料夾 (前端選單展開時逐層讀取，不走訪整個目錄樹)。
+
+        Returns:
+            dict: {"parent": 相對路徑, "files": 檔案數, "folders": [{"name", "path", "files", "subfolders"}, ...]}，
+                  資料夾不存在時回傳 None
+        """
+        with self._lock:
+            dir_path = self.resolve_folder(rel_path)
+            entry = self._revalidate_dir(dir_path) if dir_path is not None else None
+            if entry is None:
+                return None
+            folders = []
+            for name in entry.subdirs:
+                child_path = os.path.join(dir_path, name)
+                child = self._revalidate_dir(child_path)
+                if child is None:
+                    continue
+                folders.append({
+                    "name": name,
+                    "path": self._rel_path(child_path),
+                    "files": len(child.txt_files),
+                    "subfolders": len(child.subdirs),
+                })
+            return {"parent": self._rel_path(dir_path), "files": len(entry.txt_files), "folders": folders}
+
+    def folder_files(self, rel_path, offset=0, limit=0, prefix=""):
+        """
+        分頁列出資料夾內的 .txt 檔案 (排序後)。
+
+        Args:
+            rel_path (str): 前端相對路徑
+            offset (int): 起始位置
+            limit (int): 最多回傳的檔案數 (0 = 不限制)
+            prefix (str): 僅列出檔名以此開頭的檔案 (不區分大小寫)
+        Returns:
+            dict: {"folder", "total", "offset", "files"}，total 為套用 prefix 後的總數；資料夾不存在時回傳 None
+        """
+        with self._lock:
+            dir_path = self.resolve_folder(rel_path)
+            if dir_path is None or not os.path.isdir(dir_path):
+                return None
+            files = self.list_files(dir_path)
+        if prefix:
+            prefix = prefix.lower()
+            files = [name for name in files if name.lower().startswith(prefix)]
+        end = offset + limit if limit > 0 else len(files)
+        return {"folder": self._rel_path(dir_path), "total": len(files), "offset": offset, "files": files[offset:end]}
+
+    def list_files(self, dir_path):
+        """
+        列出目錄下所有 .txt 檔案 (排序後)，僅驗證該目錄的 mtime。
+        新增/刪除/更名都會改變資料夾 mtime，標籤包不早於資料夾時直接提供檔名列表 (檔名不受原地修改影響，不需逐檔驗證)。
+        """
+        with self._lock, phase("tag_list"):
+            dir_path = os.path.abspath(dir_path)
+            pack = self._open_pack(dir_path)
+            if pack is not None:
+                return list(pack.names)
+            entry = self._revalidate_dir(dir_path)
+            return list(entry.txt_files) if entry is not None else []
+
+    # -------------------------------------------------------
+    # 標籤包
+    # -------------------------------------------------------
+    def begin_run(self):
+        """每次執行開始時呼叫 (IS_CHANGED 指紋 / 預覽)：之後的 pack_for 重新逐檔驗證，同一次執行中沿用驗證結果"""
+        with self._lock:
+            self._run += 1
+
+    def pack_for(self, dir_path):
+        """
+        取得資料夾的有效標籤包：
+        1. 標籤包 mtime 不早於資料夾 mtime (建立後未新增/刪除/更名檔案)。
+        2. 每個 .txt 檔案的 (mtime_ns, size) 與打包時相同 (原地修改不會改變資料夾 mtime，需逐檔 stat)。
+           驗證結果以 (資料夾與標籤包的 (mtime_ns, size), 執行序號) 快取，同一次執行中不重複 stat。
+
+        Returns:
+            TagPack: 標籤包，不存在或已過期時回傳 None
+        """
+        dir_path = os.path.abspath(dir_path)
+        with self._lock:
+            pack, stat_key = self._open_pack_checked(dir_path)
+            if pack is None:
+                return None
+            validation_key = (stat_key, self._run)
+            cached = self._validated.get(dir_path)
+            if cached is not None and cached[0] == validation_key:
+                return pack if cached[1] else None
+            with phase("tag_pack_validate"):
+                current = pack.is_current(dir_path)
+            add_count("tag_pack_validate", len(pack.names))
+            self._validated[dir_path] = (validation_key, current)
+            return pack if current else None
+
+    def _open_pack(self, dir_path):
+        """開啟 (或沿用已開啟的) 標籤包，僅檢查標籤包與資料夾的 mtime，不驗證個別檔案"""
+        return self._open_pack_checked(dir_path)[0]
+
+    def _open_pack_checked(self, dir_path):
+        """
+        與 _open_pack 相同，另外回傳 stat 鍵值 ((資料夾 mtime_ns, size), (標籤包 mtime_ns, size))。
+
+        Returns:
+            tuple: (TagPack 或 None, stat 鍵值)
+        """
+        with self._lock:
+            try:
+                pack_st = os.stat(pack_path(dir_path))
+                dir_st = os.stat(dir_path)
+            except OSError:
+                self.drop_pack(dir_path)
+                return None, None
+            if pack_st.st_mtime_ns < dir_st.st_mtime_ns:
+                return None, None
+            token = (pack_st.st_mtime_ns, pack_st.st_size)
+            stat_key = ((dir_st.st_mtime_ns, dir_st.st_size), token)
+            cached = self._packs.get(dir_path)
+            if cached is not None and cached[0] == token:
+                return cached[1], stat_key
+            self.drop_pack(dir_path)
+            try:
+                with phase("tag_pack_open"):
+                    pack = TagPack(pack_path(dir_path))
+            except (OSError, ValueError) as e:
+                print(f"[DynamicTagLoader] Ignoring invalid tag pack in {dir_path}: {e}")
+                return None, None
+            add_bytes("tag_pack_open", pack_st.st_size)
+            self._packs[dir_path] = (token, pack)
+            return pack, stat_key
+
+    def drop_pack(self, dir_path):
+        """釋放已開啟的標籤包 (重新打包或刪除前呼叫，Windows 上 mmap 會鎖定檔案)"""
+        with self._lock:
+            self._validated.pop(os.path.abspath(dir_path), None)
+            cached = self._packs.pop(os.path.abspath(dir_path), None)
+            if cached is not None:
+                cached[1].close()
+
+    def read_folder(self, dir_path, parser):
+        """
+        讀取資料夾內所有標籤檔案的解析結果 (依檔名排序)。
+        有效的標籤包直接回傳預先解析的結果，否則並行讀取個別 .txt 檔案 (read_many)。
+
+        Returns:
+            list: [(清理後的文本, LoRA 列表), ...]
+        """
+        return [parsed for _, parsed in self.read_folder_items(dir_path, parser)]
+
+    def read_folder_items(self, dir_path, parser, pack=None):
+        """
+        與 read_folder 相同，但保留檔名 (組合規則依檔名比對)。
+
+        Args:
+            pack (TagPack): (可選) 呼叫端已由 pack_for 取得的有效標籤包，不再重新查詢
+        Returns:
+            list: [(檔名, (清理後的文本, LoRA 列表)), ...]
+        """
+        dir_path = os.path.abspath(dir_path)
+        with self._lock:
+            if pack is None:
+                pack = self.pack_for(dir_path)
+            if pack is not None:
+                with phase("tag_pack"):
+                    parsed = list(zip(pack.names, pack.parsed_all()))
+                add_count("tag_pack", len(parsed))
+                return parsed
+            paths = {name: os.path.join(dir_path, name) for name in self.list_files(dir_path)}
+        parsed = self.read_many(list(paths.values()), parser)
+        return [(name, parsed[path]) for name, path in paths.items() if path in parsed]
+
+    # -------------------------------------------------------
+    # 檔案內容索引
+    # -------------------------------------------------------
+    def _load_entry(self, path):
+        """
+        stat 並在檔案變動時重新讀取內容。僅在存取快取時持有鎖，可於 I/O 執行緒池中並行呼叫。
+
+        Returns:
+            tuple: (_FileEntry 或 None, 本次讀取的位元組數)
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._files.pop(path, None)
+            return None, 0
+        token = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._files.get(path)
+        if entry is not None and entry.token == token:
+            return entry, 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+        except:
+            return None, 0
+        entry = _FileEntry(token, content)
+        with self._lock:
+            self._files[path] = entry
+        return entry, st.st_size
+
+    def _file_entry(self, path):
+        with phase("tag_io"):
+            entry, size = self._load_entry(os.path.abspath(path))
+        if size:
+            add_bytes("tag_io", size)
+            add_count("tag_io")
+        return entry
+
+    def read(self, path):
+        """讀取標籤檔案內容 (已去除頭尾空白)，檔案未變動時不重新開檔；失敗回傳 None"""
+        with self._lock:
+            entry = self._file_entry(path)
+            return entry.content if entry is not None else None
+
+    def read_parsed(self, path, parser):
+        """
+        讀取並解析標籤檔案，解析結果與內容一同快取。
+
+        Args:
+            path (str): 檔案路徑
+            parser: 解析函數 text -> (清理後的文本, LoRA 列表)
+        Returns:
+            tuple: parser 的回傳值，讀取失敗時回傳 None
+        """
+        with self._lock:
+            dir_path, name = os.path.split(os.path.abspath(path))
+            pack = self._open_pack(dir_path)
+            if pack is not None and name in pack:
+                # 單一檔案僅需一次 stat：與打包時的 (mtime_ns, size) 不同 (打包後被修改) 時改用檔案內容
+                try:
+                    if pack.is_member_current(name, os.stat(path)):
+                        return pack.parsed(name)
+                except OSError:
+                    pass
+            entry = self._file_entry(path)
+            if entry is None:
+                return None
+            if entry.parsed is None:
+                with phase("parse"):
+                    entry.parsed = parser(entry.content)
+            return entry.parsed
+
+    def read_many(self, paths, parser):
+        """
+        讀取並解析多個標籤檔案：未快取或已變動的檔案在 I/O 執行緒池中並行讀取，有效標籤包中的檔案直接由標籤包提供。
+
+        Args:
+            paths (iterable): 檔案路徑
+            parser: 解析函數 text -> (清理後的文本, LoRA 列表)
+        Returns:
+            dict: {絕對路徑: parser 的回傳值}，讀取失敗的檔案不列入
+        """
+        results = {}
+        loose = []
+        packs = {}
+        for path in dict.fromkeys(os.path.abspath(p) for p in paths):
+            dir_path, name = os.path.split(path)
+            if dir_path not in packs:
+                packs[dir_path] = self.pack_for(dir_path)
+            if packs[dir_path] is not None and name in packs[dir_path]:
+                # 標籤包已逐檔驗證 (pack_for)，直接使用預先解析的結果
+                results[path] = packs[dir_path].parsed(name)
+            else:
+                loose.append(path)
+
+        with phase("tag_io"):
+            if len(loose) > 1:
+                loaded = list(io_pool().map(self._load_entry, loose))
+            else:
+                loaded = [self._load_entry(path) for path in loose]
+
+        read_count = 0
+        read_bytes = 0
+        with self._lock:
+            for path, (entry, size) in zip(loose, loaded):
+                if entry is None:
+                    continue
+                if size:
+                    read_count += 1
+                    read_bytes += size
+                if entry.parsed is None:
+                    with phase("parse"):
+                        entry.parsed = parser(entry.content)
+                results[path] = entry.parsed
+        add_count("tag_io", read_count)
+        add_bytes("tag_io", read_bytes)
+        return results
+
+
+# 全域共享實例
+TAG_LIBRARY = TagLibrary(TAGS_DIR)
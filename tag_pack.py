@@ -0,0 +1,188 @@
+import os
+import json
+import mmap
+import struct
+import tempfile
+
+# -----------------------------------------------------------
+# 標籤包 (Tag Pack) 格式
+# 每個資料夾一個 .tagpack 檔案：
+#   [檔頭] magic(8) | 版本(u32) | 檔案數(u32) | 索引位移(u64) | 索引長度(u64)
+#   [內容區] 各檔案的原始 UTF-8 內容與去除 LoRA 語法後的文本
+#   [索引區] JSON：檔名、內容位移/長度、預先解析的 LoRA 列表、打包時各檔案的 (mtime_ns, size)
+# 以 mmap 讀取，不需逐一開啟 .txt 檔案；各檔案只需 stat 驗證是否在打包後被修改。
+# -----------------------------------------------------------
+PACK_NAME = ".tagpack"
+MAGIC = b"DTLPACK\0"
+VERSION = 2
+_HEADER = struct.Struct("<8sIIQQ")
+
+
+def pack_path(dir_path):
+    return os.path.join(dir_path, PACK_NAME)
+
+
+def _read_loose_files(dir_path):
+    """
+    讀取資料夾內所有 .txt 檔案 (排序後)，內容去除頭尾空白 (與標籤庫一致)。
+    讀取前先記錄檔案的 (mtime_ns, size)：讀取期間被修改的檔案之後會因 stat 不符而改用個別檔案。
+    """
+    with os.scandir(dir_path) as it:
+        names = sorted(entry.name for entry in it if entry.name.endswith(".txt") and entry.is_file())
+    contents = []
+    for name in names:
+        with open(os.path.join(dir_path, name), "r", encoding="utf-8") as f:
+            st = os.fstat(f.fileno())
+            contents.append((name, f.read().strip(), [st.st_mtime_ns, st.st_size]))
+    return contents
+
+
+def build_pack(dir_path, parser):
+    """
+    將資料夾內的 .txt 標籤檔案編譯為標籤包。
+
+    Args:
+        dir_path (str): 標籤資料夾
+        parser: 解析函數 text -> (清理後的文本, LoRA 列表)
+    Returns:
+        int: 打包的檔案數量
+    """
+    contents = _read_loose_files(dir_path)
+    body = bytearray()
+    names = []
+    entries = []
+    stats = []
+    for name, text, stat in contents:
+        cleaned, loras = parser(text)
+        raw = text.encode("utf-8")
+        clean = cleaned.encode("utf-8")
+        raw_offset = _HEADER.size + len(body)
+        body += raw
+        clean_offset = _HEADER.size + len(body)
+        body += clean
+        names.append(name)
+        entries.append([raw_offset, len(raw), clean_offset, len(clean), [list(lora) for lora in loras]])
+        stats.append(stat)
+
+    index = json.dumps({"names": names, "entries": entries, "stats": stats}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    index_offset = _HEADER.size + len(body)
+    target = pack_path(dir_path)
+
+    # 先寫入暫存檔再以 os.replace 取代，讀取端不會看到寫到一半的標籤包
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{PACK_NAME}.", suffix=".tmp", dir=dir_path)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(names), index_offset, len(index)))
+            f.write(body)
+            f.write(index)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    # 建立標籤包會更新資料夾 mtime：將標籤包 mtime 設為目前時間，使其不早於資料夾 mtime
+    os.utime(target, None)
+    return len(names)
+
+
+class TagPack:
+    """
+    以 mmap 讀取的標籤包：內容在需要時才解碼，預先解析的結果於首次使用時建立並保留。
+    打包時各檔案的 (mtime_ns, size) 記錄於索引，原地修改過的檔案 (資料夾 mtime 不變) 以此偵測。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, count, index_offset, index_length = _HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Unsupported tag pack: {path}")
+            index = json.loads(self._mm[index_offset:index_offset + index_length].decode("utf-8"))
+        except Exception:
+            self._mm.close()
+            raise
+        self.names = index["names"]
+        self._entries = index["entries"]
+        self._stats = [tuple(stat) for stat in index["stats"]]
+        self._positions = {name: i for i, name in enumerate(self.names)}
+        self._parsed = None
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    def is_member_current(self, name, stat_result):
+        """檔案的 stat 與打包時相同 (未在打包後被修改)"""
+        position = self._positions.get(name)
+        return position is not None and self._stats[position] == (stat_result.st_mtime_ns, stat_result.st_size)
+
+    def is_current(self, dir_path):
+        """
+        逐一 stat 驗證資料夾內的 .txt 檔案：與打包時的檔案集合及 (mtime_ns, size) 完全相同才回傳 True。
+        只 stat、不開啟檔案。
+        """
+        seen = 0
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    if not entry.name.endswith(".txt") or not entry.is_file():
+                        continue
+                    if not self.is_member_current(entry.name, entry.stat()):
+                        return False
+                    seen += 1
+        except OSError:
+            return False
+        return seen == len(self.names)
+
+    def _slice(self, offset, length):
+        return self._mm[offset:offset + length].decode("utf-8")
+
+    def read(self, name):
+        """讀取原始內容 (已去除頭尾空白)"""
+        raw_offset, raw_length = self._entries[self._positions[name]][:2]
+        return self._slice(raw_offset, raw_length)
+
+    def _parsed_entry(self, i):
+        _, _, clean_offset, clean_length, loras = self._entries[i]
+        return (self._slice(clean_offset, clean_length), [tuple(lora) for lora in loras])
+
+    def parsed(self, name):
+        """回傳預先解析的 (清理後的文本, LoRA 列表)"""
+        return self.parsed_all()[self._positions[name]]
+
+    def parsed_all(self):
+        """依檔名排序回傳所有檔案的解析結果"""
+        if self._parsed is None:
+            self._parsed = [self._parsed_entry(i) for i in range(len(self.names))]
+        return self._parsed
+
+    def close(self):
+        self._mm.close()
+
+
+def unpack(dir_path, write_fn):
+    """
+    將標籤包還原為 .txt 檔案 (僅寫入不存在的檔案)，完成後刪除標籤包。
+    已存在的檔案與打包時相同，或是在打包後被修改過 (應保留較新的內容)，皆不覆寫。
+
+    Args:
+        dir_path (str): 標籤資料夾
+        write_fn: 寫入函數 (path, content)
+    Returns:
+        int: 寫入的檔案數量
+    """
+    pack = TagPack(pack_path(dir_path))
+    written = 0
+    try:
+        for name in pack.names:
+            path = os.path.join(dir_path, name)
+            if os.path.exists(path):
+                continue
+            write_fn(path, pack.read(name))
+            written += 1
+    finally:
+        pack.close()
+    os.remove(pack_path(dir_path))
+    return written
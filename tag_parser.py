@@ -0,0 +1,73 @@
+import re
+import threading
+from collections import OrderedDict
+
+# -----------------------------------------------------------
+# 預先編譯的 LoRA 語法
+# 支援: <lora:name>、<lora:name:weight>、<lora:name:model_w:clip_w>
+# 權重支援負數與科學記號 (例如 -0.5、1e-1、+.75)
+# -----------------------------------------------------------
+_NUMBER = r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"
+LORA_PATTERN = re.compile(
+    r"<lora:(?P<name>[^>:]+)(?::(?P<model_w>" + _NUMBER + r"))?(?::(?P<clip_w>" + _NUMBER + r"))?>"
+)
+_BLANK_LINES = re.compile(r"\n\s*\n")
+
+CACHE_SIZE = 4096
+
+_parse_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _tokenize(text):
+    """單次掃描：同時收集 LoRA 設定與其餘文本片段"""
+    found_loras = []
+    pieces = []
+    last = 0
+    for match in LORA_PATTERN.finditer(text):
+        pieces.append(text[last:match.start()])
+        last = match.end()
+        model_w = match.group("model_w")
+        clip_w = match.group("clip_w")
+        strength_model = float(model_w) if model_w is not None else 1.0
+        strength_clip = float(clip_w) if clip_w is not None else strength_model
+        found_loras.append((match.group("name"), strength_model, strength_clip))
+    if not found_loras:
+        return text, found_loras
+    pieces.append(text[last:])
+    return "".join(pieces), found_loras
+
+
+def parse_prompt(text):
+    """
+    解析 Prompt 文本中的 LoRA 語法並移除之。
+    結果以文本內容為鍵值快取 (dict 以字串內容雜湊)，相同內容不會重複解析。
+
+    Args:
+        text (str): 原始 Prompt 文本
+    Returns:
+        tuple: (清理後的文本, LoRA 配置 [(name, strength_model, strength_clip), ...])
+    """
+    if not text:
+        return "", []
+    with _cache_lock:
+        cached = _parse_cache.get(text)
+        if cached is not None:
+            _parse_cache.move_to_end(text)
+            return cached[0], list(cached[1])
+
+    if "<lora:" in text:
+        cleaned_text, found_loras = _tokenize(text)
+    else:
+        cleaned_text, found_loras = text, []
+
+    # 規範化空白與換行符號
+    if "\n" in cleaned_text:
+        cleaned_text = _BLANK_LINES.sub("\n", cleaned_text)
+    cleaned_text = cleaned_text.strip()
+
+    with _cache_lock:
+        _parse_cache[text] = (cleaned_text, tuple(found_loras))
+        while len(_parse_cache) > CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+    return cleaned_text, found_loras
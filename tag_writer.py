@@ -0,0 +1,255 @@
+import os
+import atexit
+import threading
+import tempfile
+from collections import deque
+
+# -----------------------------------------------------------
+# 寫入配置 (可透過環境變數調整)
+# -----------------------------------------------------------
+# 設定 DYNAMIC_TAGLOADER_FSYNC=0 可略過 fsync (速度較快，但斷電時可能遺失最近寫入的檔案)
+FSYNC = os.environ.get("DYNAMIC_TAGLOADER_FSYNC", "1") == "1"
+# 背景寫入每批次最多處理的檔案數
+BATCH_SIZE = int(os.environ.get("DYNAMIC_TAGLOADER_WRITE_BATCH", "256"))
+
+
+def _write_temp(path, content):
+    """在同一目錄寫入暫存檔 (不以 .txt 結尾，標籤庫不會讀到)，回傳 (暫存檔路徑, 已開啟的檔案物件)"""
+    directory, base = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{base}.", suffix=".tmp", dir=directory)
+    f = os.fdopen(fd, "w", encoding="utf-8")
+    try:
+        f.write(content)
+        f.flush()
+    except BaseException:
+        f.close()
+        os.remove(tmp_path)
+        raise
+    return tmp_path, f
+
+
+def _fsync_dir(directory):
+    """確保 rename 寫入目錄項目 (POSIX)；Windows 不支援開啟目錄，直接略過"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _link_unique(tmp_path, target_dir, name, ext, start):
+    """
+    將已寫好內容的暫存檔發布為不重複的檔名：os.link 在目標已存在時失敗，因此同時具有獨佔取得檔名的效果，
+    最終檔名出現時內容已完整，不會有空白或截斷的標籤檔案。成功後刪除暫存檔。
+
+    Args:
+        tmp_path (str): 暫存檔路徑 (與目標同一目錄)
+        target_dir (str): 目標資料夾
+        name (str): 檔名 (不含副檔名)
+        ext (str): 副檔名
+        start (int): 流水號起點 (0 = 先嘗試不加流水號的檔名)
+    Returns:
+        tuple: (檔案完整路徑, 下一個可用的流水號)
+    """
+    counter = start
+    while True:
+        file_name = f"{name}{ext}" if counter == 0 else f"{name}_{counter}{ext}"
+        path = os.path.join(target_dir, file_name)
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            counter += 1
+            continue
+        except OSError:
+            # 不支援 hard link 的檔案系統 (例如 FAT / exFAT)：以 O_EXCL 保留檔名後立即以暫存檔取代
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                counter += 1
+                continue
+            os.close(fd)
+            os.replace(tmp_path, path)
+            return path, counter + 1
+        os.remove(tmp_path)
+        return path, counter + 1
+
+
+def write_new(target_dir, name, ext, start, content, fsync=FSYNC):
+    """
+    寫入新的標籤檔案並取得不重複的檔名：先寫入 (並 fsync) 同目錄的暫存檔，再以 hard link 發布為最終檔名。
+    多個存檔節點 (或程序) 同時存檔也不會互相覆蓋，且最終檔名不會在內容寫入前出現。
+
+    Returns:
+        tuple: (檔案完整路徑, 下一個可用的流水號)
+    """
+    tmp_path, f = _write_temp(os.path.join(target_dir, f"{name}{ext}"), content)
+    try:
+        with f:
+            if fsync:
+                os.fsync(f.fileno())
+        result = _link_unique(tmp_path, target_dir, name, ext, start)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if fsync:
+        _fsync_dir(target_dir)
+    return result
+
+
+def atomic_write(path, content, fsync=FSYNC):
+    """
+    原子寫入：先寫入同目錄的暫存檔，再以 os.replace 取代目標檔案。
+    程序中途當機時，目標檔案只會是舊內容或完整的新內容，不會出現截斷的檔案。
+    """
+    tmp_path, f = _write_temp(path, content)
+    try:
+        with f:
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if fsync:
+        _fsync_dir(os.path.dirname(path))
+
+
+class TagWriteQueue:
+    """
+    背景寫入 (Write-Behind) 佇列：存檔節點只需排入佇列即可返回，不阻塞工作流程執行。
+    1. 背景執行緒每次取出一批檔案，先全部寫入暫存檔，再集中 fsync、以 hard link 發布為不重複的檔名，每個目錄只 fsync 一次。
+       最終檔名在寫入時才取得，佇列中的檔案不會以空白檔案的形式出現在標籤庫中。
+    2. 程序結束時 (atexit) 會寫完佇列中剩餘的檔案。
+    3. 提供佇列深度與寫入統計，供節點輸出與 /custom_nodes/tagloader/stats 讀取。
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, fsync=FSYNC):
+        self.batch_size = max(1, batch_size)
+        self.fsync = fsync
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_error = None
+        self._pending = deque()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="DynamicTagWriter", daemon=True)
+            self._thread.start()
+
+    def submit(self, target_dir, name, ext, start, content):
+        """
+        排入一個新檔案的寫入工作 (參數同 write_new，檔名於實際寫入時取得)，回傳目前佇列深度。
+        """
+        with self._cond:
+            if self._closed:
+                # 已關閉 (程序結束中)：直接同步寫入
+                write_new(target_dir, name, ext, start, content, self.fsync)
+                return 0
+            self._pending.append((target_dir, name, ext, start, content))
+            self._ensure_thread()
+            self._cond.notify()
+            return len(self._pending) + self._in_flight
+
+    def depth(self):
+        with self._cond:
+            return len(self._pending) + self._in_flight
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                self._in_flight = len(batch)
+            try:
+                self._write_batch(batch)
+            finally:
+                with self._cond:
+                    self._in_flight = 0
+                    self.batches += 1
+                    self._cond.notify_all()
+
+    def _write_batch(self, batch):
+        # 1. 寫入所有暫存檔
+        staged = []
+        for target_dir, name, ext, start, content in batch:
+            path = os.path.join(target_dir, f"{name}{ext}")
+            try:
+                staged.append((target_dir, name, ext, start, path) + _write_temp(path, content))
+            except Exception as e:
+                self._record_error(path, e)
+
+        # 2. 集中 fsync，再以 hard link 發布為不重複的檔名
+        directories = set()
+        written = 0
+        for target_dir, name, ext, start, path, tmp_path, f in staged:
+            try:
+                with f:
+                    if self.fsync:
+                        os.fsync(f.fileno())
+                _link_unique(tmp_path, target_dir, name, ext, start)
+                directories.add(target_dir)
+                written += 1
+            except Exception as e:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                self._record_error(path, e)
+
+        # 3. 每個目錄只 fsync 一次
+        if self.fsync:
+            for directory in directories:
+                _fsync_dir(directory)
+        with self._cond:
+            self.written += written
+
+    def _record_error(self, path, error):
+        print(f"[DynamicTagSaver] Write-Behind Error: {path}: {error}")
+        with self._cond:
+            self.errors += 1
+            self.last_error = f"{os.path.basename(path)}: {error}"
+
+    def flush(self, timeout=None):
+        """等待佇列中的檔案全部寫入完成，回傳是否已清空"""
+        with self._cond:
+            if self._pending:
+                self._ensure_thread()
+            return self._cond.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+
+    def close(self):
+        """寫完剩餘檔案後停止背景執行緒 (註冊於 atexit)"""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        """回傳寫入統計資訊 (可序列化為 JSON)"""
+        with self._cond:
+            return {
+                "queue_depth": len(self._pending) + self._in_flight,
+                "written": self.written,
+                "batches": self.batches,
+                "errors": self.errors,
+                "last_error": self.last_error,
+            }
+
+
+# 全域共享實例：程序結束前寫完佇列
+TAG_WRITE_QUEUE = TagWriteQueue()
+atexit.register(TAG_WRITE_QUEUE.close)
@@ -0,0 +1,12 @@
+"""
+測試設定：節點資料夾本身含 __init__.py，pytest 收集測試時會匯入它。
+先註冊 ComfyUI 模組替身 (benchmarks/comfy_stubs)，讓節點在未安裝 ComfyUI 的環境下也能匯入。
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from comfy_stubs import install_stubs
+
+install_stubs()
@@ -0,0 +1,46 @@
+"""
+批次文本編碼：與逐筆 encode_from_tokens 的輸出相同，且使用相同的 clip options (執行裝置)。
+
+使用 benchmarks/comfy_stubs 的 ComfyUI 替身，不需啟動 ComfyUI。
+用法: python -m pytest tests
+"""
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import torch
+
+from comfy_stubs import FakeCLIP, load_package
+
+PROMPTS = ["1girl, red coat", "1girl, blue dress, beach", "city, night, " + ", ".join(f"tag{i}" for i in range(100))]
+
+
+def _batch_encode():
+    package = load_package()
+    return sys.modules[f"{package.__name__}.batch_encode"]
+
+
+def test_batched_matches_single_and_sets_execution_device():
+    batch_encode = _batch_encode()
+    clip = FakeCLIP(load_overhead=0)
+    encoder = clip.cond_stage_model.clip_l
+
+    single = batch_encode.encode_prompts(clip, PROMPTS, batch_size=1)
+    assert encoder.last_device is clip.patcher.load_device
+    encoder.last_device = None
+    batched = batch_encode.encode_prompts(clip, PROMPTS, batch_size=8)
+    assert encoder.last_device is clip.patcher.load_device
+
+    for (cond, pooled), (batched_cond, batched_pooled) in zip(single, batched):
+        assert torch.allclose(cond, batched_cond, atol=1e-5)
+        assert torch.allclose(pooled, batched_pooled, atol=1e-5)
+
+
+def test_falls_back_when_load_device_is_unavailable():
+    batch_encode = _batch_encode()
+    clip = FakeCLIP(load_overhead=0)
+    assert batch_encode._batchable_encoder(clip) is not None
+    clip.patcher = types.SimpleNamespace()
+    assert batch_encode._batchable_encoder(clip) is None
@@ -0,0 +1,44 @@
+"""
+圖片解碼：reduce() 不支援的模式 (調色盤 / 16 位元 PNG) 在指定 max_side 時仍可縮小解碼。
+
+需要實際安裝的 Pillow 與 numpy (ComfyUI 環境皆已內含)。
+用法: python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("PIL.PngImagePlugin")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from PIL import Image
+
+from comfy_stubs import load_package
+
+
+def _decode_image():
+    package = load_package()
+    return sys.modules[f"{package.__name__}.image_cache"].decode_image
+
+
+@pytest.mark.parametrize("mode", ["P", "I;16"])
+def test_reduce_unsupported_modes_decode_with_max_side(tmp_path, mode):
+    decode_image = _decode_image()
+    path = str(tmp_path / f"{mode.replace(';', '_')}.png")
+    if mode == "P":
+        image = Image.new("RGB", (300, 200), (200, 40, 40)).convert("P", palette=Image.Palette.ADAPTIVE)
+    else:
+        image = Image.new("I;16", (300, 200), 40000)
+    image.save(path)
+    with Image.open(path) as reopened:
+        assert reopened.mode not in ("RGB", "RGBA", "L", "LA")
+
+    full = decode_image(path, 0)
+    reduced = decode_image(path, 64)
+    assert tuple(full.shape) == (1, 200, 300, 3)
+    assert max(reduced.shape[1:3]) == 64
+    assert reduced.shape[3] == 3
+    # 單色圖片縮小後的顏色與原始解析度相同
+    assert abs(float(reduced.mean()) - float(full.mean())) < 1e-3
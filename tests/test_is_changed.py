@@ -0,0 +1,75 @@
+"""
+IS_CHANGED 指紋與快取：第二次以相同輸入排入佇列時不讀取任何標籤檔案、不進行任何文本編碼。
+
+使用 benchmarks/comfy_stubs 的 ComfyUI 替身，不需啟動 ComfyUI。
+用法: python -m pytest tests
+"""
+import builtins
+import json
+import os
+import sys
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from comfy_stubs import FakeCLIP, FakeModelPatcher, load_package, use_tags_dir
+
+
+def _write_tags(root):
+    for folder, files in {"outfits": {"coat.txt": "coat", "dress.txt": "dress"},
+                          "backgrounds": {"beach.txt": "beach", "city.txt": "city"}}.items():
+        os.makedirs(os.path.join(root, folder))
+        for name, text in files.items():
+            with open(os.path.join(root, folder, name), "w", encoding="utf-8") as f:
+                f.write(text)
+
+
+def _count_tag_reads(root):
+    """計算期間開啟 root 下 .txt 檔案的次數"""
+    real_open = builtins.open
+    reads = []
+
+    def counting_open(file, *args, **kwargs):
+        if isinstance(file, str) and file.endswith(".txt") and os.path.abspath(file).startswith(root):
+            reads.append(file)
+        return real_open(file, *args, **kwargs)
+
+    return reads, mock.patch("builtins.open", counting_open)
+
+
+def test_second_identical_queue_reads_and_encodes_nothing(tmp_path):
+    root = str(tmp_path)
+    _write_tags(root)
+    package = load_package()
+    use_tags_dir(package, root)
+    loader_cls = sys.modules[f"{package.__name__}.loader_node"].DynamicTagLoaderJS
+
+    text_input = "1girl"
+    tag_settings = json.dumps({
+        "0": {"type": "file", "folder": "outfits", "file": "ALL"},
+        "1": {"type": "file", "folder": "backgrounds", "file": "ALL"},
+    })
+    model = FakeModelPatcher()
+    clip = FakeCLIP(load_overhead=0)
+
+    first_fingerprint = loader_cls.IS_CHANGED(text_input=text_input, tag_settings=tag_settings)
+    first = loader_cls().process(text_input, tag_settings, model=model, clip=clip)
+    # 批次編碼直接呼叫編碼器 (不經過 encode_from_tokens)，兩種路徑都會先 tokenize
+    encode_calls = (clip.tokenize_calls, clip.encode_calls)
+    assert clip.tokenize_calls > 0
+    assert len(first["result"][0]) == 4
+
+    # 第二次排入佇列：指紋不變 (ComfyUI 會直接使用快取結果)，且即使重新執行也不讀檔、不編碼
+    reads, patch = _count_tag_reads(root)
+    with patch:
+        second_fingerprint = loader_cls.IS_CHANGED(text_input=text_input, tag_settings=tag_settings)
+        second = loader_cls().process(text_input, tag_settings, model=model, clip=clip)
+    assert second_fingerprint == first_fingerprint
+    assert reads == []
+    assert (clip.tokenize_calls, clip.encode_calls) == encode_calls
+    assert second["result"][0] == first["result"][0]
+
+    # 修改任一標籤檔案後指紋改變
+    with open(os.path.join(root, "outfits", "coat.txt"), "w", encoding="utf-8") as f:
+        f.write("long coat")
+    assert loader_cls.IS_CHANGED(text_input=text_input, tag_settings=tag_settings) != first_fingerprint
@@ -14,15 +14,115 @@ app.registerExtension({
 
                 setupSizeManager(node);
 
+                // control_after_generate 在前端預設為 randomize：seed / chunk_index 改為不變動，避免每次執行都改變輸入 (使 IS_CHANGED 快取失效)；
+                // 僅在 chunk_size > 0 (分段輸出生效) 時將 chunk_index 切換為遞增，依序輸出每一段
+                const setControlMode = (name, mode) => {
+                    const w = node.widgets.find(w => w.name === name);
+                    const control = w && w.linkedWidgets && w.linkedWidgets.find(l => l.name === "control_after_generate");
+                    if (control) control.value = mode;
+                };
+                setControlMode("selection_seed", "fixed");
+                setControlMode("chunk_index", "fixed");
+                const chunkSizeWidget = node.widgets.find(w => w.name === "chunk_size");
+                if (chunkSizeWidget) {
+                    const callback = chunkSizeWidget.callback;
+                    chunkSizeWidget.callback = function () {
+                        const r = callback ? callback.apply(this, arguments) : undefined;
+                        setControlMode("chunk_index", chunkSizeWidget.value > 0 ? "increment" : "fixed");
+                        return r;
+                    };
+                }
+
+                // 舊版工作流相容：widgets_values 依位置還原，新增的選項 Widget 可能被填入 Folder/File 的值
+                const optionDefaults = node.widgets
+                    .filter(w => w.name !== "text_input" && w.name !== "tag_settings")
+                    .map(w => [w, w.value]);
+                const onConfigureBase = node.onConfigure;
+                node.onConfigure = function (data) {
+                    if (onConfigureBase) onConfigureBase.apply(this, arguments);
+                    optionDefaults.forEach(([w, defaultValue]) => {
+                        const values = w.options && w.options.values;
+                        const valid = typeof w.value === typeof defaultValue && (!Array.isArray(values) || values.includes(w.value));
+                        if (!valid) w.value = defaultValue;
+                    });
+                };
+
                 const settingsWidget = node.widgets.find(w => w.name === "tag_settings");
                 if (settingsWidget) {
                     settingsWidget.type = "hidden";
                     settingsWidget.computeSize = () => [0, -4]; 
                 }
 
-                node.tagsData = {};        
+                // -----------------------------------------------------------
+                // 組合預覽：設定變動後向伺服器查詢組合數與 LoRA 成本 (不執行任何 Patch / 編碼)，組合過多時以紅色警告
+                // -----------------------------------------------------------
+                const WARN_COMBINATIONS = 10000;
+                let previewTimer = null;
+                node.previewInfo = null;
+
+                const widgetValue = (name, fallback) => {
+                    const w = node.widgets.find(w => w.name === name);
+                    return w ? w.value : fallback;
+                };
+
+                const requestPreview = () => {
+                    clearTimeout(previewTimer);
+                    previewTimer = setTimeout(() => {
+                        fetch("/custom_nodes/tagloader/preview", {
+                            method: "POST",
+                            headers: { "Content-Type": "application/json" },
+                            body: JSON.stringify({
+                                text_input: widgetValue("text_input", ""),
+                                tag_settings: settingsWidget ? settingsWidget.value : "{}",
+                                selection: widgetValue("selection", "All Combinations"),
+                                selection_seed: widgetValue("selection_seed", 0),
+                                sample_count: widgetValue("sample_count", 1),
+                                limit: 0,
+                            }),
+                        })
+                            .then(response => response.ok ? response.json() : null)
+                            .then(data => {
+                                node.previewInfo = data;
+                                node.setDirtyCanvas(true, false);
+                            })
+                            .catch(e => console.error("Error loading combination preview:", e));
+                    }, 500);
+                };
+
+                ["text_input", "selection", "selection_seed", "sample_count"].forEach(name => {
+                    const w = node.widgets.find(w => w.name === name);
+                    if (!w) return;
+                    const callback = w.callback;
+                    w.callback = function () {
+                        const r = callback ? callback.apply(this, arguments) : undefined;
+                        requestPreview();
+                        return r;
+                    };
+                });
+
+                const onDrawForeground = node.onDrawForeground;
+                node.onDrawForeground = function (ctx) {
+                    const r = onDrawForeground ? onDrawForeground.apply(this, arguments) : undefined;
+                    const info = node.previewInfo;
+                    if (!info || this.flags.collapsed) return r;
+                    const mb = (info.lora_bytes / (1024 * 1024)).toFixed(1);
+                    const stacks = info.lora_stacks_exact ? `${info.lora_stacks}` : `≤${info.lora_stacks}`;
+                    const pruned = info.unpruned_total > info.total ? ` (of ${info.unpruned_total.toLocaleString()} before rules)` : "";
+                    const text = `${info.selected.toLocaleString()} / ${info.total.toLocaleString()} combos${pruned} | ${stacks} LoRA stacks | ${mb} MB to load`;
+                    ctx.save();
+                    ctx.font = "11px sans-serif";
+                    ctx.textAlign = "right";
+                    ctx.fillStyle = info.selected > WARN_COMBINATIONS ? "#f55" : "#8a8";
+                    ctx.fillText(info.selected > WARN_COMBINATIONS ? `⚠ ${text}` : text, this.size[0] - 4, -LiteGraph.NODE_TITLE_HEIGHT - 6);
+                    ctx.restore();
+                    return r;
+                };
+
+                node.tagsData = {};        // 資料夾 -> { files: [已載入的檔名], total: 檔案總數 } (展開時才分頁載入)
+                node.folderList = [];      // 已知的資料夾 (Folder 選單的選項，逐層展開時加入)
                 node.dynamicWidgets = [];  
                 node.addTagButton = null;  
+                node.tagLimits = null;     // 全域 LoRA 上限 { max_loras, max_lora_weight } (存於 tag_settings 的 "limits")
 
                 // -----------------------------------------------------------
                 // Helper: 更新 Widget 顯示列表
@@ -58,21 +158,91 @@ app.registerExtension({
                         } else {
                             data[i] = { type: "file", folder: group.folder.value, file: group.file.value };
                         }
+                        // 組合規則隨群組保存 (以 "資料夾/檔名" 引用檔案，移動群組不影響)
+                        if (group.rules) data[i].rules = group.rules;
                     }
+                    if (node.tagLimits) data.limits = node.tagLimits;
                     if (settingsWidget) {
                         settingsWidget.value = JSON.stringify(data);
                     }
+                    requestPreview();
+                };
+
+                // -----------------------------------------------------------
+                // 延遲載入：資料夾逐層展開、檔案分頁讀取，不一次取得整個標籤庫
+                // -----------------------------------------------------------
+                const PAGE_SIZE = 500;
+                const LOAD_MORE = "⋯ Load more";
+                const EXPAND_SUFFIX = " ▸";
+                const BACK_ENTRY = "◂ ..";
+                const pendingLoads = {};
+
+                const fetchJson = (url) => fetch(url).then(response => {
+                    if (!response.ok) throw new Error(`${url}: ${response.status}`);
+                    return response.json();
+                });
+
+                const rememberFolder = (folder) => {
+                    // 就地更新，所有 Folder Widget 共用同一個選項陣列
+                    if (folder && !node.folderList.includes(folder)) {
+                        node.folderList.push(folder);
+                        node.folderList.sort();
+                    }
+                };
+
+                const loadFolders = (parent) => fetchJson(`/custom_nodes/tags/folders?${new URLSearchParams({ parent })}`)
+                    .then(data => {
+                        if (!parent && data.files > 0) rememberFolder("Root");
+                        data.folders.forEach(f => { if (f.files > 0) rememberFolder(f.path); });
+                        return data;
+                    });
+
+                // 載入下一頁檔案 (同一資料夾同時只有一個請求)；指定 prefix 時僅查詢，不寫入快取
+                const loadFiles = (folder, prefix = "") => {
+                    if (!prefix && pendingLoads[folder]) return pendingLoads[folder];
+                    const entry = node.tagsData[folder];
+                    const offset = prefix || !entry ? 0 : entry.files.length;
+                    const request = fetchJson(`/custom_nodes/tags/files?${new URLSearchParams({ folder, offset, limit: PAGE_SIZE, prefix })}`);
+                    if (prefix) return request;
+                    pendingLoads[folder] = request
+                        .then(data => {
+                            const target = node.tagsData[folder] || (node.tagsData[folder] = { files: [], total: 0 });
+                            target.files.push(...data.files);
+                            target.total = data.total;
+                            return data;
+                        })
+                        .finally(() => { delete pendingLoads[folder]; });
+                    return pendingLoads[folder];
                 };
 
                 function updateFileWidget(folderName, fileWidget) {
-                    if (node.tagsData[folderName]) {
-                        fileWidget.options.values = node.tagsData[folderName];
-                        if (!node.tagsData[folderName].includes(fileWidget.value)) {
-                            fileWidget.value = "ALL";
-                        }
-                    } else {
-                        fileWidget.options.values = [];
+                    const entry = node.tagsData[folderName];
+                    if (!entry) {
+                        fileWidget.options.values = ["ALL"];
+                        loadFiles(folderName)
+                            .then(() => updateFileWidget(folderName, fileWidget))
+                            .catch(e => console.error("Error loading tag files:", e));
+                        return;
+                    }
+                    fileWidget.options.values = ["ALL", ...entry.files];
+                    if (entry.files.length < entry.total) fileWidget.options.values.push(LOAD_MORE);
+                    if (fileWidget.value === "ALL" || entry.files.includes(fileWidget.value)) return;
+
+                    if (entry.files.length >= entry.total) {
+                        fileWidget.value = "ALL";
+                        updateSettings();
+                        return;
                     }
+                    // 列表尚未完整載入：以 prefix 查詢確認目前選取的檔案是否存在
+                    const selected = fileWidget.value;
+                    loadFiles(folderName, selected)
+                        .then(data => {
+                            if (fileWidget.value === selected && !data.files.includes(selected)) {
+                                fileWidget.value = "ALL";
+                                updateSettings();
+                            }
+                        })
+                        .catch(e => console.error("Error checking tag file:", e));
                 }
 
                 // -----------------------------------------------------------
@@ -108,16 +278,11 @@ app.registerExtension({
                 };
 
                 const handleInsert = (index, position) => {
-                    const folderNames = Object.keys(node.tagsData).sort();
-                    if (folderNames.length === 0) return alert("No tags folder found!");
-
-                    createSearchableMenu(window.event, folderNames, (selectedFolder) => {
-                        if (selectedFolder) {
-                            const targetIndex = position === "before" ? index : index + 1;
-                            node.performAdd(() => {
-                                node.addTagInputs(selectedFolder, "ALL", targetIndex);
-                            });
-                        }
+                    openFolderMenu(window.event, "", (selectedFolder) => {
+                        const targetIndex = position === "before" ? index : index + 1;
+                        node.performAdd(() => {
+                            node.addTagInputs(selectedFolder, "ALL", targetIndex);
+                        });
                     });
                 };
 
@@ -180,12 +345,54 @@ app.registerExtension({
                             handleInsert,
                             removeGroup
                         );
+                        menuItems.push(
+                            null,
+                            { content: "📐 Edit Rules", callback: () => editRules(index) },
+                            { content: "📏 LoRA Limits", callback: editLimits }
+                        );
                         new LiteGraph.ContextMenu(menuItems, { title: "Tag Group Options", event: app.canvas.last_mouse_event || window.event });
                         return null;
                     }
                     return originalGetSlotMenuOptions ? originalGetSlotMenuOptions.apply(this, arguments) : null;
                 };
 
+                // -----------------------------------------------------------
+                // 組合規則：群組的 exclude / require 規則與全域 LoRA 上限 (以 JSON 編輯)
+                // -----------------------------------------------------------
+                const editJson = (message, value) => {
+                    const input = prompt(message, value ? JSON.stringify(value) : "");
+                    if (input === null) return undefined;
+                    if (!input.trim()) return null;
+                    try {
+                        return JSON.parse(input);
+                    } catch (e) {
+                        alert(`Invalid JSON: ${e.message}`);
+                        return undefined;
+                    }
+                };
+
+                const editRules = (index) => {
+                    const group = node.dynamicWidgets[index];
+                    const rules = editJson(
+                        'Rules for this group, keyed by file name ("*" = any file):\n' +
+                        '{"swimsuit.txt": {"exclude": ["backgrounds/snow.txt"], "require": ["backgrounds/beach.txt"]}}',
+                        group.rules
+                    );
+                    if (rules === undefined) return;
+                    group.rules = rules || undefined;
+                    updateSettings();
+                };
+
+                const editLimits = () => {
+                    const limits = editJson(
+                        "LoRA stack limits (0 = unlimited):\n{\"max_loras\": 3, \"max_lora_weight\": 2.0}",
+                        node.tagLimits
+                    );
+                    if (limits === undefined) return;
+                    node.tagLimits = limits;
+                    updateSettings();
+                };
+
                 // -----------------------------------------------------------
                 // 動態組件生成
                 // -----------------------------------------------------------
@@ -195,13 +402,25 @@ app.registerExtension({
                         if (idx !== -1) node.widgets.splice(idx, 1);
                     }
 
-                    const folderNames = Object.keys(node.tagsData);
-                    const folderWidget = node.addWidget("combo", "Folder", defaultFolder || (folderNames.length > 0 ? folderNames[0] : ""), (v) => {
+                    rememberFolder(defaultFolder);
+                    const folderWidget = node.addWidget("combo", "Folder", defaultFolder || (node.folderList.length > 0 ? node.folderList[0] : ""), (v) => {
                         updateFileWidget(v, fileWidget); 
                         updateSettings(); 
-                    }, { values: folderNames });
-
-                    const fileWidget = node.addWidget("combo", "File", defaultFile || "ALL", () => updateSettings(), { values: [] });
+                    }, { values: node.folderList });
+
+                    let selectedFile = defaultFile || "ALL";
+                    const fileWidget = node.addWidget("combo", "File", selectedFile, (v) => {
+                        if (v === LOAD_MORE) {
+                            // 載入下一頁後重新開啟選單即可看到更多檔案
+                            fileWidget.value = fileWidget.options.values.includes(selectedFile) ? selectedFile : "ALL";
+                            loadFiles(folderWidget.value)
+                                .then(() => updateFileWidget(folderWidget.value, fileWidget))
+                                .catch(e => console.error("Error loading tag files:", e));
+                            return;
+                        }
+                        selectedFile = v;
+                        updateSettings();
+                    }, { values: ["ALL"] });
                     fileWidget.computeSize = () => [0, 35];
                     updateFileWidget(folderWidget.value, fileWidget);
 
@@ -241,36 +460,66 @@ app.registerExtension({
                     setTimeout(() => searchInput.focus(), 10);
                 };
 
+                // 資料夾選單：每次只載入一層，"▸" 項目展開子資料夾，"◂ .." 回到上一層
+                const openFolderMenu = (event, parent, callback) => {
+                    loadFolders(parent)
+                        .then(data => {
+                            const values = [];
+                            if (parent) values.push(BACK_ENTRY);
+                            if (!parent && data.files > 0) values.push("Root");
+                            data.folders.forEach(f => {
+                                if (f.files > 0) values.push(f.path);
+                                if (f.subfolders > 0) values.push(f.path + EXPAND_SUFFIX);
+                            });
+                            if (values.length === 0) return alert("No tags folder found!");
+
+                            createSearchableMenu(event, values, (selected, options, e) => {
+                                if (!selected) return;
+                                if (selected === BACK_ENTRY) {
+                                    const idx = parent.lastIndexOf("/");
+                                    openFolderMenu(e || event, idx > 0 ? parent.slice(0, idx) : "", callback);
+                                } else if (selected.endsWith(EXPAND_SUFFIX)) {
+                                    openFolderMenu(e || event, selected.slice(0, -EXPAND_SUFFIX.length), callback);
+                                } else {
+                                    callback(selected);
+                                }
+                            });
+                        })
+                        .catch(e => {
+                            console.error("Error loading tags folders:", e);
+                            alert("No tags folder found!");
+                        });
+                };
+
                 // -----------------------------------------------------------
                 // 初始化
                 // -----------------------------------------------------------
                 node.addTagButton = this.addWidget("button", "+ Add Tag Group", null, function (value, canvas, node, pos, event) {
-                    const folderNames = Object.keys(node.tagsData).sort();
-                    if (folderNames.length === 0) return alert("No tags folder found!");
-                    createSearchableMenu(event, folderNames, (selectedFolder) => {
-                        if (selectedFolder) {
-                            node.performAdd(() => {
-                                node.addTagInputs(selectedFolder, "ALL");
-                            });
-                        }
+                    openFolderMenu(event, "", (selectedFolder) => {
+                        node.performAdd(() => {
+                            node.addTagInputs(selectedFolder, "ALL");
+                        });
                     });
                 });
 
-                fetch("/custom_nodes/tags")
-                    .then(response => response.json())
-                    .then(data => {
-                        node.tagsData = data;
+                // 僅載入第一層資料夾；已儲存的群組在建立時各自載入所屬資料夾的檔案
+                loadFolders("")
+                    .catch(e => console.error("Error loading tags folders:", e))
+                    .then(() => {
                         if (settingsWidget && settingsWidget.value && settingsWidget.value !== "{}") {
                             try {
                                 const savedData = JSON.parse(settingsWidget.value);
-                                const keys = Object.keys(savedData).sort((a, b) => parseInt(a) - parseInt(b));
+                                const keys = Object.keys(savedData).filter(key => /^\d+$/.test(key)).sort((a, b) => parseInt(a) - parseInt(b));
+                                node.tagLimits = savedData.limits || null;
                                 
                                 keys.forEach(key => {
                                     const item = savedData[key];
                                     if (item.type === "file" && item.folder) {
                                         this.addTagInputs(item.folder, item.file);
+                                        if (item.rules) node.dynamicWidgets[node.dynamicWidgets.length - 1].rules = item.rules;
                                     }
                                 });
+                                updateSettings();
 
                                 requestAnimationFrame(() => {
                                     node.triggerAutoSize();
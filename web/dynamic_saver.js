@@ -14,6 +14,16 @@ app.registerExtension({
 
                 setupSizeManager(node);
 
+                // 舊版工作流的 widgets_values 依位置還原，新增的 write_mode 可能收到動態 LoRA 欄位的值，無效時重設為預設值
+                const writeModeWidget = node.widgets.find(w => w.name === "write_mode");
+                const onConfigureBase = node.onConfigure;
+                node.onConfigure = function (data) {
+                    if (onConfigureBase) onConfigureBase.apply(this, arguments);
+                    if (writeModeWidget && !writeModeWidget.options.values.includes(writeModeWidget.value)) {
+                        writeModeWidget.value = writeModeWidget.options.values[0];
+                    }
+                };
+
                 const settingsWidget = node.widgets.find(w => w.name === "lora_settings");
                 if (settingsWidget) {
                     settingsWidget.type = "hidden";
@@ -34,6 +34,17 @@ app.registerExtension({
                 return r;
             };
 
+            // 舊版工作流相容：新增的 sample_strategy 可能被依位置填入按鈕的 null 值
+            const onConfigure = nodeType.prototype.onConfigure;
+            nodeType.prototype.onConfigure = function () {
+                const r = onConfigure ? onConfigure.apply(this, arguments) : undefined;
+                const strategyWidget = this.widgets && this.widgets.find(w => w.name === "sample_strategy");
+                if (strategyWidget && !strategyWidget.options.values.includes(strategyWidget.value)) {
+                    strategyWidget.value = strategyWidget.options.values[0];
+                }
+                return r;
+            };
+
             // 2. 攔截 onExecuted 以接收後端傳來的 Seed
             const onExecuted = nodeType.prototype.onExecuted;
             nodeType.prototype.onExecuted = function(message) {
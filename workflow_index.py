@@ -0,0 +1,195 @@
+import os
+import json
+import sqlite3
+import threading
+
+from .image_metadata import read_metadata
+from .profiler import phase, add_count
+
+# -----------------------------------------------------------
+# 索引檔位置 (可透過環境變數指定，預設存放於節點目錄)
+# -----------------------------------------------------------
+NODE_FILE_PATH = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.environ.get("DYNAMIC_TAGLOADER_WORKFLOW_DB", os.path.join(NODE_FILE_PATH, "workflow_index.sqlite3"))
+
+IMAGE_EXTENSIONS = ('.png', '.webp', '.jpg', '.jpeg')
+
+# 結構變更時遞增，舊版索引檔會被自動重建
+SCHEMA_VERSION = 1
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    dir TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    has_workflow INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_dir ON images(dir);
+CREATE TABLE IF NOT EXISTS nodes (
+    image_id INTEGER NOT NULL,
+    node_id TEXT,
+    type TEXT,
+    widgets TEXT,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS nodes_image ON nodes(image_id);
+CREATE INDEX IF NOT EXISTS nodes_type ON nodes(type);
+CREATE INDEX IF NOT EXISTS nodes_node_id ON nodes(node_id);
+"""
+
+
+def flatten_widget_values(values):
+    """將節點的 widgets_values 展開為文字列表 (巢狀列表展開一層)"""
+    result = []
+    for val in values or []:
+        if isinstance(val, list):
+            for sub_val in val:
+                result.append(str(sub_val))
+        else:
+            result.append(str(val))
+    return result
+
+
+def read_workflow(path):
+    """僅讀取圖片 Metadata 中的 workflow (不解碼像素)，無 workflow 時回傳 {}"""
+    workflow = read_metadata(path, ("workflow",)).get("workflow", "{}")
+    return json.loads(workflow)
+
+
+class WorkflowIndex:
+    """
+    圖片 Workflow Metadata 的 SQLite 索引：以「路徑 + mtime + 檔案大小」判斷是否需要重新讀取。
+    1. refresh() 只讀取新增或變動的圖片，並移除已刪除的圖片。
+    2. 每張圖片的節點 ID、類型、widgets_values 皆存入資料表，查詢時不需開啟圖片。
+    3. 無 workflow 的圖片同樣記錄，避免每次重新讀取。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript("DROP TABLE IF EXISTS nodes; DROP TABLE IF EXISTS images;")
+                conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _scan(dir_path):
+        """列出目錄下的圖片：{路徑: (mtime_ns, size)}"""
+        found = {}
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                if not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                found[entry.path] = (st.st_mtime_ns, st.st_size)
+        return found
+
+    def refresh(self, dir_path):
+        """
+        增量更新單一目錄的索引。
+
+        Args:
+            dir_path (str): 圖片目錄 (不含子目錄)
+        Returns:
+            dict: {"images": 總數, "updated": 新增/變動數, "removed": 刪除數}
+        """
+        dir_path = os.path.abspath(dir_path)
+        with phase("index_scan"):
+            found = self._scan(dir_path)
+        add_count("index_scan", len(found))
+
+        with self._lock:
+            conn = self._connect()
+            known = {path: (image_id, mtime_ns, size)
+                     for image_id, path, mtime_ns, size in conn.execute(
+                         "SELECT id, path, mtime_ns, size FROM images WHERE dir = ?", (dir_path,))}
+
+            removed = [known[p][0] for p in known if p not in found]
+            changed = [p for p, token in found.items() if p not in known or known[p][1:] != token]
+
+            with phase("index_update"), conn:
+                if removed:
+                    conn.executemany("DELETE FROM nodes WHERE image_id = ?", ((i,) for i in removed))
+                    conn.executemany("DELETE FROM images WHERE id = ?", ((i,) for i in removed))
+                for path in changed:
+                    self._index_file(conn, path, dir_path, found[path], known.get(path))
+        add_count("index_update", len(changed))
+        return {"images": len(found), "updated": len(changed), "removed": len(removed)}
+
+    @staticmethod
+    def _index_file(conn, path, dir_path, token, previous):
+        try:
+            wf_data = read_workflow(path)
+            nodes = wf_data.get("nodes", []) if isinstance(wf_data, dict) else []
+        except Exception:
+            nodes = []
+
+        if previous is not None:
+            image_id = previous[0]
+            conn.execute("DELETE FROM nodes WHERE image_id = ?", (image_id,))
+            conn.execute("UPDATE images SET mtime_ns = ?, size = ?, has_workflow = ? WHERE id = ?",
+                         (token[0], token[1], int(bool(nodes)), image_id))
+        else:
+            image_id = conn.execute(
+                "INSERT INTO images (path, dir, mtime_ns, size, has_workflow) VALUES (?, ?, ?, ?, ?)",
+                (path, dir_path, token[0], token[1], int(bool(nodes)))).lastrowid
+
+        rows = []
+        for node in nodes:
+            if not isinstance(node, dict):
+                continue
+            values = node.get("widgets_values", [])
+            rows.append((image_id, str(node.get("id")), node.get("type"),
+                         json.dumps(values, ensure_ascii=False),
+                         "\n".join(flatten_widget_values(values))))
+        if rows:
+            conn.executemany("INSERT INTO nodes (image_id, node_id, type, widgets, text) VALUES (?, ?, ?, ?, ?)", rows)
+
+    def query(self, dir_path, search_by, search_query, value_filter=""):
+        """
+        查詢目錄中符合條件的節點 (需先呼叫 refresh)。
+
+        Args:
+            search_by (str): "ID" 或 "Type"
+            search_query (str): 節點 ID 或類型 (完全比對)
+            value_filter (str): 非空時僅保留 widgets_values 文字包含此字串的節點
+        Returns:
+            list: [(圖片路徑, 節點 ID, 節點類型, 展開後的文字), ...] (依路徑排序)
+        """
+        column = "n.node_id" if search_by == "ID" else "n.type"
+        sql = (f"SELECT i.path, n.node_id, n.type, n.text FROM nodes n JOIN images i ON i.id = n.image_id "
+               f"WHERE i.dir = ? AND {column} = ?")
+        params = [os.path.abspath(dir_path), search_query.strip()]
+        if value_filter:
+            sql += " AND instr(n.text, ?) > 0"
+            params.append(value_filter)
+        sql += " ORDER BY i.path, n.rowid"
+        with self._lock, phase("index_query"):
+            rows = self._connect().execute(sql, params).fetchall()
+        add_count("index_query", len(rows))
+        return rows
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 全域共享實例 (首次查詢時才建立資料庫連線)
+WORKFLOW_INDEX = WorkflowIndex(DEFAULT_DB_PATH)